@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Собственные накладные расходы библиотеки на один вызов, без сети: сборка запроса и разбор
+готового ответа в методах Client, raise_for_status, JSON, помощники Watercounter и models.
+
+    python benchmarks/bench_client.py                 # замер и сравнение с последним сохраненным
+    python benchmarks/bench_client.py --save          # сохранить в benchmarks/results/<версия>.json
+    python benchmarks/bench_client.py --compare benchmarks/results/0.12.json
+    python benchmarks/bench_client.py -k watercounters
+
+Результаты хранятся в benchmarks/results, по файлу на версию, чтобы регрессии между
+релизами были видны. Замедление больше чем на --threshold отмечается '!'.
+
+Перед запуском из исходников: pip install -e .
+"""
+from __future__ import print_function
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import sys
+import timeit
+from datetime import datetime
+
+from common import RESULTS, version
+from emp_mos_api.mos import Client, Watercounter, EmpServerException, AuthException
+from emp_mos_api.models import WaterCounters, water_counters
+from emp_mos_api.standin import Account
+
+
+def envelope(result, code=0, message=''):
+    return {'errorCode': code, 'execTime': 0.138262, 'errorMessage': message,
+            'session_id': '6c3333333c33333e44e21e7d43c46e03', 'result': result}
+
+
+class CannedClient(Client):
+    """
+    Client, у которого вместо HTTP - заранее закодированный ответ для каждого пути.
+    Выполняется все, что делает _send, кроме сетевого запроса.
+    """
+    def __init__(self, responses, **kwargs):
+        Client.__init__(self, **kwargs)
+        self.responses = dict((path, self.codec.dumps(answer)) for path, answer in responses.items())
+
+    def _send(self, method, url, params, headers, json, fields, timeout, callback):
+        self._data(json, fields)
+        content = self.responses[url[url.find('/', 8) + 5:]]  # без https://host/v1.x
+        return self._handle_response(self.codec.loads(content), callback)
+
+
+def make_client():
+    account = Account('70000000000', 'pwd', random.Random(0), flats=1)
+    flat_id = list(account.flats)[0]
+    water = account.water[flat_id]
+    electro = {'address': 'x', 'electro_account': '8510000475', 'electro_device': '0400017', 'balance': 0,
+               'is_debt': False, 'sh_znk': 5, 'zones': [{'name': 'T1', 'value': '6887'}], 'intervals': []}
+    epd = [{'is_debt': True, 'is_paid': True, 'amount': 2982.77, 'service_code': 'emp.zkh', 'insurance': 61.93,
+            'ammount_insurance': 3044.7}]
+    responses = {
+        '/profile/get': envelope({'profile': account.profile}),
+        '/flat/get': envelope(list(account.flats.values())),
+        '/flat/addressSearch': envelope([{'address': u'г. Москва, улица Тверская, дом {0}'.format(i),
+                                          'district': u'Тверской', 'unom': 1000 + i, 'unad': 1} for i in range(20)]),
+        '/watercounters/get': envelope(water),
+        '/watercounters/addValues': envelope(None),
+        '/electrocounters/get': envelope(electro),
+        '/epd/get': envelope(epd),
+        '/offence/getOffence': envelope({'paid': [], 'unpaid': []}),
+    }
+    client = CannedClient(responses, token='token', guid='guid', dev_user_agent='Android', dev_app_version='3.8.1')
+    client._set_session('6c3333333c33333e44e21e7d43c46e03')
+    return client, flat_id, water
+
+
+def benchmarks():
+    """
+    :return: [(имя, функция без аргументов), ...]
+    """
+    client, flat_id, water = make_client()
+    counter = water['counters'][0]
+    data = [Watercounter.serialize_for_send(c, 300.0) for c in water['counters']]
+    water_body = client.codec.dumps(envelope(water))
+    counters = WaterCounters.from_json(water)
+    counter_id = counter['counterId']
+
+    answers = (
+        ('ok', envelope(None)),
+        ('401', envelope(None, 401)),
+        ('3454_less', envelope(None, 3454, u'Не удалось передать показания за февраль по счётчикам 123456: '
+                                           u'"Вносимое показание меньше предыдущего."')),
+        ('3454_other', envelope(None, 3454, u'Невозможно внести показание')),
+    )
+
+    def classify(answer):
+        def f():
+            try:
+                client.raise_for_status(answer)
+            except (EmpServerException, AuthException):
+                pass
+        return f
+
+    return [
+        ('client.get_profile', client.get_profile),
+        ('client.get_flats', client.get_flats),
+        ('client.address_search', lambda: client.address_search(u'Тверская', 20)),
+        ('client.get_watercounters', lambda: client.get_watercounters(flat_id)),
+        ('client.send_watercounters', lambda: client.send_watercounters(flat_id, data)),
+        ('client.get_electrocounters', lambda: client.get_electrocounters(flat_id)),
+        ('client.get_epd', lambda: client.get_epd(flat_id, '10.01.2024')),
+        ('client.get_car_fines', lambda: client.get_car_fines('7700123456')),
+    ] + [
+        ('raise_for_status.' + name, classify(answer)) for name, answer in answers
+    ] + [
+        ('codec.loads_watercounters', lambda: client.codec.loads(water_body)),
+        ('codec.dumps_watercounters', lambda: client.codec.dumps(data)),
+        ('watercounter.last_value', lambda: Watercounter.last_value(counter)),
+        ('watercounter.checkup', lambda: Watercounter.checkup(counter)),
+        ('watercounter.serialize_for_send', lambda: Watercounter.serialize_for_send(counter, 300.0)),
+        ('models.water_counters', lambda: water_counters(water)),
+        ('models.WaterCounters.get_last', lambda: counters.get(counter_id).last_value),
+    ]
+
+
+def measure(f, min_time=0.2, repeat=7):
+    """
+    :return: лучшее время одного вызова, микросекунды
+    """
+    number = 1
+    while True:
+        t = timeit.timeit(f, number=number)
+        if t >= min_time / 10 or number >= 10 ** 7:
+            break
+        number *= 10
+    number = max(1, int(number * min_time / 10 / max(t, 1e-9)))
+    return min(timeit.repeat(f, number=number, repeat=repeat)) / number * 1e6
+
+
+def latest_result(exclude):
+    files = [f for f in glob.glob(os.path.join(RESULTS, '*.json')) if os.path.abspath(f) != os.path.abspath(exclude)]
+    if files:
+        return max(files, key=os.path.getmtime)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Накладные расходы emp_mos_api на вызов')
+    parser.add_argument('-k', dest='pattern', default='', help='только бенчмарки, в имени которых есть строка')
+    parser.add_argument('--save', action='store_true', help='сохранить в benchmarks/results/<name>.json')
+    parser.add_argument('--name', default=None, help='имя результата, по умолчанию версия из setup.py')
+    parser.add_argument('--compare', default=None, help='файл результата для сравнения')
+    parser.add_argument('--threshold', type=float, default=0.2, help='допустимое замедление, доля')
+    parser.add_argument('--min-time', type=float, default=0.2, help='секунд на один замер')
+    args = parser.parse_args()
+
+    name = args.name or version()
+    path = os.path.join(RESULTS, name + '.json')
+    baseline_path = args.compare or latest_result(path if args.save else '')
+    baseline = {}
+    if baseline_path and os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)['results']
+        print('сравнение с', os.path.relpath(baseline_path))
+
+    results = {}
+    slower = 0
+    for bench, f in benchmarks():
+        if args.pattern not in bench:
+            continue
+        us = measure(f, args.min_time)
+        results[bench] = round(us, 3)
+        line = '{0:36s} {1:10.2f} us'.format(bench, us)
+        if bench in baseline:
+            change = us / baseline[bench] - 1
+            mark = '!' if change > args.threshold else ' '
+            slower += change > args.threshold
+            line += '  {0:+7.1%} {1}'.format(change, mark)
+        print(line)
+
+    if args.save:
+        if not os.path.isdir(RESULTS):
+            os.makedirs(RESULTS)
+        with open(path, 'w') as f:
+            json.dump({'name': name, 'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                       'python': platform.python_version(), 'machine': platform.machine(),
+                       'codec': make_client()[0].codec.name, 'results': results}, f, indent=2, sort_keys=True)
+        print('сохранено в', os.path.relpath(path))
+    return 1 if slower else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
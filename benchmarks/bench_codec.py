@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Разбор ответов get_watercounters и get_car_fines разными JSON кодеками.
+
+    python benchmarks/bench_codec.py
+
+Перед запуском из исходников: pip install -e .
+"""
+from __future__ import print_function
+import timeit
+
+from emp_mos_api.codec import StdlibCodec, OrjsonCodec, UjsonCodec
+
+
+def watercounters_response(counters=4, months=36):
+    return {
+        'errorCode': 0,
+        'execTime': 0.138262,
+        'errorMessage': '',
+        'session_id': '6c3333333c33333e44e21e7d43c46e03',
+        'result': {
+            'stat_title': u'Статистика потребления',
+            'archive': [{'cold_indication': 1.55 + m, 'hot_indication': 1.2 + m,
+                         'period': '20{0:02d}-{1:02d}-28+03:00'.format(15 + m // 12, m % 12 + 1)}
+                        for m in range(months)],
+            'counters': [{'checkup': '2023-09-25+03:00', 'counterId': 1437373 + c, 'num': str(417944 + c),
+                          'type': c % 2 + 1,
+                          'indications': [{'indication': '{0:.2f}'.format(100 + m * 1.7),
+                                           'period': '20{0:02d}-{1:02d}-28+03:00'.format(15 + m // 12, m % 12 + 1)}
+                                          for m in range(months)]}
+                         for c in range(counters)]
+        }
+    }
+
+
+def car_fines_response(fines=300):
+    fine = {
+        'seriesAndNumber': '18810177180830123456',
+        'date': '2018-08-30+03:00',
+        'offence_place': u'МОСКВА Г.   МКАД, 12 КМ, ВНЕШНЯЯ СТОРОНА',
+        'offenceType': u'12.9ч.2 - Превышение установленной скорости движения транспортного средства '
+                       u'на величину от 20 до 40 километров в час  ',
+        'cost': '500',
+        'is_discount': False,
+        'drive_license': None,
+        'sts_number': '7700123456',
+        'executionState': u'Исполнено',
+        'is_fssp': False
+    }
+    return {'errorCode': 0, 'execTime': 0.2, 'errorMessage': '', 'session_id': 'x',
+            'result': {'paid': [dict(fine) for _ in range(fines)], 'unpaid': [dict(fine) for _ in range(5)]}}
+
+
+def codecs():
+    result = [StdlibCodec()]
+    for codec_class in (OrjsonCodec, UjsonCodec):
+        try:
+            result.append(codec_class())
+        except ImportError:
+            pass
+    return result
+
+
+if __name__ == '__main__':
+    payloads = (('watercounters', watercounters_response()), ('car_fines', car_fines_response()))
+    for name, payload in payloads:
+        body = StdlibCodec().dumps(payload)
+        print('{0} ({1} bytes)'.format(name, len(body)))
+        for codec in codecs():
+            n = 2000
+            loads = min(timeit.repeat(lambda: codec.loads(body), number=n, repeat=3)) / n * 1e6
+            dumps = min(timeit.repeat(lambda: codec.dumps(payload), number=n, repeat=3)) / n * 1e6
+            print('  {0:8s} loads {1:9.1f} us  dumps {2:9.1f} us'.format(codec.name, loads, dumps))
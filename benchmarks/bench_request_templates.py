@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Накладные расходы клиента на сборку одного POST запроса (без сети):
+старый способ (deepcopy заголовков и тела + json) против шаблонов Client. templates_json - шаблоны
+с тем же стандартным json, что и у старого способа, чтобы отделить выигрыш шаблонов от выигрыша кодека.
+
+    python benchmarks/bench_request_templates.py
+    python benchmarks/bench_request_templates.py --save   # benchmarks/results/request_templates/<версия>.json
+
+Перед запуском из исходников: pip install -e .
+"""
+from __future__ import print_function
+import argparse
+import json
+import os
+import platform
+import timeit
+from copy import deepcopy
+from datetime import datetime
+
+from common import RESULTS, version
+from emp_mos_api.codec import StdlibCodec
+from emp_mos_api.mos import Client
+
+N = 100000
+RESULTS = os.path.join(RESULTS, 'request_templates')
+
+
+def make_client(**kwargs):
+    c = Client(token='token', guid='guid', dev_user_agent='Android', dev_app_version='3.8.1', **kwargs)
+    c._set_session('6c3333333c33333e44e21e7d43c46e03')
+    return c
+
+
+client = make_client()
+stdlib_client = make_client(codec=StdlibCodec())
+
+
+def old_watercounters_get(flat_id):
+    wheaders = deepcopy(client.headers)
+    wheaders.update({
+            'X-Clears-tags': 'WATER_COUNTERS',
+            'X-Cache-ov-mode': 'DEFAULT',
+            'Content-Type': 'application/json; charset=UTF-8'})
+
+    wcrequest = deepcopy(client.post_request_data)
+    wcrequest.update({
+        'flat_id': flat_id,
+        'is_widget': False
+    })
+    params = {'token': client.token}
+    body = json.dumps(wcrequest).encode('utf-8')  # так делает requests для json=
+    return params, wheaders, body
+
+
+def new_watercounters_get(flat_id, c=client):
+    params = c._token_params
+    headers = c._post_headers['/watercounters/get']
+    body = c._body({
+        'flat_id': flat_id,
+        'is_widget': False
+    })
+    return params, headers, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сборка POST запроса: deepcopy против шаблонов')
+    parser.add_argument('--save', action='store_true', help='сохранить в benchmarks/results/request_templates/<версия>.json')
+    args = parser.parse_args()
+
+    results = {}
+    for name, f in (('deepcopy', old_watercounters_get),
+                    ('templates_json', lambda flat_id: new_watercounters_get(flat_id, stdlib_client)),
+                    ('templates', new_watercounters_get)):
+        t = min(timeit.repeat(lambda: f(u'1234567'), number=N, repeat=5))
+        results[name] = round(t / N * 1e6, 3)
+        print('{0:15s} {1:8.2f} us/call'.format(name, results[name]))
+
+    if args.save:
+        path = os.path.join(RESULTS, version() + '.json')
+        if not os.path.isdir(RESULTS):
+            os.makedirs(RESULTS)
+        with open(path, 'w') as f:
+            json.dump({'name': version(), 'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'python': platform.python_version(),
+                       'machine': platform.machine(), 'codec': client.codec.name, 'results': results},
+                      f, indent=2, sort_keys=True)
+        print('сохранено в', os.path.relpath(path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""
+Общее для скриптов benchmarks: каталог результатов и версия библиотеки из setup.py
+"""
+from __future__ import print_function
+import os
+import re
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS = os.path.join(HERE, 'results')
+
+
+def version():
+    with open(os.path.join(HERE, '..', 'setup.py')) as f:
+        text = f.read()
+    major = re.search(r'VERSION_MAJOR = (\d+)', text).group(1)
+    minor = re.search(r'VERSION_MINOR = (\d+)', text).group(1)
+    return '{0}.{1}'.format(major, minor)
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Нагрузочный прогон: N аккаунтов проходят типичный сценарий
+login -> get_flats -> get_watercounters -> send_watercounters -> get_epd -> logout
+при разном количестве одновременных пользователей. Для каждой ступени выводится
+пропускная способность, p50/p95/p99 и доля ошибок по каждому методу API.
+
+    python benchmarks/load_test.py --standin --concurrency 1,8,32,64 --duration 10
+    python benchmarks/load_test.py --base-url http://127.0.0.1:8080 --accounts accounts.json
+
+--standin поднимает локальный standin.StandInServer (любой телефон и пароль подходят),
+--accounts - JSON [{"login": "7xxxxxxxxxx", "pwd": "xxx"}, ...], обязателен с --base-url: сценарий
+передает показания, поэтому сгенерированные аккаунты используются только с --standin.
+StandInServer в том же процессе делит GIL с клиентами, поэтому для точных цифр на большой
+параллельности его лучше запустить отдельно: python -m emp_mos_api.standin --port 8080.
+
+Перед запуском из исходников: pip install -e .
+"""
+from __future__ import print_function
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from six.moves import queue
+
+from emp_mos_api.mos import Client, MosAPI, Watercounter
+from emp_mos_api.standin import StandInServer
+from emp_mos_api.transport import Transport
+
+
+def percentile(values, p):
+    """
+    Перцентиль по ближайшему рангу, values отсортированы
+    """
+    if not values:
+        return float('nan')
+    k = max(0, min(len(values) - 1, int(round(p / 100.0 * len(values) + 0.5)) - 1))
+    return values[k]
+
+
+class Recorder(object):
+    """
+    Время и ошибки каждого HTTP запроса по пути API
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}  # путь -> [секунды, ...]
+        self.errors = {}  # путь -> {имя исключения: количество}
+        self.flows = 0
+        self.failed_flows = 0
+
+    def record(self, path, elapsed, error=None):
+        with self._lock:
+            self.latency.setdefault(path, []).append(elapsed)
+            if error is not None:
+                errors = self.errors.setdefault(path, {})
+                name = type(error).__name__
+                errors[name] = errors.get(name, 0) + 1
+
+    def flow(self, ok):
+        with self._lock:
+            self.flows += 1
+            self.failed_flows += not ok
+
+    def report(self, elapsed):
+        rows = []
+        for path in sorted(self.latency):
+            values = sorted(self.latency[path])
+            errors = sum(self.errors.get(path, {}).values())
+            rows.append({
+                'path': path,
+                'requests': len(values),
+                'rps': len(values) / elapsed,
+                'p50_ms': percentile(values, 50) * 1000,
+                'p95_ms': percentile(values, 95) * 1000,
+                'p99_ms': percentile(values, 99) * 1000,
+                'error_rate': float(errors) / len(values),
+                'errors': self.errors.get(path, {}),
+            })
+        return rows
+
+
+class TimedClient(Client):
+    """
+    Client, который пишет в recorder время каждой попытки запроса
+    """
+    def __init__(self, **kwargs):
+        Client.__init__(self, **kwargs)
+        self.recorder = kwargs.get('recorder')
+
+    def _send(self, method, url, params, headers, json, fields, timeout, callback):
+        path = url[url.find('/', url.find('://') + 3):]
+        started = time.time()
+        try:
+            result = Client._send(self, method, url, params, headers, json, fields, timeout, callback)
+        except Exception as e:
+            self.recorder.record(path, time.time() - started, e)
+            raise
+        self.recorder.record(path, time.time() - started)
+        return result
+
+
+class TimedMosAPI(MosAPI):
+    client_class = TimedClient
+
+
+def flow(api, account, recorder, logout_timeout):
+    """
+    Один проход сценария для аккаунта
+    """
+    client = api.client(account['login'])
+    ok = False
+    try:
+        client.login(account['login'], account['pwd'])
+        flats = client.get_flats()
+        if flats:
+            flat_id = flats[0]['flat_id']
+            water = client.get_watercounters(flat_id)
+            data = [Watercounter.serialize_for_send(c, (Watercounter.last_value(c) or 0) + 0.01)
+                    for c in water.get('counters') or []]
+            if data:
+                client.send_watercounters(flat_id, data)
+            client.get_epd(flat_id, date.today().replace(day=10).strftime('%d.%m.%Y'))
+        ok = True
+    except Exception:
+        pass  # ошибка уже записана в recorder
+    finally:
+        try:
+            client.logout(timeout=logout_timeout)
+        except Exception:
+            ok = False
+    recorder.flow(ok)
+
+
+def run_step(api, accounts, concurrency, duration, logout_timeout):
+    """
+    concurrency потоков в течение duration секунд берут свободный аккаунт и проходят сценарий
+    """
+    recorder = Recorder()
+    for account in accounts:
+        api.drop_client(account['login'])
+        api.client(account['login'], recorder=recorder)
+
+    free = queue.Queue()
+    for account in accounts:
+        free.put(account)
+    deadline = time.time() + duration
+
+    def worker():
+        while time.time() < deadline:
+            account = free.get()
+            try:
+                flow(api, account, recorder, logout_timeout)
+            finally:
+                free.put(account)
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(worker)
+    return recorder, time.time() - started
+
+
+def print_step(concurrency, recorder, elapsed):
+    print('\nconcurrency {0}: {1} сценариев за {2:.1f} с, {3:.1f} сценариев/с, ошибок сценариев {4}'.format(
+        concurrency, recorder.flows, elapsed, recorder.flows / elapsed, recorder.failed_flows))
+    print('  {0:32s} {1:>8s} {2:>8s} {3:>8s} {4:>8s} {5:>8s} {6:>7s}'.format(
+        'endpoint', 'req', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'errors'))
+    for row in recorder.report(elapsed):
+        print('  {path:32s} {requests:8d} {rps:8.1f} {p50_ms:8.1f} {p95_ms:8.1f} {p99_ms:8.1f} {error_rate:7.1%}'
+              .format(**row))
+        for name, count in sorted(row['errors'].items()):
+            print('  {0:32s} {1}: {2}'.format('', name, count))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный прогон emp_mos_api')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--base-url', default=None, help='адрес сервера, нужен --accounts')
+    target.add_argument('--standin', action='store_true', help='поднять локальный StandInServer')
+    parser.add_argument('--latency', type=float, default=0.02, help='задержка StandInServer, с')
+    parser.add_argument('--logout-latency', type=float, default=0.0, help='задержка logout StandInServer, с')
+    parser.add_argument('--accounts', default=None, help='JSON файл [{"login": ..., "pwd": ...}, ...]')
+    parser.add_argument('-n', '--num-accounts', type=int, default=100, help='сколько аккаунтов для --standin')
+    parser.add_argument('--concurrency', default='1,4,16,64', help='ступени через запятую')
+    parser.add_argument('--duration', type=float, default=10.0, help='секунд на ступень')
+    parser.add_argument('--token', default='token')
+    parser.add_argument('--guid', default='guid')
+    parser.add_argument('--json', default=None, help='сохранить результаты в JSON файл')
+    args = parser.parse_args()
+
+    if args.base_url and not args.accounts:
+        parser.error('для --base-url нужен --accounts: сценарий передает показания от имени аккаунтов')
+
+    levels = [int(c) for c in args.concurrency.split(',')]
+    server = None
+    if args.standin:
+        server = StandInServer(latency=args.latency, logout_latency=args.logout_latency).start()
+        base_url = server.base_url
+    else:
+        base_url = args.base_url
+
+    if args.accounts:
+        with open(args.accounts) as f:
+            accounts = json.load(f)
+    else:
+        accounts = [{'login': '7{0:010d}'.format(i), 'pwd': 'pwd'} for i in range(args.num_accounts)]
+    if len(accounts) < max(levels):
+        parser.error('аккаунтов меньше, чем одновременных пользователей')
+
+    api = TimedMosAPI(token=args.token, guid=args.guid, base_url=base_url,
+                      transport=Transport(pool_maxsize=max(levels)))
+    print('base_url:', base_url, 'аккаунтов:', len(accounts))
+    results = []
+    try:
+        for concurrency in levels:
+            recorder, elapsed = run_step(api, accounts, concurrency, args.duration, args.logout_latency + 10.0)
+            print_step(concurrency, recorder, elapsed)
+            results.append({'concurrency': concurrency, 'elapsed': elapsed, 'flows': recorder.flows,
+                            'failed_flows': recorder.failed_flows, 'endpoints': recorder.report(elapsed)})
+    finally:
+        if server is not None:
+            server.stop()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'base_url': base_url, 'accounts': len(accounts), 'duration': args.duration,
+                       'steps': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,3 @@
 
 from emp_mos_api.mos import MosAPI, Water, Watercounter, \
-    AuthException, EmpServerException
\ No newline at end of file
+    AuthException, EmpServerException, EmpBadResponseException
\ No newline at end of file
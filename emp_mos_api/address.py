@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Поиск адреса для автодополнения поверх address_search.
+
+Найденные адреса складываются в индекс по триграммам. Если сервер вернул меньше limit
+адресов, ответ считается полным, и более длинные запросы с тем же началом ("ленин" -> "ленинский 3")
+отвечаются фильтрацией этого ответа без обращения к серверу.
+
+    index = AddressIndex(api.client())
+    index.search(u'ленинский')        # запрос к серверу
+    index.search(u'ленинский пр 3')   # из индекса
+
+В интерфейсе запрос на каждое нажатие клавиши отправляется через submit: новый запрос
+отменяет предыдущий, ответ на устаревший запрос в callback не попадает.
+
+    index.submit(text, callback=lambda query, found: show(found))
+"""
+from __future__ import print_function
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+
+import six
+
+_SEPARATORS = re.compile(r'[\W_]+', re.UNICODE)
+
+
+class SearchCancelled(Exception):
+    """
+    Запрос заменен более новым
+    """
+    pass
+
+
+def normalize(text):
+    """
+    Нижний регистр, ё -> е, знаки препинания -> пробел
+    """
+    text = six.text_type(text).lower().replace(u'ё', u'е')
+    return u' '.join(_SEPARATORS.sub(u' ', text).split())
+
+
+def ngrams(text, n=3):
+    """
+    n-граммы слов нормализованной строки, короткие слова целиком
+    """
+    grams = set()
+    for word in text.split():
+        if len(word) <= n:
+            grams.add(word)
+        else:
+            grams.update(word[i:i + n] for i in range(len(word) - n + 1))
+    return grams
+
+
+def matches(query, address):
+    """
+    Каждое слово запроса входит в адрес (обе строки нормализованы)
+    """
+    return all(word in address for word in query.split())
+
+
+def entry_key(entry):
+    return entry.get('unom') or entry.get('unum'), entry.get('unad'), entry.get('address')
+
+
+class AddressIndex(object):
+    """
+    :param client: Client или MosAPI (нужен address_search)
+    :param limit: limit для address_search и максимум адресов в ответе
+    :param min_chars: запросы короче не отправляются на сервер, ответ только из индекса
+    :param max_patterns: сколько полных ответов сервера помнить
+    :param workers: потоков для submit
+    """
+    def __init__(self, client, limit=100, min_chars=3, max_patterns=1000, workers=1):
+        self.client = client
+        self.limit = limit
+        self.min_chars = min_chars
+        self.max_patterns = max_patterns
+        self.workers = workers
+        self.requests = 0  # сколько запросов ушло на сервер
+        self._entries = {}  # key -> (entry, нормализованный адрес)
+        self._grams = {}  # n-грамма -> set(key)
+        self._complete = OrderedDict()  # нормализованный запрос -> [key, ...], ответ сервера полный
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._pending = None
+        self._executor = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, entries, pattern=None):
+        """
+        Добавить адреса в индекс.
+
+        :param entries: ответ address_search
+        :param pattern: запрос, если ответ на него полный (меньше limit адресов)
+        """
+        keys = []
+        with self._lock:
+            for entry in entries or []:
+                key = entry_key(entry)
+                keys.append(key)
+                if key in self._entries:
+                    continue
+                address = normalize(u'{0} {1}'.format(entry.get('address') or u'', entry.get('district') or u''))
+                self._entries[key] = (entry, address)
+                for gram in ngrams(address):
+                    self._grams.setdefault(gram, set()).add(key)
+            if pattern is not None:
+                self._complete.pop(pattern, None)
+                self._complete[pattern] = keys
+                while len(self._complete) > self.max_patterns:
+                    self._complete.popitem(last=False)
+
+    def _filter(self, query, keys):
+        found = []
+        for key in keys:
+            entry, address = self._entries[key]
+            if matches(query, address):
+                found.append(entry)
+                if len(found) >= self.limit:
+                    break
+        return found
+
+    def answer(self, query):
+        """
+        Ответ без сервера, если он точно полный: по сохраненному полному ответу на начало запроса.
+
+        :return: [entry, ...] или None, если нужен запрос к серверу
+        """
+        query = normalize(query)
+        with self._lock:
+            for end in range(len(query), 0, -1):
+                keys = self._complete.get(query[:end])
+                if keys is not None:
+                    return self._filter(query, keys)
+        return None
+
+    def suggest(self, query):
+        """
+        Все подходящие адреса из индекса (может быть неполным), для мгновенной подсказки
+        """
+        query = normalize(query)
+        with self._lock:
+            candidates = None
+            for gram in ngrams(query):
+                keys = self._grams.get(gram, set())
+                candidates = keys if candidates is None else candidates & keys
+                if not candidates:
+                    return []
+            return self._filter(query, candidates if candidates is not None else self._entries)
+
+    def search(self, query):
+        """
+        Найти адреса: из индекса, если ответ в нем полный, иначе address_search.
+        """
+        found = self.answer(query)
+        if found is not None:
+            return found
+        pattern = normalize(query)
+        if len(pattern) < self.min_chars:
+            return self.suggest(query)
+        self.requests += 1
+        entries = self.client.address_search(query, self.limit)
+        self.add(entries, pattern if len(entries or []) < self.limit else None)
+        return list(entries or [])
+
+    def _search_current(self, query, generation):
+        if generation != self._generation:
+            raise SearchCancelled(query)
+        found = self.search(query)
+        if generation != self._generation:
+            raise SearchCancelled(query)  # ответ уже сохранен в индексе
+        return found
+
+    def submit(self, query, callback=None):
+        """
+        Поиск в фоне. Предыдущий запрос отменяется: если он еще не начат, он не выполняется,
+        если выполняется, его Future завершится SearchCancelled.
+
+        :param callback: callback(query, found), вызывается только для актуального запроса
+        :return: concurrent.futures.Future
+        """
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            if self._pending is not None:
+                self._pending.cancel()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers)
+
+        found = self.answer(query)
+        if found is not None:
+            future = Future()
+            future.set_result(found)
+        else:
+            future = self._executor.submit(self._search_current, query, generation)
+            self._pending = future
+
+        if callback is not None:
+            def done(f):
+                if not f.cancelled() and f.exception() is None and generation == self._generation:
+                    callback(query, f.result())
+            future.add_done_callback(done)
+        return future
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
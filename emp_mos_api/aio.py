@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+Асинхронный (asyncio) клиент. Только python 3, требуется aiohttp:
+
+    pip install emp_mos_api[async]
+
+    api = AsyncMosAPI(token=..., guid=...)
+    await api.login(telephone, pwd)
+    flats = await api.get_flats()
+    await api.logout()
+    await api.close()
+"""
+import asyncio
+import ssl
+import time
+from copy import deepcopy
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+from emp_mos_api.mos import Client, MosAPI, AuthException, EmpBadResponseException, EpdItem, epd_periods
+from emp_mos_api.ratelimit import TokenBucket
+from emp_mos_api.eepd import EepdJob
+from emp_mos_api import download
+from emp_mos_api.transport import PoolStats
+
+
+class AsyncClient(Client):
+    """
+    Клиент с теми же методами, что и Client, но каждый метод возвращает корутину.
+    Сессия aiohttp создается при первом запросе внутри работающего event loop.
+    """
+    transient_errors = (aiohttp.ClientError, asyncio.TimeoutError, EmpBadResponseException) if aiohttp else ()
+    def __init__(self, **kwargs):
+        if aiohttp is None:
+            raise ImportError('Для AsyncClient требуется aiohttp: pip install emp_mos_api[async]')
+        super().__init__(**kwargs)
+
+    def _new_session(self):
+        return None
+
+    def _ssl(self):
+        if self.verify is True:
+            return None
+        if not self.verify:
+            return False
+        return ssl.create_default_context(cafile=self.verify)  # путь к CA bundle, как в requests
+
+    def _get_session(self):
+        if self.session is None or self.session.closed:
+            if self.transport is not None:
+                self.session = self.transport.new_session()
+            else:
+                self.session = aiohttp.ClientSession()
+        return self.session
+
+    def _perform(self, method, url, params, headers, json, fields, timeout, callback, precheck=None):
+        return self._aperform(method, url, params, headers, json, fields, timeout, callback, precheck)
+
+    async def _aperform(self, method, url, params, headers, json, fields, timeout, callback, precheck):
+        attempt = 0
+        while True:
+            try:
+                return await self._send(method, url, params, headers, json, fields, timeout, callback)
+            except AuthException:
+                if not self._can_relogin():
+                    raise
+                self._session_resumed = False
+                await self._virtual_login(*self._credentials)
+                params = self._refresh_auth(params)
+            except self.transient_errors as err:
+                attempt += 1
+                if not self._can_retry(url, attempt, precheck):
+                    raise
+                await asyncio.sleep(self.retry_policy.delay(attempt))
+                if precheck is not None and not self.retry_policy.is_idempotent(url):
+                    self._before_precheck(headers)
+                    fetch, accepted = precheck
+                    try:
+                        done = accepted(await fetch())
+                    except Exception:
+                        raise err
+                    if done:
+                        return None
+
+    async def _send(self, method, url, params, headers, json, fields, timeout, callback):
+        if self.rate_limiter is not None:
+            delay = self.rate_limiter.reserve(url, self.token)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        if params:
+            # aiohttp не пропускает None в query, requests их просто отбрасывает
+            params = {k: v for k, v in params.items() if v is not None}
+
+        data = self._data(json, fields)
+        started = time.time()
+        try:
+            async with self._get_session().request(method, url,
+                                                   params=params,
+                                                   headers=headers,
+                                                   ssl=self._ssl(),
+                                                   timeout=aiohttp.ClientTimeout(total=timeout or self.timeout),
+                                                   data=data) as ret:
+                body = await ret.read()
+                status = ret.status
+        except Exception as e:
+            if self.metrics is not None:
+                self.metrics.observe(url, time.time() - started, error=e, bytes_out=len(data or b''))
+            raise
+        elapsed = time.time() - started
+        try:
+            response = self.codec.loads(body)
+        except ValueError:
+            response = None
+        if self.metrics is not None:
+            self.metrics.observe(url, elapsed, response, bytes_out=len(data or b''), bytes_in=len(body))
+        if response is None:
+            raise EmpBadResponseException(body[:200].decode('utf-8', 'replace'), status)
+        return self._handle_response(response, callback)
+
+    def _done(self, value):
+        async def done():
+            return value
+        return done()
+
+    async def get_eepd_wait_result(self, flat_id, period, timeout=10.0):
+        """
+        См. Client.get_eepd_wait_result
+        """
+        start = time.time()
+
+        rid = None
+        result = None
+        while not result and time.time() - start < timeout:
+            await asyncio.sleep(2.0)
+
+            ret = await self.get_eepd(flat_id, period, 'current', rid)
+            if 'rid' in ret:
+                rid = ret['rid']
+
+            if 'pdf' in ret:
+                result = deepcopy(ret)
+
+        return result
+
+    async def get_eepd_many(self, flats_periods, epd_type='current', first_delay=1.0, max_delay=15.0, factor=1.5,
+                            timeout=60.0):
+        """
+        См. Client.get_eepd_many. Асинхронный генератор (flat_id, period, результат) в порядке готовности
+        документов. Результат - ответ с 'pdf', None по таймауту или исключение запроса.
+        Пула потоков нет: опросы, срок которых наступил, выполняются одновременно через asyncio.gather
+        в текущем event loop, число одновременных запросов ограничивает пул соединений AsyncTransport.
+        """
+        jobs = [EepdJob(flat_id, period, epd_type, first_delay, max_delay, factor, timeout)
+                for flat_id, period in flats_periods]
+        due = [(time.time(), job) for job in jobs]
+
+        while due:
+            now = time.time()
+            ready = [job for when, job in due if when <= now]
+            due = [(when, job) for when, job in due if when > now]
+            if not ready:
+                await asyncio.sleep(min(when for when, _ in due) - now)
+                continue
+
+            results = await asyncio.gather(*[self.get_eepd(job.flat_id, job.period, job.epd_type, job.rid)
+                                             for job in ready], return_exceptions=True)
+            for job, ret in zip(ready, results):
+                if isinstance(ret, Exception) or job.update(ret):
+                    yield job.flat_id, job.period, ret
+                    continue
+                when = job.next_poll()
+                if when is None:
+                    yield job.flat_id, job.period, None
+                else:
+                    due.append((when, job))
+
+    async def download_eepd(self, eepd, sink, resume=True, etag=None, last_modified=None,
+                            chunk_size=download.CHUNK_SIZE, timeout=None):
+        """
+        См. Client.download_eepd
+        """
+        url = download.pdf_url(eepd)
+        headers, _ = download.request_headers(sink, resume, etag, last_modified)
+        headers['User-Agent'] = self.user_agent
+
+        if self.rate_limiter is not None:
+            delay = self.rate_limiter.reserve(url, self.token)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        async with self._get_session().get(url, headers=headers, ssl=self._ssl(),
+                                           timeout=aiohttp.ClientTimeout(total=None,
+                                                                         sock_read=timeout or self.timeout)) as ret:
+            size = 0
+            if download.has_body(ret.status):
+                with download.Sink(sink, ret.status) as out:
+                    async for chunk in ret.content.iter_chunked(chunk_size):
+                        out.write(chunk)
+                size = out.size
+            elif ret.status not in (304, 416):
+                ret.raise_for_status()
+            return download.DownloadResult(url, ret.status, size,
+                                           ret.headers.get('ETag', etag), ret.headers.get('Last-Modified', last_modified))
+
+    async def download_eepd_many(self, items, workers=4, **kwargs):
+        """
+        См. Client.download_eepd_many. Асинхронный генератор (sink, DownloadResult, исключение)
+        """
+        semaphore = asyncio.Semaphore(workers)
+
+        async def fetch(eepd, sink):
+            async with semaphore:
+                try:
+                    return sink, await self.download_eepd(eepd, sink, **kwargs), None
+                except Exception as err:
+                    return sink, None, err
+
+        tasks = [asyncio.ensure_future(fetch(eepd, sink)) for eepd, sink in items]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:  # генератор закрыт раньше времени: не качать остальное
+                task.cancel()
+
+    async def get_epd_range(self, flat_ids, start, end, is_debt=True, workers=4, rate=2.0, retries=3, backoff=1.0):
+        """
+        См. Client.get_epd_range. Асинхронный генератор:
+
+        async for item in client.get_epd_range(flat_ids, '10.01.2018', '10.12.2018'):
+            ...
+
+        После break или aclose() оставшиеся запросы отменяются.
+        """
+        semaphore = asyncio.Semaphore(workers)
+        bucket = TokenBucket(rate, 1)
+
+        async def fetch(flat_id, period):
+            async with semaphore:
+                epd = []
+                try:
+                    for attempt in range(retries + 1):
+                        if attempt:
+                            await asyncio.sleep(backoff * 2 ** (attempt - 1))
+                        delay = bucket.reserve()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                        epd = await self.get_epd(flat_id, period, is_debt)
+                        if epd != []:
+                            break
+                except Exception as err:
+                    return EpdItem(flat_id, period, None, err)
+                return EpdItem(flat_id, period, epd, None)
+
+        tasks = [asyncio.ensure_future(fetch(flat_id, period))
+                 for flat_id in flat_ids for period in epd_periods(start, end)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:  # генератор закрыт раньше времени: не запрашивать остальное
+                task.cancel()
+
+    async def close(self):
+        """
+        Закрыть сессию aiohttp клиента. Общий пул соединений закрывает AsyncMosAPI.close
+        """
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+
+class AsyncTransport(object):
+    """
+    Общий пул соединений aiohttp (TCPConnector) для всех AsyncClient, у каждого клиента своя
+    ClientSession с cookies. См. transport.Transport
+
+    :param limit: всего одновременных соединений
+    :param limit_per_host: соединений на один хост
+    :param keepalive_timeout: сколько секунд держать простаивающее соединение
+    """
+    def __init__(self, limit=100, limit_per_host=50, keepalive_timeout=30.0):
+        if aiohttp is None:
+            raise ImportError('Для AsyncTransport требуется aiohttp: pip install emp_mos_api[async]')
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.stats = PoolStats()
+        self._connector = None
+
+    def _trace_config(self):
+        stats = self.stats
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            ctx.https = params.url.scheme == 'https'
+            stats.inc('requests')
+
+        async def on_connection_create_end(session, ctx, params):
+            stats.inc('new_connections')
+            if getattr(ctx, 'https', False):
+                stats.inc('tls_handshakes')
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        return trace
+
+    def new_session(self):
+        """
+        Новая ClientSession на общем пуле. Пул создается при первом запросе внутри работающего event loop
+        """
+        if self._connector is None or self._connector.closed:
+            self._connector = aiohttp.TCPConnector(limit=self.limit,
+                                                   limit_per_host=self.limit_per_host,
+                                                   keepalive_timeout=self.keepalive_timeout)
+        return aiohttp.ClientSession(connector=self._connector, connector_owner=False,
+                                     trace_configs=[self._trace_config()])
+
+    async def close(self):
+        if self._connector is not None and not self._connector.closed:
+            await self._connector.close()
+
+
+class AsyncMosAPI(MosAPI):
+    """
+    То же, что MosAPI, но на AsyncClient: все методы нужно ожидать через await.
+
+    async with AsyncMosAPI(token=...) as api:
+        await api.login(telephone, pwd)
+    """
+    client_class = AsyncClient
+    transport_class = AsyncTransport
+
+    async def close(self):
+        for client in self._clients.values():
+            await client.close()
+        await self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
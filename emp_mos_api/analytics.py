@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Анализ потребления воды сразу по многим квартирам (требуется numpy: pip install emp_mos_api[analytics]).
+
+Ответы get_watercounters собираются в матрицы "квартира (счетчик) x месяц", дальше все
+считается по всей матрице сразу, без циклов по словарям:
+
+    results = {flat_id: api.get_watercounters(flat_id) for flat_id in flat_ids}
+    cold, hot = archive_series(results)
+    print(cold.keys, cold.periods)
+    print(cold.rolling_mean(3))
+    print(cold.forecast())        # ожидаемое потребление в следующем месяце по каждой квартире
+    print(cold.outliers())        # True - подозрительный месяц
+
+    readings = counter_series(results)   # показания счетчиков (нарастающим итогом)
+    usage = readings.deltas()            # потребление по месяцам
+"""
+from __future__ import print_function
+import warnings
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+from emp_mos_api.models import parse_float
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError('Для emp_mos_api.analytics требуется numpy: pip install emp_mos_api[analytics]')
+
+
+def month_index(period):
+    """
+    '2017-08-31+03:00' или date -> номер месяца (год * 12 + месяц - 1)
+    """
+    if isinstance(period, date):
+        return period.year * 12 + period.month - 1
+    return int(period[0:4]) * 12 + int(period[5:7]) - 1
+
+
+def month_date(index):
+    """
+    Номер месяца -> date первого числа месяца
+    """
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _items(results):
+    if isinstance(results, dict):
+        return results.items()
+    return results
+
+
+class Series(object):
+    """
+    Помесячные значения по многим квартирам или счетчикам.
+
+    :param keys: идентификаторы строк (flat_id или counter_id)
+    :param months: номера месяцев столбцов (month_index), по возрастанию
+    :param values: numpy матрица len(keys) x len(months), nan - нет данных
+    """
+    def __init__(self, keys, months, values):
+        _require_numpy()
+        self.keys = list(keys)
+        self.months = np.asarray(months, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.float64)
+        self._rows = dict((k, i) for i, k in enumerate(self.keys))
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        :param rows: [(key, [(period, value), ...]), ...], period - строка API или date
+        """
+        _require_numpy()
+        rows = [(key, [(month_index(p), v) for p, v in points]) for key, points in rows]
+        months = sorted(set(m for _, points in rows for m, _ in points))
+        column = dict((m, i) for i, m in enumerate(months))
+        values = np.full((len(rows), len(months)), np.nan)
+        r, c, v = [], [], []
+        for i, (_, points) in enumerate(rows):
+            for m, value in points:
+                if value is not None:
+                    r.append(i)
+                    c.append(column[m])
+                    v.append(value)
+        if v:
+            values[r, c] = v
+        return cls([key for key, _ in rows], months, values)
+
+    @property
+    def periods(self):
+        return [month_date(int(m)) for m in self.months]
+
+    def row(self, key):
+        return self.values[self._rows[key]]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def deltas(self):
+        """
+        Разница с предыдущим столбцом: из показаний счетчика - потребление по месяцам.
+        Месяц, которого нет ни в одной строке, не получает столбца, и разница считается за оба месяца.
+        """
+        return Series(self.keys, self.months[1:], monthly_deltas(self.values))
+
+    def rolling_mean(self, window=3):
+        return rolling_mean(self.values, window)
+
+    def forecast(self, window=3):
+        return forecast(self.values, window)
+
+    def outliers(self, threshold=3.5):
+        return outliers(self.values, threshold)
+
+
+def archive_series(results):
+    """
+    Помесячное потребление из archive ответов get_watercounters.
+
+    :param results: {flat_id: ответ get_watercounters} или [(flat_id, ответ), ...]
+    :return: (холодная вода, горячая вода) - два Series
+    """
+    cold, hot = [], []
+    for flat_id, result in _items(results):
+        archive = result.get('archive') or []
+        cold.append((flat_id, [(a['period'], parse_float(a.get('cold_indication'))) for a in archive]))
+        hot.append((flat_id, [(a['period'], parse_float(a.get('hot_indication'))) for a in archive]))
+    return Series.from_rows(cold), Series.from_rows(hot)
+
+
+def counter_series(results):
+    """
+    Показания всех счетчиков (строки - counterId) из ответов get_watercounters.
+
+    :param results: {flat_id: ответ get_watercounters} или [(flat_id, ответ), ...]
+    """
+    rows = []
+    for _, result in _items(results):
+        for counter in result.get('counters') or []:
+            rows.append((int(counter['counterId']),
+                         [(i['period'], parse_float(i.get('indication'))) for i in counter.get('indications') or []]))
+    return Series.from_rows(rows)
+
+
+def monthly_deltas(values):
+    """
+    :param values: матрица показаний n x m
+    :return: матрица n x (m - 1), nan если одного из показаний нет
+    """
+    _require_numpy()
+    return np.diff(np.asarray(values, dtype=np.float64), axis=1)
+
+
+def rolling_mean(values, window=3):
+    """
+    Среднее по последним window месяцам (включая текущий) без учета пропусков.
+
+    :return: матрица той же формы, nan - в окне нет ни одного значения
+    """
+    _require_numpy()
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    zeros = np.zeros((values.shape[0], 1))
+    sums = np.concatenate([zeros, np.cumsum(np.where(valid, values, 0.0), axis=1)], axis=1)
+    counts = np.concatenate([zeros, np.cumsum(valid, axis=1)], axis=1)
+    end = np.arange(1, values.shape[1] + 1)
+    start = np.maximum(end - window, 0)
+    total = sums[:, end] - sums[:, start]
+    n = counts[:, end] - counts[:, start]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n > 0, total / n, np.nan)
+
+
+def forecast(values, window=3):
+    """
+    Прогноз на следующий месяц: среднее за последние window месяцев.
+
+    :return: массив длины n, nan - за последние window месяцев данных нет
+    """
+    _require_numpy()
+    values = np.asarray(values, dtype=np.float64)
+    if not values.shape[1]:
+        return np.full(values.shape[0], np.nan)
+    return rolling_mean(values[:, -window:], window)[:, -1]
+
+
+def outliers(values, threshold=3.5):
+    """
+    Подозрительные значения: отрицательные и с модифицированной z-оценкой (по медиане строки) больше threshold.
+
+    :return: матрица bool той же формы, пропуски - False
+    """
+    _require_numpy()
+    values = np.asarray(values, dtype=np.float64)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # строки без данных
+        median = np.nanmedian(values, axis=1, keepdims=True)
+        mad = np.nanmedian(np.abs(values - median), axis=1, keepdims=True)
+    deviation = np.abs(values - median)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        score = np.where(mad > 0, 0.6745 * deviation / mad, np.where(deviation > 0, np.inf, 0.0))
+    with np.errstate(invalid='ignore'):
+        return (score > threshold) | (values < 0)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш ответов на клиенте с инвалидацией по тегам, как X-Clears-tags в мобильном приложении.
+
+    api = MosAPI(token=..., guid=..., cache=TagCache(maxsize=10000, ttl=60))
+
+Кэшируются get_profile, get_flats, get_watercounters, get_electrocounters, get_epd.
+Запросы на изменение (send_watercounters, flat_add, flat_delete, ...) сбрасывают
+теги из своего заголовка X-Clears-tags, но только для своей сессии.
+"""
+from __future__ import print_function
+import threading
+import time
+from collections import OrderedDict
+from copy import deepcopy
+
+ALL_TAGS = '*'  # тег, которым помечены все записи сессии
+
+
+def parse_tags(header):
+    """
+    'WIDGETS,EPD,APARTMENT, EPD_WIDGET' -> ['WIDGETS', 'EPD', 'APARTMENT', 'EPD_WIDGET']
+    """
+    if not header:
+        return []
+    return [t.strip() for t in header.split(',') if t.strip()]
+
+
+def freeze(data):
+    """
+    Превратить JSON (dict, list) в hashable ключ
+    """
+    if isinstance(data, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in data.items()))
+    if isinstance(data, (list, tuple)):
+        return tuple(freeze(v) for v in data)
+    return data
+
+
+class TagCache(object):
+    """
+    LRU + TTL кэш. Каждая запись помечена тегами, invalidate(tags) удаляет все записи с этими тегами.
+    Значения копируются при записи и чтении, чтобы изменения результата вызывающим кодом
+    не портили кэш.
+
+    :param maxsize: максимальное кол-во записей
+    :param ttl: время жизни записи в секундах
+    """
+    def __init__(self, maxsize=1024, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expires, value, tags)
+        self._tags = {}  # tag -> set(key)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """
+        :return: (True, value) или (False, None)
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] < time.time():
+                self._remove(key)
+                item = None
+            if item is None:
+                self.misses += 1
+                return False, None
+            self._data.pop(key)
+            self._data[key] = item  # в конец LRU
+            self.hits += 1
+        return True, deepcopy(item[1])
+
+    def set(self, key, value, tags=()):
+        value = deepcopy(value)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.time() + self.ttl, value, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._remove(next(iter(self._data)))
+
+    def invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+
+    def _remove(self, key):
+        _, _, tags = self._data.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def __getstate__(self):
+        return {'maxsize': self.maxsize, 'ttl': self.ttl}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Кодирование тел запросов и разбор ответов JSON.
+По умолчанию используется самый быстрый из установленных: orjson, ujson, стандартный json.
+
+    api = MosAPI(token=..., guid=..., codec=StdlibCodec())
+"""
+from __future__ import print_function
+import json
+
+
+class JsonCodec(object):
+    """
+    dumps(obj) -> bytes, компактно (без пробелов), объект начинается с '{' и заканчивается '}'
+    loads(bytes) -> obj, при ошибке ValueError
+    """
+    name = None
+
+    def dumps(self, obj):
+        raise NotImplementedError
+
+    def loads(self, data):
+        raise NotImplementedError
+
+
+class StdlibCodec(JsonCodec):
+    name = 'json'
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    def loads(self, data):
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def dumps(self, obj):
+        return self._orjson.dumps(obj)
+
+    def loads(self, data):
+        return self._orjson.loads(data)
+
+    def __getstate__(self):
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+
+class UjsonCodec(JsonCodec):
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+
+    def dumps(self, obj):
+        return self._ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode('utf-8')
+
+    def loads(self, data):
+        return self._ujson.loads(data)
+
+    def __getstate__(self):
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+
+_default = []
+
+
+def default_codec():
+    """
+    Самый быстрый доступный кодек, один на процесс
+    """
+    if not _default:
+        for codec_class in (OrjsonCodec, UjsonCodec, StdlibCodec):
+            try:
+                _default.append(codec_class())
+                break
+            except ImportError:
+                pass
+    return _default[0]
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Потоковое скачивание pdf электронного ЕПД: документ пишется в файл кусками,
+не загружаясь в память целиком. Используется Client.download_eepd.
+"""
+from __future__ import print_function
+import os
+import six
+from collections import namedtuple
+
+CHUNK_SIZE = 64 * 1024
+
+# status: HTTP статус ответа (200, 206 - докачка, 304 - не изменился, 416 - уже скачан целиком)
+# size: сколько байт записано за этот вызов
+DownloadResult = namedtuple('DownloadResult', ['url', 'status', 'size', 'etag', 'last_modified'])
+
+
+def pdf_url(eepd):
+    """
+    :param eepd: ответ get_eepd с 'pdf' или сама ссылка
+    """
+    if isinstance(eepd, dict):
+        return eepd['pdf']
+    return eepd
+
+
+def request_headers(sink, resume=True, etag=None, last_modified=None):
+    """
+    Заголовки для условного запроса и докачки.
+
+    Докачка (Range) идет только вместе с If-Range: если документ изменился, сервер вернет его
+    целиком (200) и файл перезапишется, а не склеится из старого начала и нового конца.
+    Без etag и last_modified файл качается заново.
+
+    :param sink: путь к файлу или file-like объект
+    :param resume: если файл уже частично скачан, запросить только остаток (Range)
+    :param etag: ETag предыдущей загрузки, If-None-Match / If-Range
+    :param last_modified: Last-Modified предыдущей загрузки, If-Modified-Since / If-Range
+    :return: (headers, offset)
+    """
+    headers = {}
+    offset = 0
+    if resume and isinstance(sink, six.string_types) and os.path.exists(sink):
+        validator = etag if etag and not etag.startswith('W/') else last_modified  # слабый ETag в If-Range нельзя
+        offset = os.path.getsize(sink) if validator else 0
+        if offset:
+            headers['Range'] = 'bytes={0}-'.format(offset)
+            headers['If-Range'] = validator
+            return headers, offset
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    return headers, offset
+
+
+def has_body(status):
+    return status in (200, 206)
+
+
+class Sink(object):
+    """
+    Куда писать ответ: файл по пути (дописывается при 206) или переданный file-like объект
+    """
+    def __init__(self, sink, status):
+        self._own = isinstance(sink, six.string_types)
+        if self._own:
+            self._file = open(sink, 'ab' if status == 206 else 'wb')
+        else:
+            self._file = sink
+        self.size = 0
+
+    def write(self, chunk):
+        if chunk:
+            self._file.write(chunk)
+            self.size += len(chunk)
+
+    def close(self):
+        if self._own:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
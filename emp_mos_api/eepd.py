@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Формирование электронных ЕПД (pdf) по многим квартирам сразу.
+
+Client.get_eepd_wait_result ждет один документ, опрашивая сервер раз в 2 секунды.
+EepdScheduler отправляет запросы по всем квартирам, запоминает rid каждого и опрашивает
+их с растущим интервалом. Поток планировщика только ждет срока следующего опроса, сами запросы
+выполняют workers потоков, так что медленный ответ по одной квартире не задерживает остальные:
+
+    futures = api.get_eepd_many([(flat_id, '01.09.2018') for flat_id in flat_ids])
+    for future in concurrent.futures.as_completed(futures):
+        eepd = future.result()  # ответ с 'pdf' или None по таймауту
+"""
+from __future__ import print_function
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class EepdJob(object):
+    """
+    Состояние одного документа: rid, интервал следующего опроса и срок ожидания
+    """
+    def __init__(self, flat_id, period, epd_type='current', first_delay=1.0, max_delay=15.0, factor=1.5,
+                 timeout=60.0):
+        self.flat_id = flat_id
+        self.period = period
+        self.epd_type = epd_type
+        self.rid = None
+        self.started = False
+        self.delay = first_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.deadline = time.time() + timeout
+
+    def update(self, ret):
+        """
+        Обработать ответ get_eepd.
+        :return: True, если документ готов
+        """
+        if not ret:  # пока документ готовится, ответ может быть пустым
+            return False
+        if 'rid' in ret:
+            self.rid = ret['rid']
+        return 'pdf' in ret
+
+    def next_poll(self):
+        """
+        :return: время следующего опроса или None, если до него не дожить до deadline
+        """
+        when = time.time() + self.delay
+        self.delay = min(self.delay * self.factor, self.max_delay)
+        if when > self.deadline:
+            return None
+        return when
+
+
+class EepdScheduler(object):
+    """
+    Очередь запросов eEPD. Поток планировщика и пул из workers потоков для запросов get_eepd
+    запускаются при submit и завершаются, когда очередь пуста и запросов в работе нет.
+
+    :param client: Client
+    :param workers: сколько запросов get_eepd выполняется одновременно
+    :param first_delay: пауза перед первым опросом после отправки запроса
+    :param max_delay: максимальная пауза между опросами
+    :param factor: во сколько раз растет пауза после каждого пустого ответа
+    :param timeout: сколько секунд ждать документ, потом future.result() == None
+    """
+    def __init__(self, client, workers=4, first_delay=1.0, max_delay=15.0, factor=1.5, timeout=60.0):
+        self.client = client
+        self.workers = workers
+        self.job_kwargs = dict(first_delay=first_delay, max_delay=max_delay, factor=factor, timeout=timeout)
+        self._heap = []  # (время опроса, порядковый номер, job, future)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._executor = None
+        self._active = 0  # запросов get_eepd в работе
+
+    def submit(self, flat_id, period, epd_type='current'):
+        """
+        :return: concurrent.futures.Future с ответом get_eepd, содержащим 'pdf'
+        """
+        future = Future()
+        job = EepdJob(flat_id, period, epd_type, **self.job_kwargs)
+        with self._cond:
+            heapq.heappush(self._heap, (time.time(), next(self._seq), job, future))
+            if self._thread is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers)
+                self._thread = threading.Thread(target=self._run, name='eepd-scheduler')
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    def submit_many(self, flats_periods, epd_type='current'):
+        """
+        :param flats_periods: [(flat_id, period), ...]
+        :return: список Future в том же порядке
+        """
+        return [self.submit(flat_id, period, epd_type) for flat_id, period in flats_periods]
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                if not self._heap:
+                    if not self._active:
+                        self._thread = None
+                        return None, None
+                    self._cond.wait()  # опрос в работе может вернуть job в очередь
+                    continue
+                wait = self._heap[0][0] - time.time()
+                if wait <= 0:
+                    _, _, job, future = heapq.heappop(self._heap)
+                    self._active += 1
+                    return job, future
+                self._cond.wait(wait)
+
+    def _run(self):
+        executor = self._executor
+        while True:
+            job, future = self._next_job()
+            if job is None:
+                executor.shutdown(wait=False)
+                return
+            executor.submit(self._poll, job, future)
+
+    def _poll(self, job, future):
+        when = None
+        try:
+            if not job.started:
+                job.started = True
+                if not future.set_running_or_notify_cancel():
+                    return  # отменен до отправки запроса
+            try:
+                ret = self.client.get_eepd(job.flat_id, job.period, job.epd_type, job.rid)
+            except Exception as err:
+                future.set_exception(err)
+                return
+
+            if job.update(ret):
+                future.set_result(ret)
+                return
+
+            when = job.next_poll()
+            if when is None:
+                future.set_result(None)
+        finally:
+            with self._cond:
+                self._active -= 1
+                if when is not None:
+                    heapq.heappush(self._heap, (when, next(self._seq), job, future))
+                self._cond.notify()
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function
 import argparse
-import time
+from datetime import datetime
 from emp_mos_api import MosAPI, AuthException, EmpServerException
 
 # Код написан общим для python2, python3 благодаря
@@ -48,15 +48,14 @@ if __name__ == "__main__":
             print('Счет электро: ', f['electro_account'])
             print('Счетчик электро: ', f['electro_device'])
 
-            for x in range (1,13):
-                date = '10.{}.2018'.format(x)
-                epd = api.get_epd(f['flat_id'], date, False)
-                if epd == []:
-                    epd = api.get_epd(f['flat_id'], date, False)
-                epd_total = epd[0]['amount']
-                epd_is_paid = epd[0]['is_paid']
-                print(" - Дата: {}, сумма: {}, оплачен: {}.".format(date, epd_total, epd_is_paid))
-                time.sleep(1)
+            for item in sorted(api.get_epd_range([f['flat_id']], '10.01.2018', '10.12.2018', is_debt=False),
+                               key=lambda i: datetime.strptime(i.period, '%d.%m.%Y')):
+                if item.error or not item.epd:
+                    print(" - Дата: {}, нет данных ({})".format(item.period, item.error))
+                    continue
+                epd_total = item.epd[0]['amount']
+                epd_is_paid = item.epd[0]['is_paid']
+                print(" - Дата: {}, сумма: {}, оплачен: {}.".format(item.period, epd_total, epd_is_paid))
 
             if f['electro_account'] != "":
                 electro = api.get_electrocounters(f['flat_id'])
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Выполнение одной операции по множеству аккаунтов пулом потоков.
+
+    fleet = Fleet(api, workers=32)
+    accounts = [{'login': '7xxxxxxxxxx', 'pwd': 'xxx'}, ...]
+    for r in fleet.run(accounts, flats_with_watercounters):
+        if r.error:
+            print(r.login, r.error)
+        else:
+            print(r.login, r.result)
+"""
+from __future__ import print_function
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+def flats_with_watercounters(client):
+    """
+    Операция для Fleet.run: квартиры аккаунта со счетчиками воды.
+    У каждой квартиры добавляется ключ 'watercounters' с ответом get_watercounters.
+    """
+    flats = client.get_flats()
+    for f in flats:
+        f['watercounters'] = client.get_watercounters(f['flat_id'])
+    return flats
+
+
+class FleetResult(object):
+    """
+    Результат операции по одному аккаунту
+    """
+    def __init__(self, account, result=None, error=None):
+        self.account = account
+        self.result = result
+        self.error = error  # исключение, если операция не удалась
+
+    @property
+    def login(self):
+        return self.account['login']
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return 'FleetResult({0}, ok={1})'.format(self.login, self.ok)
+
+
+class Fleet(object):
+    """
+    Пул потоков поверх MosAPI.client(client_id): каждый аккаунт получает своего клиента.
+
+    :param api: MosAPI
+    :param workers: сколько аккаунтов обрабатывается одновременно
+    """
+    def __init__(self, api, workers=10):
+        self.api = api
+        self.workers = workers
+
+    def _process(self, account, operation, logout, keep_clients):
+        """
+        :param account: dict {'login': ..., 'pwd': ..., 'client_id': (необязательно), 'kwargs': {} (необязательно)}
+        """
+        client_id = account.get('client_id') or account['login']
+        client = self.api.client(client_id, **account.get('kwargs', {}))
+        try:
+            if not client.is_active():
+                client.login(account['login'], account['pwd'])
+            return operation(client)
+        finally:
+            if logout:
+                try:
+                    client.logout()
+                except Exception:
+                    pass  # результат операции важнее ошибки logout
+            if not keep_clients:
+                self.api.drop_client(client_id)
+
+    def run(self, accounts, operation, logout=True, keep_clients=False):
+        """
+        Выполнить operation(client) для всех аккаунтов.
+        Генератор: FleetResult отдаются по мере завершения, ошибка одного аккаунта не прерывает остальные.
+        Одновременно в очереди не больше 2 * workers задач, поэтому список аккаунтов может быть большим.
+
+        :param accounts: итерируемый список dict {'login': ..., 'pwd': ...}
+        :param operation: функция от Client
+        :param logout: делать logout после операции
+        :param keep_clients: оставить клиентов в MosAPI после операции
+        """
+        accounts = iter(accounts)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = {}
+
+            def submit():
+                for account in accounts:
+                    future = executor.submit(self._process, account, operation, logout, keep_clients)
+                    pending[future] = account
+                    if len(pending) >= 2 * self.workers:
+                        break
+
+            submit()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    account = pending.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        yield FleetResult(account, error=error)
+                    else:
+                        yield FleetResult(account, result=future.result())
+                submit()
+
+    def run_all(self, accounts, operation, **kwargs):
+        """
+        То же, что run, но возвращает список всех результатов
+        """
+        return list(self.run(accounts, operation, **kwargs))
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+Локальная история в SQLite: архив потребления и показания счетчиков воды, ЕПД и штрафы.
+Закрытые периоды не меняются, поэтому отчеты можно строить из базы, а с сервера
+запрашивать только то, чего в ней еще нет:
+
+    history = HistoryStore('history.db')
+    history.save_watercounters(flat_id, api.get_watercounters(flat_id))
+
+    missing = history.missing_epd(flat_ids, '10.01.2018', '10.12.2018')
+    history.save_epd_items(api.get_epd_range(...))  # или save_epd по одному
+
+    history.indications(counter_id, start=date(2018, 1, 1))   # [(date, 200.24), ...]
+    history.epd(flat_id, '10.09.2018')                        # ответ get_epd или None
+
+Даты хранятся строками 'YYYY-MM-DD', ЕПД - по месяцу 'YYYY-MM'.
+"""
+from __future__ import print_function
+import json
+import sqlite3
+import time
+from datetime import date, datetime
+
+from emp_mos_api.mos import epd_periods
+from emp_mos_api.models import parse_float
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS water_archive '
+    '(flat_id TEXT NOT NULL, period TEXT NOT NULL, cold REAL, hot REAL, PRIMARY KEY (flat_id, period))',
+    'CREATE TABLE IF NOT EXISTS counters '
+    '(counter_id INTEGER PRIMARY KEY, flat_id TEXT NOT NULL, num TEXT, type INTEGER, checkup TEXT)',
+    'CREATE TABLE IF NOT EXISTS indications '
+    '(counter_id INTEGER NOT NULL, period TEXT NOT NULL, value REAL, PRIMARY KEY (counter_id, period))',
+    'CREATE TABLE IF NOT EXISTS epd '
+    '(flat_id TEXT NOT NULL, month TEXT NOT NULL, is_debt INTEGER NOT NULL, amount REAL, is_paid INTEGER, '
+    'data TEXT NOT NULL, saved REAL NOT NULL, PRIMARY KEY (flat_id, month, is_debt))',
+    'CREATE TABLE IF NOT EXISTS car_fines '
+    '(series_and_number TEXT PRIMARY KEY, sts_number TEXT, date TEXT, cost REAL, paid INTEGER, data TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS counters_flat ON counters (flat_id)',
+    'CREATE INDEX IF NOT EXISTS car_fines_sts ON car_fines (sts_number)',
+)
+
+
+def _day(value):
+    """
+    '2018-07-31+03:00', date -> '2018-07-31'
+    """
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    return value[:10]
+
+
+def _month(period):
+    """
+    Период get_epd '27.09.2018' или date -> '2018-09'
+    """
+    if not isinstance(period, date):
+        period = datetime.strptime(period, '%d.%m.%Y').date()
+    return period.strftime('%Y-%m')
+
+
+def _date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+def _range(column, start, end, convert):
+    sql, args = '', []
+    if start is not None:
+        sql += ' AND {0} >= ?'.format(column)
+        args.append(convert(start))
+    if end is not None:
+        sql += ' AND {0} <= ?'.format(column)
+        args.append(convert(end))
+    return sql, args
+
+
+class HistoryStore(object):
+    """
+    :param path: файл базы SQLite. Соединение открывается на каждую операцию,
+                 поэтому хранилище можно использовать из нескольких потоков и процессов.
+    """
+    def __init__(self, path):
+        self.path = path
+        db = self._connect()
+        try:
+            db.execute('PRAGMA journal_mode=WAL')
+            with db:
+                for sql in SCHEMA:
+                    db.execute(sql)
+        finally:
+            db.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30.0)
+
+    def _write(self, statements):
+        """
+        :param statements: [(sql, [args, ...]), ...] - выполняются одной транзакцией через executemany
+        """
+        db = self._connect()
+        try:
+            with db:
+                for sql, rows in statements:
+                    db.executemany(sql, rows)
+        finally:
+            db.close()
+
+    def _read(self, sql, args=()):
+        db = self._connect()
+        try:
+            return db.execute(sql, args).fetchall()
+        finally:
+            db.close()
+
+    # Вода
+    def save_watercounters(self, flat_id, result):
+        """
+        :param result: ответ get_watercounters
+        """
+        self.save_watercounters_many({flat_id: result})
+
+    def save_watercounters_many(self, results):
+        """
+        :param results: {flat_id: ответ get_watercounters} или [(flat_id, ответ), ...]
+        """
+        archive, counters, indications = [], [], []
+        for flat_id, result in (results.items() if isinstance(results, dict) else results):
+            for a in result.get('archive') or []:
+                archive.append((flat_id, _day(a['period']),
+                                parse_float(a.get('cold_indication')), parse_float(a.get('hot_indication'))))
+            for c in result.get('counters') or []:
+                counter_id = int(c['counterId'])
+                counters.append((counter_id, flat_id, c.get('num'), c.get('type'),
+                                 _day(c['checkup']) if c.get('checkup') else None))
+                for i in c.get('indications') or []:
+                    indications.append((counter_id, _day(i['period']), parse_float(i.get('indication'))))
+        self._write([
+            ('INSERT OR REPLACE INTO water_archive (flat_id, period, cold, hot) VALUES (?, ?, ?, ?)', archive),
+            ('INSERT OR REPLACE INTO counters (counter_id, flat_id, num, type, checkup) VALUES (?, ?, ?, ?, ?)',
+             counters),
+            ('INSERT OR REPLACE INTO indications (counter_id, period, value) VALUES (?, ?, ?)', indications),
+        ])
+
+    def archive(self, flat_id, start=None, end=None):
+        """
+        :return: [(date, холодная, горячая), ...] по возрастанию периода
+        """
+        sql, args = _range('period', start, end, _day)
+        rows = self._read('SELECT period, cold, hot FROM water_archive WHERE flat_id = ?' + sql +
+                          ' ORDER BY period', [flat_id] + args)
+        return [(_date(p), cold, hot) for p, cold, hot in rows]
+
+    def counters(self, flat_id):
+        """
+        :return: [{'counterId', 'num', 'type', 'checkup'}, ...] как в ответе get_watercounters, без показаний
+        """
+        rows = self._read('SELECT counter_id, num, type, checkup FROM counters WHERE flat_id = ? ORDER BY counter_id',
+                          (flat_id,))
+        return [{'counterId': c, 'num': num, 'type': t, 'checkup': checkup} for c, num, t, checkup in rows]
+
+    def indications(self, counter_id, start=None, end=None):
+        """
+        :return: [(date, показание), ...] по возрастанию периода
+        """
+        sql, args = _range('period', start, end, _day)
+        rows = self._read('SELECT period, value FROM indications WHERE counter_id = ?' + sql + ' ORDER BY period',
+                          [int(counter_id)] + args)
+        return [(_date(p), value) for p, value in rows]
+
+    def last_indication(self, counter_id):
+        """
+        :return: (date, показание) или None
+        """
+        rows = self._read('SELECT period, value FROM indications WHERE counter_id = ? ORDER BY period DESC LIMIT 1',
+                          (int(counter_id),))
+        return (_date(rows[0][0]), rows[0][1]) if rows else None
+
+    # ЕПД
+    def save_epd(self, flat_id, period, epd, is_debt=True):
+        """
+        Пустой ответ ([]) не сохраняется: сервер иногда отдает его для существующего ЕПД.
+
+        :param period: период запроса get_epd '27.09.2018' или date
+        :param epd: ответ get_epd
+        """
+        self.save_epd_many([(flat_id, period, epd, is_debt)])
+
+    def save_epd_many(self, items):
+        """
+        :param items: [(flat_id, period, epd, is_debt), ...]
+        """
+        rows = []
+        now = time.time()
+        for flat_id, period, epd, is_debt in items:
+            if not epd:
+                continue
+            first = epd[0] if isinstance(epd, list) else epd
+            rows.append((flat_id, _month(period), int(bool(is_debt)), parse_float(first.get('amount')),
+                         first.get('is_paid'), json.dumps(epd), now))
+        self._write([('INSERT OR REPLACE INTO epd (flat_id, month, is_debt, amount, is_paid, data, saved) '
+                      'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)])
+
+    def save_epd_items(self, items, is_debt=True):
+        """
+        :param items: EpdItem из get_epd_range, элементы с ошибкой пропускаются
+        """
+        self.save_epd_many([(i.flat_id, i.period, i.epd, is_debt) for i in items if i.error is None])
+
+    def epd(self, flat_id, period, is_debt=True):
+        """
+        :return: сохраненный ответ get_epd или None
+        """
+        rows = self._read('SELECT data FROM epd WHERE flat_id = ? AND month = ? AND is_debt = ?',
+                          (flat_id, _month(period), int(bool(is_debt))))
+        return json.loads(rows[0][0]) if rows else None
+
+    def epd_range(self, flat_id, start, end, is_debt=True):
+        """
+        :return: [(месяц 'YYYY-MM', ответ get_epd), ...] за сохраненные месяцы от start до end
+        """
+        rows = self._read('SELECT month, data FROM epd WHERE flat_id = ? AND is_debt = ? AND month >= ? AND month <= ? '
+                          'ORDER BY month', (flat_id, int(bool(is_debt)), _month(start), _month(end)))
+        return [(month, json.loads(data)) for month, data in rows]
+
+    def missing_epd(self, flat_ids, start, end, is_debt=True):
+        """
+        Какие ЕПД еще не сохранены.
+
+        :param start: '10.01.2018' или date, см. epd_periods
+        :return: [(flat_id, период для get_epd), ...]
+        """
+        periods = epd_periods(start, end)
+        db = self._connect()
+        try:
+            missing = []
+            for flat_id in flat_ids:
+                stored = set(m for m, in db.execute(
+                    'SELECT month FROM epd WHERE flat_id = ? AND is_debt = ? AND month >= ? AND month <= ?',
+                    (flat_id, int(bool(is_debt)), _month(periods[0]), _month(periods[-1])))) if periods else set()
+                missing.extend((flat_id, p) for p in periods if _month(p) not in stored)
+            return missing
+        finally:
+            db.close()
+
+    # Штрафы
+    def save_car_fines(self, result):
+        """
+        :param result: ответ get_car_fines
+        """
+        rows = []
+        for paid, key in ((0, 'unpaid'), (1, 'paid')):
+            for f in result.get(key) or []:
+                rows.append((f.get('seriesAndNumber'), f.get('sts_number'),
+                             _day(f['date']) if f.get('date') else None, parse_float(f.get('cost')), paid,
+                             json.dumps(f)))
+        self._write([('INSERT OR REPLACE INTO car_fines (series_and_number, sts_number, date, cost, paid, data) '
+                      'VALUES (?, ?, ?, ?, ?, ?)', rows)])
+
+    def car_fines(self, sts_number=None, paid=None, start=None, end=None):
+        """
+        :param paid: True/False - только оплаченные/неоплаченные
+        :return: [элемент ответа get_car_fines, ...] по дате
+        """
+        sql, args = _range('date', start, end, _day)
+        if sts_number is not None:
+            sql += ' AND sts_number = ?'
+            args.append(sts_number)
+        if paid is not None:
+            sql += ' AND paid = ?'
+            args.append(int(bool(paid)))
+        rows = self._read('SELECT data FROM car_fines WHERE 1 = 1' + sql + ' ORDER BY date', args)
+        return [json.loads(data) for data, in rows]
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Отложенный logout. /auth/logout выполняется около 5 секунд, поэтому клиент с logout_queue
+закрывает сессию у себя сразу, а запрос к серверу отправляет фоновый поток:
+
+    api = MosAPI(token=..., guid=..., logout_queue=LogoutQueue())
+    api.logout()  # возвращается сразу
+
+Очередь ограничена maxsize (при переполнении logout ждет места), при выходе из интерпретатора
+оставшиеся запросы дожидаются отправки не дольше exit_timeout секунд.
+
+Пакетного logout у emp.mos.ru нет: каждая сессия закрывается своим запросом /auth/logout. Поэтому
+вместо пакетов очередь разбирают workers потоков параллельно, по keep-alive соединениям общего пула.
+Потоки и обработчик atexit запускаются при первом put, а не при создании очереди.
+"""
+from __future__ import print_function
+import atexit
+import threading
+import time
+
+import requests
+from six.moves import queue
+
+
+class LogoutQueue(object):
+    """
+    :param maxsize: максимальная длина очереди
+    :param workers: сколько фоновых потоков отправляют logout, т.е. сколько запросов идет одновременно
+    :param exit_timeout: сколько ждать отправки при выходе из интерпретатора
+    :param transport: transport.Transport, чтобы использовать общий пул соединений
+
+    sent - сколько logout принято сервером (errorCode 0), failed - ошибка сети или errorCode не 0
+    """
+    def __init__(self, maxsize=1000, workers=10, exit_timeout=30.0, transport=None):
+        self.maxsize = maxsize
+        self.workers = workers
+        self.transport = transport
+        self.exit_timeout = exit_timeout
+        self.sent = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize)
+        self._started = False
+
+    def _start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        # потоки-демоны, а не ThreadPoolExecutor: executor перестает принимать задачи
+        # раньше, чем выполняются обработчики atexit
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name='logout-queue-{0}'.format(i))
+            thread.daemon = True
+            thread.start()
+        atexit.register(self.flush, self.exit_timeout)
+
+    def put(self, url, params, headers, body, verify=True, timeout=10.0):
+        """
+        Поставить запрос logout в очередь. Блокируется, если очередь заполнена.
+        """
+        if not self._started:
+            self._start()
+        self._queue.put((url, params, headers, body, verify, timeout))
+
+    def __len__(self):
+        return self._queue.qsize()
+
+    def _send(self, session, url, params, headers, body, verify, timeout):
+        try:
+            ret = session.post(url, params=params, headers=headers, data=body, verify=verify, timeout=timeout)
+            ok = ret.json().get('errorCode') == 0
+        except Exception:
+            ok = False  # сессия на сервере истечет сама
+        with self._lock:
+            if ok:
+                self.sent += 1
+            else:
+                self.failed += 1
+
+    def _run(self):
+        # своя requests.Session у каждого потока, пул соединений общий через transport
+        session = self.transport.new_session() if self.transport is not None else requests.Session()
+        while True:
+            item = self._queue.get()
+            try:
+                self._send(session, *item)
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout=None):
+        """
+        Дождаться отправки всех запросов.
+        :return: True, если очередь пуста
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def __getstate__(self):
+        """
+        Сериализуются только настройки: в другом процессе создается своя пустая очередь,
+        ее потоки запустятся при первом put. Запросы из очереди этого процесса туда не переходят.
+        """
+        return {'maxsize': self.maxsize, 'workers': self.workers, 'exit_timeout': self.exit_timeout,
+                'transport': self.transport}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Метрики запросов по методам API: количество, коды ошибок, байты и время. Время делится
+на сетевое и серверное: сервер сам сообщает время обработки в execTime.
+
+    metrics = Metrics(sinks=[StatsdSink('127.0.0.1', 8125)])
+    api = MosAPI(token=..., guid=..., metrics=metrics)
+    ...
+    print(metrics.summary()['/watercounters/get'])
+    text = metrics.prometheus()  # отдать на /metrics
+
+Sink - любая функция sink(name, value, kind, tags), вызывается на каждый запрос:
+    kind - 'c' (счетчик) или 'ms' (время в миллисекундах), tags - {'endpoint': ..., 'code': ...}
+"""
+from __future__ import print_function
+import socket
+import threading
+from bisect import bisect_left
+
+# границы корзин гистограмм, секунды
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def endpoint(url):
+    """
+    'https://emp.mos.ru/v1.0/flat/get?token=..' -> '/flat/get'
+    """
+    i = url.find('/v1.')
+    path = url[i + 5:] if i >= 0 else url
+    return path.split('?')[0]
+
+
+def response_code(response, error):
+    """
+    errorCode ответа, 'bad_response' для ответа не в JSON, имя исключения для сетевой ошибки
+    """
+    if error is not None:
+        return type(error).__name__
+    if response is None:
+        return 'bad_response'
+    return response.get('errorCode', 0)
+
+
+class Histogram(object):
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # последняя - +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        :return: [(граница, количество <= границы), ...] включая ('+Inf', count)
+        """
+        total = 0
+        result = []
+        for bound, n in zip(self.buckets + ('+Inf',), self.counts):
+            total += n
+            result.append((bound, total))
+        return result
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+
+class EndpointStats(object):
+    def __init__(self, buckets):
+        self.requests = 0
+        self.codes = {}  # код -> количество
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.latency = Histogram(buckets)  # весь запрос
+        self.network = Histogram(buckets)  # latency - execTime
+        self.exec_time = Histogram(buckets)  # execTime сервера
+
+
+class Metrics(object):
+    """
+    :param sinks: [sink(name, value, kind, tags), ...], например StatsdSink
+    :param buckets: границы гистограмм, секунды
+    """
+    def __init__(self, sinks=(), buckets=BUCKETS):
+        self.sinks = list(sinks)
+        self.buckets = tuple(buckets)
+        self.endpoints = {}  # endpoint -> EndpointStats
+        self._lock = threading.Lock()
+
+    def observe(self, url, elapsed, response=None, error=None, bytes_out=0, bytes_in=0):
+        """
+        Вызывается клиентом после каждой попытки запроса.
+
+        :param elapsed: время от отправки до получения всего ответа, секунды
+        :param response: разобранный JSON ответа или None
+        :param error: исключение сети или None
+        """
+        name = endpoint(url)
+        code = response_code(response, error)
+        exec_time = response.get('execTime') if isinstance(response, dict) else None
+        network = max(0.0, elapsed - exec_time) if exec_time is not None else elapsed
+
+        with self._lock:
+            stats = self.endpoints.get(name)
+            if stats is None:
+                stats = self.endpoints[name] = EndpointStats(self.buckets)
+            stats.requests += 1
+            stats.codes[code] = stats.codes.get(code, 0) + 1
+            stats.bytes_out += bytes_out
+            stats.bytes_in += bytes_in
+            stats.latency.observe(elapsed)
+            stats.network.observe(network)
+            if exec_time is not None:
+                stats.exec_time.observe(exec_time)
+
+        if self.sinks:
+            tags = {'endpoint': name, 'code': code}
+            points = [('requests', 1, 'c'), ('latency', elapsed * 1000, 'ms'), ('network_time', network * 1000, 'ms'),
+                      ('bytes_out', bytes_out, 'c'), ('bytes_in', bytes_in, 'c')]
+            if exec_time is not None:
+                points.append(('exec_time', exec_time * 1000, 'ms'))
+            if code != 0:
+                points.append(('errors', 1, 'c'))
+            for sink in self.sinks:
+                for metric, value, kind in points:
+                    try:
+                        sink(metric, value, kind, tags)
+                    except Exception:
+                        pass  # метрики не должны ломать запрос
+
+    def summary(self):
+        """
+        :return: {endpoint: {'requests', 'errors', 'codes', 'latency', 'network', 'exec_time', 'bytes_out',
+                  'bytes_in'}}, время - среднее, секунды
+        """
+        with self._lock:
+            return dict((name, {
+                'requests': s.requests,
+                'errors': sum(n for code, n in s.codes.items() if code != 0),
+                'codes': dict(s.codes),
+                'latency': s.latency.mean,
+                'network': s.network.mean,
+                'exec_time': s.exec_time.mean,
+                'bytes_out': s.bytes_out,
+                'bytes_in': s.bytes_in,
+            }) for name, s in self.endpoints.items())
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = {}
+
+    def __getstate__(self):
+        """
+        Сериализуются только настройки: в другом процессе метрики собираются заново
+        """
+        return {'sinks': self.sinks, 'buckets': self.buckets}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def prometheus(self, prefix='emp_mos_api'):
+        """
+        Текстовый формат Prometheus (text exposition 0.0.4)
+        """
+        lines = []
+
+        def header(name, kind, text):
+            lines.append('# HELP {0}_{1} {2}'.format(prefix, name, text))
+            lines.append('# TYPE {0}_{1} {2}'.format(prefix, name, kind))
+
+        with self._lock:
+            items = sorted(self.endpoints.items())
+
+            header('requests_total', 'counter', 'Requests by endpoint')
+            for name, s in items:
+                lines.append('{0}_requests_total{{endpoint="{1}"}} {2}'.format(prefix, name, s.requests))
+
+            header('responses_total', 'counter', 'Responses by endpoint and errorCode')
+            for name, s in items:
+                for code, n in sorted(s.codes.items(), key=lambda x: str(x[0])):
+                    lines.append('{0}_responses_total{{endpoint="{1}",code="{2}"}} {3}'.format(prefix, name, code, n))
+
+            for metric, attr, text in (('bytes_sent_total', 'bytes_out', 'Request body bytes'),
+                                       ('bytes_received_total', 'bytes_in', 'Response body bytes')):
+                header(metric, 'counter', text)
+                for name, s in items:
+                    lines.append('{0}_{1}{{endpoint="{2}"}} {3}'.format(prefix, metric, name, getattr(s, attr)))
+
+            for metric, attr, text in (('latency_seconds', 'latency', 'Request time'),
+                                       ('network_seconds', 'network', 'Request time minus server execTime'),
+                                       ('exec_seconds', 'exec_time', 'Server execTime')):
+                header(metric, 'histogram', text)
+                for name, s in items:
+                    h = getattr(s, attr)
+                    for bound, n in h.cumulative():
+                        lines.append('{0}_{1}_bucket{{endpoint="{2}",le="{3}"}} {4}'.format(
+                            prefix, metric, name, bound, n))
+                    lines.append('{0}_{1}_sum{{endpoint="{2}"}} {3!r}'.format(prefix, metric, name, h.sum))
+                    lines.append('{0}_{1}_count{{endpoint="{2}"}} {3}'.format(prefix, metric, name, h.count))
+        return '\n'.join(lines) + '\n'
+
+
+class StatsdSink(object):
+    """
+    Отправка в StatsD по UDP: <prefix>.<метрика>.<endpoint>:<значение>|<c или ms>,
+    для errors добавляется код: emp_mos_api.errors.watercounters_addValues.3454:1|c
+    """
+    def __init__(self, host='127.0.0.1', port=8125, prefix='emp_mos_api'):
+        self.address = (host, port)
+        self.prefix = prefix
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def __call__(self, name, value, kind, tags):
+        key = '{0}.{1}.{2}'.format(self.prefix, name, tags['endpoint'].strip('/').replace('/', '_'))
+        if name == 'errors':
+            key += '.{0}'.format(tags['code'])
+        if kind == 'ms':
+            value = '{0:.3f}'.format(value)
+        self._socket.sendto('{0}:{1}|{2}'.format(key, value, kind).encode('utf-8'), self.address)
+
+    def __getstate__(self):
+        return {'address': self.address, 'prefix': self.prefix}
+
+    def __setstate__(self, state):
+        self.__init__(state['address'][0], state['address'][1], state['prefix'])
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""
+Компактные объекты для результатов API (по желанию, методы Client по-прежнему возвращают JSON).
+Даты разбираются один раз при создании, показания счетчика хранятся в массивах array.
+
+    flats = [Flat.from_json(f) for f in api.get_flats()]
+    counters = water_counters(api.get_watercounters(flats[0].flat_id))
+    print(counters[0].last_value, counters[0].checkup)
+"""
+from __future__ import print_function
+from array import array
+from bisect import bisect_right
+from datetime import date
+
+
+def parse_date(value):
+    """
+    '2018-07-31+03:00' -> date(2018, 7, 31), None -> None
+    """
+    if not value:
+        return None
+    return date(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+
+
+def parse_float(value):
+    """
+    '200,24', '200.24', 200.24 -> 200.24, None и '' -> None
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, float):
+        return value
+    return float(str(value).replace(',', '.'))
+
+
+def serialize_indication(counter_id, value, period=None):
+    """
+    Элемент counters_data для send_watercounters / send_electrocounters
+
+    :param counter_id: counterId счетчика воды или имя зоны электросчетчика ('T1'), передается как есть
+    :param value: значение float
+    :param period: date, по умолчанию сегодня
+    """
+    return {
+        'counter_id': counter_id,
+        'period': (period or date.today()).strftime('%Y-%m-%d'),
+        'indication': '{:.2f}'.format(value).replace('.', ',')
+    }
+
+
+class Model(object):
+    __slots__ = ()
+
+    def __repr__(self):
+        return '{0}({1})'.format(type(self).__name__,
+                                 ', '.join('{0}={1!r}'.format(k, getattr(self, k)) for k in self.__slots__))
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, k) == getattr(other, k) for k in self.__slots__)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+
+class Flat(Model):
+    __slots__ = ('flat_id', 'name', 'address', 'flat_number', 'paycode', 'unom', 'unad',
+                 'electro_account', 'electro_device')
+
+    def __init__(self, flat_id, name=None, address=None, flat_number=None, paycode=None, unom=None, unad=None,
+                 electro_account=None, electro_device=None):
+        self.flat_id = flat_id
+        self.name = name
+        self.address = address
+        self.flat_number = flat_number
+        self.paycode = paycode
+        self.unom = unom
+        self.unad = unad
+        self.electro_account = electro_account
+        self.electro_device = electro_device
+
+    @classmethod
+    def from_json(cls, data):
+        """
+        :param data: элемент ответа get_flats
+        """
+        return cls(data['flat_id'], data.get('name'), data.get('address'), data.get('flat_number'),
+                   data.get('paycode'), data.get('unom'), data.get('unad'),
+                   data.get('electro_account') or None, data.get('electro_device') or None)
+
+
+class Indication(Model):
+    __slots__ = ('period', 'value')
+
+    def __init__(self, period, value):
+        self.period = period  # date
+        self.value = value  # float
+
+
+class WaterCounter(Model):
+    """
+    Счетчик воды. Показания отсортированы по периоду и хранятся в двух массивах:
+    periods (date.toordinal()) и values (float).
+    """
+    __slots__ = ('counter_id', 'num', 'type', 'checkup', 'periods', 'values')
+
+    def __init__(self, counter_id, num, type, checkup=None, indications=()):
+        """
+        :param indications: [(date, float), ...] в любом порядке
+        """
+        self.counter_id = counter_id
+        self.num = num
+        self.type = type
+        self.checkup = checkup  # date следующей поверки
+        indications = sorted(indications)
+        self.periods = array('l', [p.toordinal() for p, _ in indications])
+        self.values = array('d', [v for _, v in indications])
+
+    @classmethod
+    def from_json(cls, data):
+        """
+        :param data: элемент ['counters'] ответа get_watercounters
+        """
+        indications = [(parse_date(i['period']), parse_float(i['indication']))
+                       for i in data.get('indications') or [] if i.get('indication') not in (None, '')]
+        return cls(int(data['counterId']), data.get('num'), data.get('type'), parse_date(data.get('checkup')),
+                   indications)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, i):
+        return Indication(date.fromordinal(self.periods[i]), self.values[i])
+
+    @property
+    def indications(self):
+        return [self[i] for i in range(len(self))]
+
+    @property
+    def last(self):
+        """
+        Последнее показание или None (не передавались более 3-х месяцев)
+        """
+        if self.values:
+            return self[-1]
+
+    @property
+    def last_value(self):
+        if self.values:
+            return self.values[-1]
+
+    @property
+    def previous(self):
+        """
+        Предпоследнее показание или None
+        """
+        if len(self.values) > 1:
+            return self[-2]
+
+    def at(self, day):
+        """
+        Последнее показание на дату day (включительно) или None, O(log n)
+        """
+        i = bisect_right(self.periods, day.toordinal())
+        if i:
+            return self[i - 1]
+
+    def in_month(self, year, month):
+        """
+        Показание за месяц или None, O(log n)
+        """
+        i = bisect_right(self.periods, date(year + month // 12, month % 12 + 1, 1).toordinal() - 1)
+        if i and self.periods[i - 1] >= date(year, month, 1).toordinal():
+            return self[i - 1]
+
+    def is_verified(self, day=None):
+        """
+        Не истек ли срок поверки на дату day (по умолчанию сегодня)
+        """
+        return self.checkup is None or self.checkup >= (day or date.today())
+
+    def serialize_for_send(self, value, period=None):
+        """
+        См. Watercounter.serialize_for_send
+        """
+        return serialize_indication(self.counter_id, value, period)
+
+
+class WaterCounters(object):
+    """
+    Счетчики квартиры из ответа get_watercounters с индексами по counterId, серийному номеру и типу воды.
+
+        counters = WaterCounters.from_json(api.get_watercounters(flat_id))
+        counters.by_id[1437373].last_value
+        counters.by_num['417944'].in_month(2018, 7)
+        counters.of_type(Water.HOT)
+    """
+    __slots__ = ('counters', 'by_id', 'by_num', 'by_type')
+
+    def __init__(self, counters):
+        self.counters = list(counters)
+        self.by_id = {}
+        self.by_num = {}
+        self.by_type = {}
+        for c in self.counters:
+            self.by_id[c.counter_id] = c
+            self.by_num[c.num] = c
+            self.by_type.setdefault(c.type, []).append(c)
+
+    @classmethod
+    def from_json(cls, result):
+        """
+        :param result: ответ get_watercounters
+        """
+        return cls(water_counters(result))
+
+    def __len__(self):
+        return len(self.counters)
+
+    def __iter__(self):
+        return iter(self.counters)
+
+    def get(self, counter_id):
+        return self.by_id.get(int(counter_id))
+
+    def of_type(self, water_type):
+        """
+        :param water_type: Water.COLD или Water.HOT
+        """
+        return self.by_type.get(water_type, [])
+
+    def last_values(self):
+        """
+        :return: {counter_id: последнее показание или None}
+        """
+        return dict((c.counter_id, c.last_value) for c in self.counters)
+
+
+class ElectroAccount(Model):
+    """
+    Ответ get_electrocounters. zones - кортеж (название зоны, показание)
+    """
+    __slots__ = ('address', 'electro_account', 'electro_device', 'balance', 'is_debt', 'sh_znk', 'zones')
+
+    def __init__(self, electro_account, electro_device=None, address=None, balance=None, is_debt=None, sh_znk=None,
+                 zones=()):
+        self.electro_account = electro_account
+        self.electro_device = electro_device
+        self.address = address
+        self.balance = balance
+        self.is_debt = is_debt
+        self.sh_znk = sh_znk
+        self.zones = tuple(zones)
+
+    @classmethod
+    def from_json(cls, data):
+        zones = [(z['name'], parse_float(z.get('value'))) for z in data.get('zones') or []]
+        return cls(data.get('electro_account'), data.get('electro_device'), data.get('address'),
+                   parse_float(data.get('balance')), data.get('is_debt'), data.get('sh_znk'), zones)
+
+
+class EpdRecord(Model):
+    """
+    Элемент ответа get_epd. flat_id и period запроса, если известны
+    """
+    __slots__ = ('flat_id', 'period', 'amount', 'is_paid', 'is_debt', 'service_code', 'insurance',
+                 'amount_insurance')
+
+    def __init__(self, amount, is_paid=None, is_debt=None, service_code=None, insurance=None, amount_insurance=None,
+                 flat_id=None, period=None):
+        self.flat_id = flat_id
+        self.period = period  # date
+        self.amount = amount
+        self.is_paid = is_paid
+        self.is_debt = is_debt
+        self.service_code = service_code
+        self.insurance = insurance
+        self.amount_insurance = amount_insurance
+
+    @classmethod
+    def from_json(cls, data, flat_id=None, period=None):
+        """
+        :param period: период запроса get_epd '27.09.2018' или date
+        """
+        if period and not isinstance(period, date):
+            period = date(int(period[6:10]), int(period[3:5]), int(period[0:2]))
+        return cls(parse_float(data.get('amount')), data.get('is_paid'), data.get('is_debt'),
+                   data.get('service_code'), parse_float(data.get('insurance')),
+                   parse_float(data.get('ammount_insurance')), flat_id, period)
+
+
+class CarFine(Model):
+    __slots__ = ('series_and_number', 'date', 'offence_place', 'offence_type', 'cost', 'is_discount',
+                 'drive_license', 'sts_number', 'execution_state', 'is_fssp', 'paid')
+
+    def __init__(self, series_and_number, date=None, offence_place=None, offence_type=None, cost=None,
+                 is_discount=None, drive_license=None, sts_number=None, execution_state=None, is_fssp=None,
+                 paid=None):
+        self.series_and_number = series_and_number
+        self.date = date
+        self.offence_place = offence_place
+        self.offence_type = offence_type
+        self.cost = cost
+        self.is_discount = is_discount
+        self.drive_license = drive_license
+        self.sts_number = sts_number
+        self.execution_state = execution_state
+        self.is_fssp = is_fssp
+        self.paid = paid
+
+    @classmethod
+    def from_json(cls, data, paid=None):
+        return cls(data.get('seriesAndNumber'), parse_date(data.get('date')), data.get('offence_place'),
+                   data.get('offenceType'), parse_float(data.get('cost')), data.get('is_discount'),
+                   data.get('drive_license'), data.get('sts_number'), data.get('executionState'),
+                   data.get('is_fssp'), paid)
+
+
+def water_counters(result):
+    """
+    :param result: ответ get_watercounters
+    :return: [WaterCounter, ...]
+    """
+    return [WaterCounter.from_json(c) for c in result.get('counters') or []]
+
+
+def car_fines(result):
+    """
+    :param result: ответ get_car_fines
+    :return: [CarFine, ...], сначала неоплаченные
+    """
+    return ([CarFine.from_json(f, paid=False) for f in result.get('unpaid') or []] +
+            [CarFine.from_json(f, paid=True) for f in result.get('paid') or []])
@@ -3,12 +3,68 @@
 from __future__ import print_function
 import six
 import time
-from datetime import datetime, tzinfo
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, date, tzinfo
 import requests
 from copy import deepcopy
+from emp_mos_api.cache import ALL_TAGS, freeze, parse_tags
+from emp_mos_api.ratelimit import TokenBucket
+from emp_mos_api import retry
+from emp_mos_api.eepd import EepdScheduler
+from emp_mos_api import download
+from emp_mos_api.transport import Transport
+from emp_mos_api.codec import default_codec
+from emp_mos_api.models import serialize_indication
+
+BASE_URL = 'https://emp.mos.ru'
+API_V1_0 = BASE_URL + '/v1.0'
+API_V1_1 = BASE_URL + '/v1.1'
+
+FLAT_CLEARS_TAGS = 'WIDGETS,EPD,ELECTRO_COUNTERS,WATER_COUNTERS,APARTMENT, EPD_WIDGET,ACCRUALS_WIDGET'
+
+# Заголовки POST запросов поверх Client.headers. Словари собираются один раз в Client.__init__
+POST_HEADERS = {
+    '/auth/logout': {},
+    '/flat/addressSearch': {},
+    '/flat/delete': {'X-Clears-tags': FLAT_CLEARS_TAGS},
+    '/flat/add': {'X-Clears-tags': FLAT_CLEARS_TAGS},
+    '/watercounters/get': {'X-Clears-tags': 'WATER_COUNTERS', 'X-Cache-ov-mode': 'DEFAULT'},
+    '/watercounters/addValues': {'X-Clears-tags': 'WATER_COUNTERS'},
+    '/electrocounters/get': {'X-Clears-tags': 'ELECTRO_COUNTERS', 'X-Cache-ov-mode': 'DEFAULT'},
+    '/electrocounters/addValues': {'X-Clears-tags': 'ELECTRO_COUNTERS'},
+    '/epd/get': {'X-Clears-tags': 'EPD', 'X-Cache-ov-mode': 'DEFAULT'},
+    '/eepd/get': {},
+    '/offence/getOffence': {'X-Clears-tags': 'FORCE_NETWORK', 'X-Cache-ov-mode': 'DEFAULT'},
+}
+
+
+EpdItem = namedtuple('EpdItem', ['flat_id', 'period', 'epd', 'error'])
+
+
+def epd_periods(start, end):
+    """
+    Периоды для get_epd по месяцам от start до end включительно, с тем же днем месяца, что у start.
 
-API_V1_0 = 'https://emp.mos.ru/v1.0'
-API_V1_1 = 'https://emp.mos.ru/v1.1'
+    :param start: '10.01.2018' или date
+    :param end: '10.12.2018' или date
+    :return: ['10.01.2018', '10.02.2018', ...]
+    """
+    if not isinstance(start, date):
+        start = datetime.strptime(start, '%d.%m.%Y').date()
+    if not isinstance(end, date):
+        end = datetime.strptime(end, '%d.%m.%Y').date()
+
+    periods = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        # день не больше 28, чтобы дата существовала в любом месяце
+        periods.append('{0:02d}.{1:02d}.{2}'.format(min(start.day, 28), month, year))
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+    return periods
 
 
 class AuthException(Exception):
@@ -25,6 +81,13 @@ class EmpServerException(Exception):
             super().__init__('{0} (code:{1})'.format(self.message, self.code))
 
 
+class EmpBadResponseException(EmpServerException):
+    """
+    Ответ сервера не JSON (страница ошибки балансировщика и т.п.), code - HTTP статус
+    """
+    pass
+
+
 class EmpCounterNotVerifiedException(EmpServerException):
     """
     'errorCode' 'errorMessage'
@@ -64,15 +127,32 @@ class Client(object):
     """
     Клиента
     """
+    # ошибки, после которых запрос можно повторить (см. retry.py)
+    transient_errors = (requests.ConnectionError, requests.Timeout, EmpBadResponseException)
+
     def __init__(self, **kwargs):
         self.token = kwargs.get('token')
         self.guid = kwargs.get('guid')
 
+        # адрес сервера, например локального standin.StandInServer
+        self.base_url = kwargs.get('base_url', BASE_URL).rstrip('/')
+        self.api_v1_0 = self.base_url + '/v1.0'
+        self.api_v1_1 = self.base_url + '/v1.1'
+        host = self.base_url.split('/')[2]
+
         #requests
         self.verify = kwargs.get('verify', True)
         self.timeout = kwargs.get('timeout', 3.0)
 
         self.session_id = None  # emp mos ru
+        self.session_store = kwargs.get('session_store')  # см. session_store.py
+        self.cache = kwargs.get('cache')  # TagCache, см. cache.py
+        self.rate_limiter = kwargs.get('rate_limiter')  # RateLimiter, общий для клиентов MosAPI, см. ratelimit.py
+        self.retry_policy = kwargs.get('retry_policy')  # RetryPolicy, см. retry.py
+        self.codec = kwargs.get('codec') or default_codec()  # JSON кодек, см. codec.py
+        self.metrics = kwargs.get('metrics')  # Metrics, общий для клиентов MosAPI, см. metrics.py
+        self._credentials = None  # (telephone, pwd) для повторного login
+        self._session_resumed = False  # session_id взят из хранилища и еще не проверен
         self.user_agent = kwargs.get('user_agent', 'okhttp/3.8.1')
         self.dev_app_version = kwargs.get('dev_app_version')
         self.dev_user_agent = kwargs.get('dev_user_agent')
@@ -101,7 +181,7 @@ class Client(object):
 
         self.headers = {
             'Cache-Control': 'no-cache',
-            'Host': 'emp.mos.ru',
+            'Host': host,
             'Connection': 'Keep-Alive',
             'Accept-Encoding': 'gzip',
             'User-Agent': self.user_agent
@@ -112,7 +192,241 @@ class Client(object):
             'X-Cache-ov': '15552000',
             'X-Cache-ov-mode': 'FORCE_NETWORK'
         })
-        self.session = requests.Session()
+
+        # Шаблоны запросов: заголовки и query не меняются, тело собирается из готового
+        # префикса с info/auth и полей конкретного запроса (см. _body)
+        self._login_headers = {
+            'Content-Type': 'application/json; charset=UTF-8',
+            'Connection': 'Keep-Alive',
+            'Accept-Encoding': 'gzip',
+            'User-Agent': self.user_agent,
+            'cache-control': 'no-cache',
+            'Host': host,
+            'Accept': '*/*'
+        }
+        self._post_headers = {}
+        for path, extra in POST_HEADERS.items():
+            headers = dict(self.headers)
+            headers['Content-Type'] = 'application/json; charset=UTF-8'
+            headers.update(extra)
+            self._post_headers[path] = headers
+        self._token_params = {'token': self.token}
+        self._set_session(self.session_id)
+
+        self.transport = kwargs.get('transport')  # общий пул соединений, см. transport.py
+        self.logout_queue = kwargs.get('logout_queue')  # LogoutQueue для отложенного logout, см. logout_queue.py
+        self.session = self._new_session()
+
+    def _new_session(self):
+        if self.transport is not None:
+            return self.transport.new_session()
+        return requests.Session()
+
+    def __getstate__(self):
+        """
+        Клиента можно передать в другой процесс (pickle) вместе с session_id.
+        HTTP сессия и пароль не сериализуются.
+        """
+        state = self.__dict__.copy()
+        state['session'] = None
+        state['_credentials'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.session = self._new_session()
+
+    def _set_session(self, session_id):
+        self.session_id = session_id
+        self.post_request_data['auth']['session_id'] = session_id
+        self._session_params = {
+            'token': self.token,
+            'info[guid]': self.guid,
+            'auth[session_id]': session_id
+        }
+        self._body_prefix = self.codec.dumps(self.post_request_data)[:-1]
+
+    def _data(self, json, fields):
+        """
+        Тело запроса в байтах: fields с info/auth или json целиком
+        """
+        if fields is not None:
+            return self._body(fields)
+        if json is not None:
+            return self.codec.dumps(json)
+
+    def _body(self, fields):
+        """
+        Тело POST запроса: {"info":{..},"auth":{..}} + поля запроса.
+        info/auth закодированы заранее в _set_session.
+        """
+        if not fields:
+            return self._body_prefix + b'}'
+        return self._body_prefix + b',' + self.codec.dumps(fields)[1:]
+
+    def _store_key(self):
+        if self.session_store and self._credentials:
+            return self.session_store.key(self._credentials[0], self.guid)
+
+    @property
+    def telephone(self):
+        """
+        Телефон, с которым выполнен login или resume (None, если неизвестен)
+        """
+        if self._credentials:
+            return self._credentials[0]
+
+    def resume(self, session_id, telephone=None, pwd=None):
+        """
+        Продолжить сессию, полученную ранее (из хранилища или другого процесса).
+        Сессия проверяется при первом запросе. Если указаны telephone и pwd,
+        то на ответ 401 клиент сам сделает login и повторит запрос.
+        """
+        if telephone is not None:
+            self._credentials = (telephone, pwd)
+        self._set_session(session_id)
+        self._session_resumed = True
+
+    def _can_relogin(self):
+        return self._session_resumed and self._credentials is not None
+
+    def _refresh_auth(self, params):
+        """
+        Подставить новый session_id в query уже собранного запроса.
+        Тело запроса собирается в _send, там session_id уже новый.
+        """
+        if params and 'auth[session_id]' in params:
+            params = dict(params)
+            params['auth[session_id]'] = self.session_id
+        return params
+
+    def _request(self, method, url, params=None, headers=None, json=None, fields=None, timeout=None,
+                 callback=None, cache_tags=None, precheck=None):
+        """
+        Единая точка обращения к серверу. Все методы клиента возвращают результат этой функции,
+        поэтому AsyncClient, переопределив _perform, получает awaitable версии всех методов.
+
+        :param params, headers: шаблоны из __init__/_set_session, не изменяются
+        :param json: тело запроса целиком (только login)
+        :param fields: поля тела запроса, к которым добавляются info и auth
+
+        :param callback: обработчик ответа после raise_for_status, по умолчанию возвращает response['result']
+        :param cache_tags: теги для кэширования ответа. Если не заданы, то после успешного запроса
+            из кэша удаляются теги из заголовка X-Clears-tags
+        :param precheck: (fetch, accepted) для неидемпотентных запросов: после сетевой ошибки
+            accepted(fetch()) проверяет, принял ли сервер запрос. Без precheck запись не повторяется.
+        """
+        if self.cache is not None:
+            if cache_tags:
+                key = (method, url, self.session_id, freeze(params), freeze(fields))
+                hit, value = self.cache.get(key)
+                if hit:
+                    return self._done(value)
+                callback = self._caching(callback, key, cache_tags)
+            elif headers and 'X-Clears-tags' in headers:
+                callback = self._invalidating(callback, parse_tags(headers['X-Clears-tags']))
+        return self._perform(method, url, params, headers, json, fields, timeout, callback, precheck)
+
+    def _scoped_tags(self, tags):
+        return [(self.session_id, tag) for tag in tags]
+
+    def _caching(self, callback, key, tags):
+        tags = self._scoped_tags(list(tags) + [ALL_TAGS])
+
+        def cache_result(response):
+            result = callback(response) if callback else response['result']
+            if result != []:  # пустой ЕПД сервер иногда отдает временно, его повторяют (get_epd_range)
+                self.cache.set(key, result, tags)
+            return result
+        return cache_result
+
+    def _invalidating(self, callback, tags):
+        def invalidate(response):
+            self.cache.invalidate(self._scoped_tags(tags))
+            return callback(response) if callback else response['result']
+        return invalidate
+
+    def _can_retry(self, url, attempt, precheck):
+        """
+        :param attempt: сколько попыток уже неудачны
+        """
+        policy = self.retry_policy
+        if policy is None or attempt >= policy.attempts:
+            return False
+        return policy.is_idempotent(url) or precheck is not None
+
+    def _before_precheck(self, headers):
+        """
+        Запрос на изменение мог дойти до сервера: кэш его тегов больше не верен
+        """
+        if self.cache is not None and headers and 'X-Clears-tags' in headers:
+            self.cache.invalidate(self._scoped_tags(parse_tags(headers['X-Clears-tags'])))
+
+    def _perform(self, method, url, params, headers, json, fields, timeout, callback, precheck=None):
+        attempt = 0
+        while True:
+            try:
+                return self._send(method, url, params, headers, json, fields, timeout, callback)
+            except AuthException:
+                if not self._can_relogin():
+                    raise
+                self._session_resumed = False
+                self._virtual_login(*self._credentials)
+                params = self._refresh_auth(params)
+            except self.transient_errors as err:
+                attempt += 1
+                if not self._can_retry(url, attempt, precheck):
+                    raise
+                time.sleep(self.retry_policy.delay(attempt))
+                if precheck is not None and not self.retry_policy.is_idempotent(url):
+                    self._before_precheck(headers)
+                    fetch, accepted = precheck
+                    try:
+                        done = accepted(fetch())
+                    except Exception:
+                        raise err
+                    if done:
+                        return None
+
+    def _send(self, method, url, params, headers, json, fields, timeout, callback):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(url, self.token)
+        data = self._data(json, fields)
+        started = time.time()
+        try:
+            ret = self.session.request(method, url,
+                                       params=params,
+                                       headers=headers,
+                                       verify=self.verify,
+                                       timeout=timeout or self.timeout,
+                                       data=data)
+        except Exception as e:
+            if self.metrics is not None:
+                self.metrics.observe(url, time.time() - started, error=e, bytes_out=len(data or b''))
+            raise
+        elapsed = time.time() - started
+        try:
+            response = self.codec.loads(ret.content)
+        except ValueError:
+            response = None
+        if self.metrics is not None:
+            self.metrics.observe(url, elapsed, response, bytes_out=len(data or b''), bytes_in=len(ret.content))
+        if response is None:
+            raise EmpBadResponseException(ret.text[:200], ret.status_code)
+        return self._handle_response(response, callback)
+
+    def _handle_response(self, response, callback=None):
+        self.raise_for_status(response)
+        self._session_resumed = False
+        if callback:
+            return callback(response)
+        return response['result']
+
+    def _done(self, value):
+        """
+        Результат, полученный без обращения к серверу
+        """
+        return value
 
     def raise_for_status(self, answer):
         """
@@ -127,7 +441,7 @@ class Client(object):
         }
         :return:
         """
-        # print('Exec time:', answer['execTime'])
+        # execTime (время обработки на сервере) собирает metrics в _send
 
         code = answer['errorCode']
         msg = answer['errorMessage'] if 'errorMessage' in answer and answer['errorMessage'] else ''
@@ -166,7 +480,18 @@ class Client(object):
             u'session_id': u'6c3333333c33333e44e21e7d43c46e03'},
             u'request_id': u'UN=PRO-12345678-1234-1234-1234-123456789123'
         }
+
+        Если задан session_store и в нем есть сессия для telephone, запроса к серверу не будет.
         """
+        self._credentials = (telephone, pwd)
+        if self.session_store:
+            saved = self.session_store.load(self._store_key())
+            if saved:
+                self.resume(saved['session_id'])
+                return self._done(saved.get('result'))
+        return self._virtual_login(telephone, pwd)
+
+    def _virtual_login(self, telephone, pwd):
         login_data = {
             'device_info': {
                 'guid': self.guid,
@@ -181,23 +506,20 @@ class Client(object):
             }
         }
 
-        ret = self.session.post(API_V1_0 + '/auth/virtualLogin',
-                     params={'token': self.token},
-                     headers={'Content-Type': 'application/json; charset=UTF-8',
-                              'Connection': 'Keep-Alive',
-                              'Accept-Encoding': 'gzip',
-                              'User-Agent': self.user_agent,
-                              'cache-control': 'no-cache',
-                              'Host': 'emp.mos.ru',
-                              'Accept': '*/*'},
-                     verify=self.verify,
-                     timeout=self.timeout,
-                     json=login_data)
-
-        response = ret.json()
-        self.raise_for_status(response)
-        self.session_id = response['session_id']
-        self.post_request_data['auth']['session_id'] = self.session_id
+        return self._request('POST', self.api_v1_0 + '/auth/virtualLogin',
+                             params=self._token_params,
+                             headers=self._login_headers,
+                             json=login_data,
+                             callback=self._on_login)
+
+    def _on_login(self, response):
+        self._set_session(response['session_id'])
+        if self.session_store:
+            self.session_store.save(self._store_key(), {
+                'session_id': self.session_id,
+                'result': response['result'],
+                'saved': time.time()
+            })
         return response['result']
 
     def get_profile(self):
@@ -216,18 +538,11 @@ class Client(object):
         """
         assert self.session_id
 
-        ret = self.session.get(API_V1_0 + '/profile/get',
-                                params={'token': self.token,
-                                        'info[guid]': self.guid,
-                                        'auth[session_id]': self.session_id
-                                        },
-                                headers=self.pheaders,
-                                verify=self.verify,
-                                timeout=self.timeout)
-
-        response = ret.json()
-        self.raise_for_status(response)
-        return response['result']['profile']
+        return self._request('GET', self.api_v1_0 + '/profile/get',
+                             params=self._session_params,
+                             headers=self.pheaders,
+                             callback=lambda response: response['result']['profile'],
+                             cache_tags=['PROFILE'])
 
     def get_flats(self):
         """
@@ -247,18 +562,10 @@ class Client(object):
         """
         assert self.session_id
 
-        ret = self.session.get(API_V1_0 + '/flat/get',
-                                params={'token': self.token,
-                                        'info[guid]': self.guid,
-                                        'auth[session_id]': self.session_id
-                                        },
-                                headers=self.pheaders,
-                                verify=self.verify,
-                                timeout = self.timeout)
-
-        response = ret.json()
-        self.raise_for_status(response)
-        return response['result']
+        return self._request('GET', self.api_v1_0 + '/flat/get',
+                             params=self._session_params,
+                             headers=self.pheaders,
+                             cache_tags=['APARTMENT'])
 
     def address_search(self, pattern, limit=100):
         """
@@ -275,25 +582,15 @@ class Client(object):
         }
         """
         assert self.session_id
-        wheaders = deepcopy(self.headers)
-        wheaders.update({'Content-Type': 'application/json; charset=UTF-8'})
-
-        wcrequest = deepcopy(self.post_request_data)
-        wcrequest.update({
+        wcrequest = {
             'limit': limit,
             'pattern': pattern,
-        })
+        }
 
-        ret = self.session.post(API_V1_1 + '/flat/addressSearch',
-                                 params={'token': self.token},
-                                 headers=wheaders,
-                                 verify=self.verify,
-                                 timeout=self.timeout,
-                                 json=wcrequest)
-
-        response = ret.json()
-        self.raise_for_status(response)
-        return response['result']
+        return self._request('POST', self.api_v1_1 + '/flat/addressSearch',
+                             params=self._token_params,
+                             headers=self._post_headers['/flat/addressSearch'],
+                             fields=wcrequest)
 
     def flat_delete(self, flat_id):
         """
@@ -304,26 +601,15 @@ class Client(object):
         """
 
         assert self.session_id
-        wheaders = deepcopy(self.headers)
-        wheaders.update({
-                'X-Clears-tags': 'WIDGETS,EPD,ELECTRO_COUNTERS,WATER_COUNTERS,APARTMENT, EPD_WIDGET,ACCRUALS_WIDGET',
-                'Content-Type': 'application/json; charset=UTF-8' })
-
-        wcrequest = deepcopy(self.post_request_data)
-        wcrequest.update({
+        wcrequest = {
             'flat_id': flat_id
-        })
-
-        ret = self.session.post(API_V1_0 + '/flat/delete',
-                                params={'token': self.token},
-                                headers=wheaders,
-                                verify=self.verify,
-                                timeout=self.timeout,
-                                json=wcrequest)
+        }
 
-        response = ret.json()
-        self.raise_for_status(response)
-        return response['result']
+        return self._request('POST', self.api_v1_0 + '/flat/delete',
+                             params=self._token_params,
+                             headers=self._post_headers['/flat/delete'],
+                             fields=wcrequest,
+                             precheck=(self.get_flats, lambda flats: retry.flat_deleted(flats, flat_id)))
 
     def flat_add(self, name, unom, unad, address, flat_number, paycode):
         """
@@ -359,14 +645,7 @@ class Client(object):
         }
         """
         assert self.session_id
-        wheaders = deepcopy(self.headers)
-        wheaders.update({
-                'X-Clears-tags': 'WIDGETS,EPD,ELECTRO_COUNTERS,WATER_COUNTERS,APARTMENT, EPD_WIDGET,ACCRUALS_WIDGET',
-                'Content-Type': 'application/json; charset=UTF-8'
-        })
-
-        wcrequest = deepcopy(self.post_request_data)
-        wcrequest.update({
+        wcrequest = {
             'a': 0,
             'address': address,
             'can_update': False,
@@ -375,18 +654,13 @@ class Client(object):
             'paycode': paycode,
             'unad': unad,
             'unom': unom
-        })
+        }
 
-        ret = self.session.post(API_V1_0 + '/flat/add',
-                                params={'token': self.token},
-                                headers=wheaders,
-                                verify=self.verify,
-                                timeout=self.timeout,
-                                json=wcrequest)
-
-        response = ret.json()
-        self.raise_for_status(response)
-        return response['result']
+        return self._request('POST', self.api_v1_0 + '/flat/add',
+                             params=self._token_params,
+                             headers=self._post_headers['/flat/add'],
+                             fields=wcrequest,
+                             precheck=(self.get_flats, lambda flats: retry.flat_added(flats, paycode, flat_number)))
 
     def get_watercounters(self, flat_id):
         """
@@ -433,28 +707,16 @@ class Client(object):
         }
         """
         assert self.session_id
-        wheaders = deepcopy(self.headers)
-        wheaders.update({
-                'X-Clears-tags': 'WATER_COUNTERS',
-                'X-Cache-ov-mode': 'DEFAULT',
-                'Content-Type': 'application/json; charset=UTF-8' })
-
-        wcrequest = deepcopy(self.post_request_data)
-        wcrequest.update({
+        wcrequest = {
             'flat_id': flat_id,
             'is_widget': False
-        })
+        }
 
-        ret = self.session.post(API_V1_0 + '/watercounters/get',
-                                 params={'token': self.token},
-                                 headers=wheaders,
-                                 verify=self.verify,
-                                 timeout=self.timeout,
-                                 json=wcrequest)
-
-        response = ret.json()
-        self.raise_for_status(response)
-        return response['result']
+        return self._request('POST', self.api_v1_0 + '/watercounters/get',
+                             params=self._token_params,
+                             headers=self._post_headers['/watercounters/get'],
+                             fields=wcrequest,
+                             cache_tags=['WATER_COUNTERS'])
 
     def send_watercounters(self, flat_id, counters_data):
         """
@@ -471,28 +733,17 @@ class Client(object):
         """
         assert self.session_id
 
-        wheaders = deepcopy(self.headers)
-        wheaders.update({
-                'X-Clears-tags': 'WATER_COUNTERS',
-                'Content-Type': 'application/json; charset=UTF-8'
-            })
-
-        wcrequest = deepcopy(self.post_request_data)
-        wcrequest.update({
+        wcrequest = {
             'flat_id': flat_id,
             'counters_data': counters_data
-        })
+        }
 
-        ret = self.session.post(API_V1_0 + '/watercounters/addValues',
-                                                     params={'token': self.token},
-                                                     headers=wheaders,
-                                                     verify=self.verify,
-                                                     timeout=self.timeout,
-                                                     json=wcrequest)
-
-        response = ret.json()
-        self.raise_for_status(response)
-        return response['result']
+        return self._request('POST', self.api_v1_0 + '/watercounters/addValues',
+                             params=self._token_params,
+                             headers=self._post_headers['/watercounters/addValues'],
+                             fields=wcrequest,
+                             precheck=(lambda: self.get_watercounters(flat_id),
+                                       lambda result: retry.watercounters_accepted(result, counters_data)))
 
     def get_electrocounters(self, flat_id):
         """
@@ -518,28 +769,16 @@ class Client(object):
         }
         """
         assert self.session_id
-        wheaders = deepcopy(self.headers)
-        wheaders.update({
-                'X-Clears-tags': 'ELECTRO_COUNTERS',
-                'X-Cache-ov-mode': 'DEFAULT',
-                'Content-Type': 'application/json; charset=UTF-8' })
-
-        wcrequest = deepcopy(self.post_request_data)
-        wcrequest.update({
+        wcrequest = {
             'flat_id': flat_id,
             'is_widget': False,
-        })
-
-        ret = self.session.post(API_V1_0 + '/electrocounters/get',
-                                 params={'token': self.token},
-                                 headers=wheaders,
-                                 verify=self.verify,
-                                 timeout=self.timeout,
-                                 json=wcrequest)
+        }
 
-        response = ret.json()
-        self.raise_for_status(response)
-        return response['result']
+        return self._request('POST', self.api_v1_0 + '/electrocounters/get',
+                             params=self._token_params,
+                             headers=self._post_headers['/electrocounters/get'],
+                             fields=wcrequest,
+                             cache_tags=['ELECTRO_COUNTERS'])
 
     def send_electrocounters(self, flat_id, counters_data):
         """
@@ -556,28 +795,17 @@ class Client(object):
         """
         assert self.session_id
 
-        wheaders = deepcopy(self.headers)
-        wheaders.update({
-                'X-Clears-tags': 'ELECTRO_COUNTERS',
-                'Content-Type': 'application/json; charset=UTF-8'
-            })
-
-        wcrequest = deepcopy(self.post_request_data)
-        wcrequest.update({
+        wcrequest = {
             'flat_id': flat_id,
             'counters_data': counters_data
-        })
+        }
 
-        ret = self.session.post(API_V1_0 + '/electrocounters/addValues',
-                                                     params={'token': self.token},
-                                                     headers=wheaders,
-                                                     verify=self.verify,
-                                                     timeout=self.timeout,
-                                                     json=wcrequest)
-
-        response = ret.json()
-        self.raise_for_status(response)
-        return response['result']
+        return self._request('POST', self.api_v1_0 + '/electrocounters/addValues',
+                             params=self._token_params,
+                             headers=self._post_headers['/electrocounters/addValues'],
+                             fields=wcrequest,
+                             precheck=(lambda: self.get_electrocounters(flat_id),
+                                       lambda result: retry.electrocounters_accepted(result, counters_data)))
 
     def get_epd(self, flat_id, period, is_debt=True):
         """
@@ -586,39 +814,67 @@ class Client(object):
         :param period: unicode string represents date in 27.09.2018 format
         :param is_debt: True/False
         :return:
-        {
+        [{
             "is_debt": true,
             "is_paid": true,
             "amount": 2982.77,
             "service_code": "emp.zkh",
             "insurance": 61.93,
             "ammount_insurance": 3044.7
-        }
+        }]
         """
         assert self.session_id
-        wheaders = deepcopy(self.headers)
-        wheaders.update({
-                'X-Clears-tags': 'EPD',
-                'X-Cache-ov-mode': 'DEFAULT',
-                'Content-Type': 'application/json; charset=UTF-8' })
-
-        wcrequest = deepcopy(self.post_request_data)
-        wcrequest.update({
+        wcrequest = {
             'flat_id': flat_id,
             'period': period,
             'is_debt': is_debt,
-        })
+        }
 
-        ret = self.session.post(API_V1_1 + '/epd/get',
-                                 params={'token': self.token},
-                                 headers=wheaders,
-                                 verify=self.verify,
-                                 timeout=self.timeout,
-                                 json=wcrequest)
+        return self._request('POST', self.api_v1_1 + '/epd/get',
+                             params=self._token_params,
+                             headers=self._post_headers['/epd/get'],
+                             fields=wcrequest,
+                             cache_tags=['EPD'])
 
-        response = ret.json()
-        self.raise_for_status(response)
-        return response['result']
+    def get_epd_range(self, flat_ids, start, end, is_debt=True, workers=4, rate=2.0, retries=3, backoff=1.0):
+        """
+        ЕПД по всем квартирам за все месяцы от start до end. Запросы выполняются параллельно,
+        но не чаще rate в секунду. Пустой ответ ([]) сервер иногда отдает для существующего ЕПД,
+        такие запросы повторяются с паузой backoff, 2 * backoff, ...
+
+        :param flat_ids: список flat_id
+        :param start: первый период, '10.01.2018' или date (см. epd_periods)
+        :param end: последний период
+        :return: генератор EpdItem(flat_id, period, epd, error) в порядке получения.
+            Если перестать его читать (break, close), еще не начатые запросы отменяются,
+            а выполняющиеся не повторяются.
+        """
+        jobs = [(flat_id, period) for flat_id in flat_ids for period in epd_periods(start, end)]
+        bucket = TokenBucket(rate, 1)
+        stopped = threading.Event()
+
+        def fetch(flat_id, period):
+            epd = []
+            for attempt in range(retries + 1):
+                if attempt and stopped.wait(backoff * 2 ** (attempt - 1)):
+                    break
+                bucket.acquire()
+                epd = self.get_epd(flat_id, period, is_debt)
+                if epd != []:
+                    break
+            return epd
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = dict((executor.submit(fetch, flat_id, period), (flat_id, period)) for flat_id, period in jobs)
+            try:
+                for future in as_completed(futures):
+                    flat_id, period = futures[future]
+                    error = future.exception()
+                    yield EpdItem(flat_id, period, None if error else future.result(), error)
+            finally:
+                stopped.set()
+                for future in futures:
+                    future.cancel()
 
     def get_eepd(self, flat_id, period, epd_type='current', rid=None):
         """
@@ -670,30 +926,19 @@ class Client(object):
 
         """
         assert self.session_id
-        wheaders = deepcopy(self.headers)
-        wheaders.update({
-                'Content-Type': 'application/json; charset=UTF-8'})
-
-        wcrequest = deepcopy(self.post_request_data)
-        wcrequest.update({
+        wcrequest = {
             'flat_id': flat_id,
             'period': period,
             'type': epd_type,
-        })
+        }
 
         if rid:
-            wcrequest.update({'rid': rid})
+            wcrequest['rid'] = rid
 
-        ret = self.session.post(API_V1_0 + '/eepd/get',
-                                 params={'token': self.token},
-                                 headers=wheaders,
-                                 verify=self.verify,
-                                 timeout=self.timeout,
-                                 json=wcrequest)
-
-        response = ret.json()
-        self.raise_for_status(response)
-        return response['result']
+        return self._request('POST', self.api_v1_0 + '/eepd/get',
+                             params=self._token_params,
+                             headers=self._post_headers['/eepd/get'],
+                             fields=wcrequest)
 
     def get_eepd_wait_result(self, flat_id, period, timeout=10.0):
         """
@@ -720,6 +965,64 @@ class Client(object):
 
         return result
 
+    def get_eepd_many(self, flats_periods, epd_type='current', **kwargs):
+        """
+        Запросить электронные ЕПД по многим квартирам сразу, не дожидаясь каждого.
+        Документы опрашиваются с растущим интервалом пулом потоков (см. eepd.EepdScheduler).
+
+        :param flats_periods: [(flat_id, period), ...]
+        :param kwargs: workers, first_delay, max_delay, factor, timeout для EepdScheduler
+        :return: список concurrent.futures.Future, результат - ответ get_eepd с 'pdf' или None по таймауту
+        """
+        return EepdScheduler(self, **kwargs).submit_many(flats_periods, epd_type)
+
+    def download_eepd(self, eepd, sink, resume=True, etag=None, last_modified=None,
+                      chunk_size=download.CHUNK_SIZE, timeout=None):
+        """
+        Скачать pdf электронного ЕПД кусками, не загружая документ в память.
+
+        :param eepd: ответ get_eepd с 'pdf' или ссылка на pdf
+        :param sink: путь к файлу или file-like объект (write)
+        :param resume: докачать, если файл sink уже есть (Range + If-Range, нужен etag или last_modified)
+        :param etag, last_modified: из прошлого DownloadResult, чтобы не качать неизмененный документ (304)
+                                    и не докачивать измененный (200, файл пишется заново)
+        :return: download.DownloadResult
+        """
+        url = download.pdf_url(eepd)
+        headers, _ = download.request_headers(sink, resume, etag, last_modified)
+        headers['User-Agent'] = self.user_agent
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(url, self.token)
+        ret = self.session.get(url, headers=headers, stream=True, verify=self.verify, timeout=timeout or self.timeout)
+        try:
+            size = 0
+            if download.has_body(ret.status_code):
+                with download.Sink(sink, ret.status_code) as out:
+                    for chunk in ret.iter_content(chunk_size):
+                        out.write(chunk)
+                size = out.size
+            elif ret.status_code not in (304, 416):
+                ret.raise_for_status()
+            return download.DownloadResult(url, ret.status_code, size,
+                                           ret.headers.get('ETag', etag), ret.headers.get('Last-Modified', last_modified))
+        finally:
+            ret.close()
+
+    def download_eepd_many(self, items, workers=4, **kwargs):
+        """
+        Скачать много документов параллельно.
+
+        :param items: [(eepd или ссылка, sink), ...]
+        :param kwargs: параметры download_eepd
+        :return: генератор (sink, DownloadResult, исключение) в порядке завершения
+        """
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = dict((executor.submit(self.download_eepd, eepd, sink, **kwargs), sink) for eepd, sink in items)
+            for future in as_completed(futures):
+                error = future.exception()
+                yield futures[future], None if error else future.result(), error
+
     def get_car_fines(self, sts_number):
         """
         :param sts_number: unicode string contains car sts_numer
@@ -741,45 +1044,49 @@ class Client(object):
         }
         """
         assert self.session_id
-        wheaders = deepcopy(self.headers)
-        wheaders.update({
-                'X-Clears-tags': 'FORCE_NETWORK',
-                'X-Cache-ov-mode': 'DEFAULT',
-                'Content-Type': 'application/json; charset=UTF-8'})
-
-        wcrequest = deepcopy(self.post_request_data)
-        wcrequest.update({
+        wcrequest = {
             'sts_number': sts_number
-        })
+        }
 
-        ret = self.session.post(API_V1_0 + '/offence/getOffence',
-                                 params={'token': self.token},
-                                 headers=wheaders,
-                                 verify=self.verify,
-                                 timeout=self.timeout,
-                                 json=wcrequest)
-
-        response = ret.json()
-        self.raise_for_status(response)
-        return response['result']
+        return self._request('POST', self.api_v1_0 + '/offence/getOffence',
+                             params=self._token_params,
+                             headers=self._post_headers['/offence/getOffence'],
+                             fields=wcrequest)
 
     def logout(self, timeout=None):
         """
         Почему то очень долго выполняется (5 сек)
+
+        Если задан logout_queue, сессия закрывается локально сразу, а запрос к серверу
+        отправляется в фоне.
         """
         if self.session_id:
-            logout_data = deepcopy(self.post_request_data)
-
-            ret = self.session.post(API_V1_0 + '/auth/logout',
-                         params={'token': self.token},
-                         headers=self.headers,
-                         timeout=timeout or self.timeout,
-                         json=logout_data)
-
-            response = ret.json()
-            self.raise_for_status(response)
-            self.session_id = None
-            return response['result']
+            if self.session_store and self._credentials:
+                self.session_store.delete(self._store_key())
+
+            if self.logout_queue is not None:
+                self.logout_queue.put(self.api_v1_0 + '/auth/logout',
+                                      self._token_params,
+                                      self._post_headers['/auth/logout'],
+                                      self._body({}),
+                                      verify=self.verify,
+                                      timeout=timeout or self.timeout)
+                self._on_logout({'result': None})
+                return self._done(None)
+
+            return self._request('POST', self.api_v1_0 + '/auth/logout',
+                                 params=self._token_params,
+                                 headers=self._post_headers['/auth/logout'],
+                                 fields={},
+                                 timeout=timeout,
+                                 callback=self._on_logout)
+        return self._done(None)
+
+    def _on_logout(self, response):
+        if self.cache is not None:
+            self.cache.invalidate(self._scoped_tags([ALL_TAGS]))
+        self._set_session(None)
+        return response['result']
 
 
 class MosAPI(object):
@@ -788,23 +1095,47 @@ class MosAPI(object):
 
     token:           уникальный ключ приложения
     guid:            некий уникальный ключ
+    base_url:        адрес сервера, по умолчанию https://emp.mos.ru (см. standin.py)
     https_verify:    ключ verify в GET, POST запросах, по умолчанию 'False'
+    retry_policy:    RetryPolicy, повтор запросов при сетевых ошибках
+    rate_limiter:    RateLimiter, один на все клиенты MosAPI
+    transport:       Transport, пул соединений всех клиентов MosAPI. По умолчанию создается свой
+    logout_queue:    LogoutQueue, logout в фоне
+    metrics:         Metrics, счетчики и время запросов всех клиентов MosAPI
     timeout:         ключ timeout в GET, POST запросах
     user_agent:      версия веб клиента
     dev_user_agent: 'Android' для ОС Android
     dev_app_version: версия ОС
     """
+    client_class = Client
+    transport_class = Transport
 
     def __init__(self, **kwargs):
+        if kwargs.get('transport') is None:
+            kwargs['transport'] = self.transport_class()
         self.kwargs = kwargs
-        self._clients = {'default': Client(**kwargs)}
+        self.transport = kwargs['transport']
+        self._clients = {'default': self.client_class(**kwargs)}
+        self._clients_lock = threading.Lock()
 
     def client(self, client_id='default', **kwargs):
-        if client_id and client_id not in self._clients:
-            k = self.kwargs
-            k.update(kwargs)
-            self._clients[client_id] = Client(**k)
-        return self._clients[client_id]
+        """
+        Клиент для отдельного аккаунта. Создается при первом обращении, потокобезопасно.
+        :param kwargs: дополняют kwargs MosAPI для нового клиента
+        """
+        with self._clients_lock:
+            if client_id and client_id not in self._clients:
+                k = dict(self.kwargs)
+                k.update(kwargs)
+                self._clients[client_id] = self.client_class(**k)
+            return self._clients[client_id]
+
+    def drop_client(self, client_id):
+        """
+        Забыть клиента (не делает logout)
+        """
+        with self._clients_lock:
+            return self._clients.pop(client_id, None)
 
     # if only one client
     def is_active(self):
@@ -850,10 +1181,25 @@ class MosAPI(object):
     def get_epd(self, *args):
         return self.client().get_epd(*args)
 
+    def get_epd_range(self, *args, **kwargs):
+        return self.client().get_epd_range(*args, **kwargs)
+
     # Сформировать pdf Единый платежный документ
+    def get_eepd(self, *args):
+        return self.client().get_eepd(*args)
+
     def get_eepd_wait_result(self, *args):
         return self.client().get_eepd_wait_result(*args)
 
+    def get_eepd_many(self, *args, **kwargs):
+        return self.client().get_eepd_many(*args, **kwargs)
+
+    def download_eepd(self, *args, **kwargs):
+        return self.client().download_eepd(*args, **kwargs)
+
+    def download_eepd_many(self, *args, **kwargs):
+        return self.client().download_eepd_many(*args, **kwargs)
+
     # Штрафы
     def get_car_fines(self, *args):
         return self.client().get_car_fines(*args)
@@ -895,20 +1241,21 @@ class Watercounter:
     list(filter(lambda x: x['num'] == num, response['counters']))
     list(filter(lambda x: x['counterId'] == id, response['counters']))
     list(filter(lambda x: x['type'] == water_type_id, response['counters']))
+
+    Для частых поисков - индекс models.WaterCounters.from_json(response)
     """
 
     @staticmethod
     def last_value(counter):
         """
         alphabetical sort data =)
-        :param counter: counter JSON
+        :param counter: counter JSON, не изменяется
         :return: float or None
         None - когда показания не сданы более 3-х месяцев
         """
         indications = counter['indications']
-        indications.sort(key=lambda x: x['period'])
         if indications:
-            return float(indications[-1]['indication'])
+            return float(max(indications, key=lambda x: x['period'])['indication'])
 
     @staticmethod
     def water_title(counter):
@@ -929,14 +1276,11 @@ class Watercounter:
         return d
 
     @staticmethod
-    def serialize_for_send(counter, value):
+    def serialize_for_send(counter, value, period=None):
         """
         :param counterId: id счетчика. не номер из приложения!
         :param value: значение float
+        :param period: date, по умолчанию сегодня
         :return: dict
         """
-        return {
-            'counter_id': int(counter['counterId']),
-            'period': datetime.now().strftime("%Y-%m-%d"),
-            'indication': '{:.2f}'.format(value).replace('.', ',')
-        }
+        return serialize_indication(int(counter['counterId']), value, period)
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Ограничение частоты запросов к emp.mos.ru, общее для всех клиентов MosAPI.
+
+    limiter = RateLimiter(host=(10, 20), classes={'write': (1, 2)}, token=(5, 10))
+    api = MosAPI(token=..., guid=..., rate_limiter=limiter)
+
+Каждый лимит задается парой (запросов в секунду, размер всплеска).
+Запрос ждет, пока не освободится место во всех подходящих ведрах: хоста, класса запроса
+('auth', 'read', 'write') и токена приложения.
+"""
+from __future__ import print_function
+import threading
+import time
+
+
+def endpoint_class(url):
+    """
+    :return: 'auth', 'write' или 'read'
+    """
+    if '/auth/' in url:
+        return 'auth'
+    if url.endswith('/addValues') or url.endswith('/flat/add') or url.endswith('/flat/delete'):
+        return 'write'
+    return 'read'
+
+
+def url_host(url):
+    """
+    'https://emp.mos.ru/v1.0/flat/get' -> 'emp.mos.ru'
+    """
+    return url.split('/')[2] if '://' in url else url.split('/')[0]
+
+
+class TokenBucket(object):
+    """
+    Ведро токенов: в среднем rate запросов в секунду, подряд не больше burst.
+
+    reserve() сразу забирает токен (допускается долг) и возвращает, сколько секунд нужно подождать,
+    поэтому одно ведро подходит и для потоков (acquire), и для asyncio (await asyncio.sleep(reserve())).
+    """
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1))
+        self._tokens = self.burst
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def reserve(self, n=1):
+        """
+        :return: задержка в секундах до разрешенного момента запроса
+        """
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= n
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, n=1):
+        delay = self.reserve(n)
+        if delay > 0:
+            time.sleep(delay)
+
+    def __getstate__(self):
+        return {'rate': self.rate, 'burst': self.burst}
+
+    def __setstate__(self, state):
+        self.__init__(state['rate'], state['burst'])
+
+
+class RateLimiter(object):
+    """
+    Набор ведер по хостам, классам запросов и токенам приложения.
+    Ведра создаются при первом обращении, объект потокобезопасен.
+
+    :param host: (rate, burst) для каждого хоста или None
+    :param classes: {'auth': (rate, burst), 'read': ..., 'write': ...}, можно не все
+    :param token: (rate, burst) для каждого token приложения или None
+    """
+    def __init__(self, host=None, classes=None, token=None):
+        self.host = host
+        self.classes = classes or {}
+        self.token = token
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, key, limit):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(*limit)
+            return bucket
+
+    def buckets(self, url, token=None):
+        buckets = []
+        host = url_host(url)
+        if self.host:
+            buckets.append(self._bucket(('host', host), self.host))
+        cls = endpoint_class(url)
+        if cls in self.classes:
+            buckets.append(self._bucket(('class', host, cls), self.classes[cls]))
+        if self.token and token:
+            buckets.append(self._bucket(('token', token), self.token))
+        return buckets
+
+    def reserve(self, url, token=None):
+        """
+        Занять место во всех ведрах запроса.
+        :return: задержка в секундах
+        """
+        delay = 0.0
+        for bucket in self.buckets(url, token):
+            delay = max(delay, bucket.reserve())
+        return delay
+
+    def acquire(self, url, token=None):
+        delay = self.reserve(url, token)
+        if delay > 0:
+            time.sleep(delay)
+
+    def __getstate__(self):
+        return {'host': self.host, 'classes': self.classes, 'token': self.token}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
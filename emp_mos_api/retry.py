@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Повтор запросов при сетевых ошибках и ответах не в JSON.
+
+    api = MosAPI(token=..., guid=..., retry_policy=RetryPolicy(attempts=4))
+
+Чтение (IDEMPOTENT) повторяется всегда. Запись (addValues, flat/add, flat/delete)
+повторяется только если после ошибки проверка на сервере показала, что значение не принято;
+если принято, то метод завершается без ошибки.
+"""
+from __future__ import print_function
+import random
+
+IDEMPOTENT = (
+    '/auth/virtualLogin',
+    '/profile/get',
+    '/flat/get',
+    '/flat/addressSearch',
+    '/watercounters/get',
+    '/electrocounters/get',
+    '/epd/get',
+    '/eepd/get',
+    '/offence/getOffence',
+)
+
+
+class RetryPolicy(object):
+    """
+    :param attempts: всего попыток, включая первую
+    :param backoff: пауза перед второй попыткой, далее удваивается
+    :param max_backoff: максимальная пауза
+    :param jitter: случайная добавка к паузе, доля от нее (0.5 = до +50%)
+    :param idempotent: пути запросов, которые можно повторять без проверки
+    """
+    def __init__(self, attempts=3, backoff=0.5, max_backoff=10.0, jitter=0.5, idempotent=IDEMPOTENT):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.idempotent = tuple(idempotent)
+
+    def is_idempotent(self, url):
+        return url.endswith(self.idempotent)
+
+    def delay(self, attempt):
+        """
+        :param attempt: номер неудачной попытки, с 1
+        """
+        d = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return d * (1 + random.uniform(0, self.jitter))
+
+
+def _to_float(value):
+    if value is None or value == '':
+        return None
+    return float(str(value).replace(',', '.'))
+
+
+def watercounters_accepted(watercounters, counters_data):
+    """
+    Проверка для send_watercounters: все ли показания уже есть на сервере.
+
+    :param watercounters: ответ get_watercounters
+    :param counters_data: то, что отправляли (Watercounter.serialize_for_send)
+    """
+    counters = dict((int(c['counterId']), c) for c in watercounters.get('counters') or [])
+    for data in counters_data:
+        counter = counters.get(int(data['counter_id']))
+        if counter is None:
+            return False
+        month = data['period'][:7]
+        value = _to_float(data['indication'])
+        if not any(i['period'][:7] == month and abs(_to_float(i['indication']) - value) < 0.005
+                   for i in counter.get('indications') or []):
+            return False
+    return True
+
+
+def electrocounters_accepted(electrocounters, counters_data):
+    """
+    Проверка для send_electrocounters: совпадают ли показания зон с отправленными.
+
+    :param electrocounters: ответ get_electrocounters
+    """
+    zones = dict((z['name'], _to_float(z['value'])) for z in electrocounters.get('zones') or [])
+    for data in counters_data:
+        value = zones.get(data['counter_id'])
+        if value is None or abs(value - _to_float(data['indication'])) >= 0.005:
+            return False
+    return True
+
+
+def flat_added(flats, paycode, flat_number):
+    """
+    Проверка для flat_add: есть ли квартира с таким кодом плательщика и номером
+    """
+    return any(str(f.get('paycode')) == str(paycode) and str(f.get('flat_number')) == str(flat_number)
+               for f in flats or [])
+
+
+def flat_deleted(flats, flat_id):
+    """
+    Проверка для flat_delete: квартиры больше нет в списке
+    """
+    return not any(f.get('flat_id') == flat_id for f in flats or [])
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Хранилища session_id, чтобы не делать /auth/virtualLogin при каждом запуске.
+
+    store = SQLiteSessionStore('sessions.db')
+    api = MosAPI(token=..., guid=..., session_store=store)
+    api.login(telephone, pwd)  # сессия берется из store, если она там есть
+
+Сохраненная сессия проверяется при первом запросе: если сервер ответил 401,
+клиент сам делает новый login и повторяет запрос.
+"""
+from __future__ import print_function
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class SessionStore(object):
+    """
+    Базовый класс. key - строка login:guid, data - dict
+    {
+        'session_id': u'6c3333333c33333e44e21e7d43c46e03',
+        'result': ответ login,
+        'saved': unix time
+    }
+    """
+
+    @staticmethod
+    def key(telephone, guid):
+        return u'{0}:{1}'.format(telephone, guid)
+
+    def load(self, key):
+        raise NotImplementedError
+
+    def save(self, key, data):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Хранилище в памяти процесса (например, на несколько MosAPI одного воркера)
+    """
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def load(self, key):
+        with self._lock:
+            return self._data.get(key)
+
+    def save(self, key, data):
+        with self._lock:
+            self._data[key] = data
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __getstate__(self):
+        return {'_data': dict(self._data)}
+
+    def __setstate__(self, state):
+        self._data = state['_data']
+        self._lock = threading.Lock()
+
+
+class FileSessionStore(SessionStore):
+    """
+    Все сессии в одном JSON файле. Запись через временный файл и os.replace,
+    чтобы параллельный читатель не увидел половину файла.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _write(self, data):
+        tmp = '{0}.{1}.tmp'.format(self.path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        if hasattr(os, 'replace'):
+            os.replace(tmp, self.path)
+        else:  # python 2
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            os.rename(tmp, self.path)
+
+    def load(self, key):
+        with self._lock:
+            return self._read().get(key)
+
+    def save(self, key, data):
+        with self._lock:
+            sessions = self._read()
+            sessions[key] = data
+            self._write(sessions)
+
+    def delete(self, key):
+        with self._lock:
+            sessions = self._read()
+            if sessions.pop(key, None) is not None:
+                self._write(sessions)
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Сессии в SQLite. Соединение открывается на каждую операцию,
+    поэтому хранилище можно использовать из нескольких потоков и процессов.
+    """
+    def __init__(self, path):
+        self.path = path
+        db = self._connect()
+        try:
+            with db:
+                db.execute('CREATE TABLE IF NOT EXISTS sessions '
+                           '(key TEXT PRIMARY KEY, data TEXT NOT NULL, saved REAL NOT NULL)')
+        finally:
+            db.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10.0)
+
+    def load(self, key):
+        db = self._connect()
+        try:
+            row = db.execute('SELECT data FROM sessions WHERE key = ?', (key,)).fetchone()
+        finally:
+            db.close()
+        return json.loads(row[0]) if row else None
+
+    def save(self, key, data):
+        db = self._connect()
+        try:
+            with db:
+                db.execute('INSERT OR REPLACE INTO sessions (key, data, saved) VALUES (?, ?, ?)',
+                           (key, json.dumps(data), time.time()))
+        finally:
+            db.close()
+
+    def delete(self, key):
+        db = self._connect()
+        try:
+            with db:
+                db.execute('DELETE FROM sessions WHERE key = ?', (key,))
+        finally:
+            db.close()
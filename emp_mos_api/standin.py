@@ -0,0 +1,604 @@
+# -*- coding: utf-8 -*-
+"""
+Локальная замена emp.mos.ru для тестов и бенчмарков. Реализует те же пути и ответы
+(включая ошибки 401 и 3454), хранит данные в памяти и умеет добавлять задержку и сбои.
+
+    with StandInServer(latency=0.05, logout_latency=5.0) as server:
+        api = MosAPI(token='t', guid='g', base_url=server.base_url)
+        api.login('70000000000', 'pwd')   # любой телефон, аккаунт создается при первом login
+        flats = api.get_flats()
+
+    server.fail_next('/v1.0/watercounters/addValues', 'http_error', count=2)  # 2 ответа 502 подряд
+
+Из командной строки:
+
+    python -m emp_mos_api.standin --port 8080 --latency 0.05
+
+Сбои (faults, вероятность 0..1 на каждый запрос, или fail_next для конкретного пути):
+    http_error - ответ 502 с HTML (EmpBadResponseException)
+    disconnect - соединение закрывается без ответа, запрос не выполнен (requests.ConnectionError)
+    lost_response - запрос выполнен, но соединение закрывается без ответа (проверка precheck в retry)
+    auth - ответ 401 (AuthException, сессия удаляется)
+    empty_epd - /epd/get возвращает [] вместо ЕПД
+"""
+from __future__ import print_function
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+
+from six.moves import BaseHTTPServer, socketserver
+from six.moves.urllib.parse import urlparse, parse_qs
+
+from emp_mos_api.mos import Water
+
+FAULTS = ('http_error', 'disconnect', 'lost_response', 'auth', 'empty_epd')
+
+MONTHS = (u'январь', u'февраль', u'март', u'апрель', u'май', u'июнь', u'июль', u'август', u'сентябрь',
+          u'октябрь', u'ноябрь', u'декабрь')
+
+STREETS = (u'Ленинский проспект', u'улица Тверская', u'Профсоюзная улица', u'улица Арбат', u'Мичуринский проспект',
+           u'Варшавское шоссе', u'улица Гарибальди', u'Кутузовский проспект')
+
+DISTRICTS = (u'Гагаринский', u'Тверской', u'Академический', u'Арбат', u'Раменки', u'Нагорный', u'Ломоносовский',
+             u'Дорогомилово')
+
+
+def month_end(day):
+    following = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return following - timedelta(days=1)
+
+
+def months_back(day, n):
+    """
+    Последний день месяца, который на n месяцев раньше месяца day
+    """
+    for _ in range(n):
+        day = day.replace(day=1) - timedelta(days=1)
+    return month_end(day)
+
+
+def api_date(day):
+    return day.strftime('%Y-%m-%d') + '+03:00'
+
+
+def _months(day):
+    return day.year * 12 + day.month - 1
+
+
+class Fault(Exception):
+    def __init__(self, kind):
+        self.kind = kind
+
+
+class ApiError(Exception):
+    def __init__(self, code, message):
+        self.code = code
+        self.message = message
+
+
+class Account(object):
+    """
+    Данные одного аккаунта
+    """
+    def __init__(self, telephone, pwd, rnd, flats=2, today=None):
+        self.telephone = telephone
+        self.pwd = pwd
+        self.profile = {
+            'drive_license': None,
+            'firstname': u'Иван',
+            'middlename': u'Иванович',
+            'lastname': u'Иванов',
+            'birthdate': '01.01.1980',
+            'msisdn': telephone,
+            'email_confirmed': True,
+            'email': '{0}@example.com'.format(telephone)
+        }
+        self.flats = {}
+        self.water = {}
+        self.electro = {}
+        self.fines = {'paid': [], 'unpaid': []}
+        self._rnd = rnd
+        self._today = today or date.today()
+        for _ in range(flats):
+            self.add_flat(rnd.choice(STREETS), rnd.randint(1, 300))
+
+    def add_flat(self, address, flat_number, unom=None, unad=1, name=u'', paycode=None):
+        rnd = self._rnd
+        flat_id = str(rnd.randint(10 ** 7, 10 ** 8 - 1))
+        paycode = paycode or str(rnd.randint(10 ** 9, 10 ** 10 - 1))
+        electro_account = str(rnd.randint(10 ** 9, 10 ** 10 - 1)) if rnd.random() < 0.5 else None
+        flat = {
+            'flat_id': flat_id,
+            'name': name,
+            'address': address,
+            'flat_number': str(flat_number),
+            'unom': str(unom or rnd.randint(10 ** 6, 10 ** 7 - 1)),
+            'unad': str(unad),
+            'paycode': paycode,
+            'electro_account': electro_account,
+            'electro_device': str(rnd.randint(10 ** 6, 10 ** 7 - 1)) if electro_account else None,
+        }
+        self.flats[flat_id] = flat
+
+        counters = []
+        archive = []
+        for water_type in (Water.COLD, Water.HOT):
+            value = rnd.uniform(10, 500)
+            indications = []
+            for n in range(3, 0, -1):
+                value += rnd.uniform(1, 8)
+                indications.append({'period': api_date(months_back(self._today, n)),
+                                     'indication': '{0:.2f}'.format(value)})
+            counters.append({
+                'counterId': rnd.randint(10 ** 6, 10 ** 7 - 1),
+                'type': water_type,
+                'num': str(rnd.randint(10 ** 5, 10 ** 6 - 1)),
+                'checkup': api_date(self._today + timedelta(days=rnd.randint(100, 2000))),
+                'indications': indications,
+            })
+        for n in range(12, 0, -1):
+            archive.append({'period': api_date(months_back(self._today, n)),
+                            'cold_indication': round(rnd.uniform(1, 8), 2),
+                            'hot_indication': round(rnd.uniform(1, 5), 2)})
+        self.water[flat_id] = {'stat_title': u'Потребление воды', 'archive': archive, 'counters': counters}
+
+        if electro_account:
+            self.electro[flat_id] = {
+                'address': address,
+                'electro_account': electro_account,
+                'electro_device': flat['electro_device'],
+                'balance': round(rnd.uniform(-500, 500), 2),
+                'is_debt': False,
+                'description': u'Передача показаний возможна с 15 по 26 число месяца.',
+                'sh_znk': 5,
+                'zones': [{'name': 'T1', 'value': str(rnd.randint(1000, 9000))}],
+                'intervals': [{'name': 'T1', 'value': '00:00-23:59'}],
+            }
+        return flat
+
+
+class StandInServer(object):
+    """
+    :param host: адрес
+    :param port: порт, 0 - любой свободный (см. base_url)
+    :param latency: задержка ответа, секунды: число или (min, max)
+    :param logout_latency: задержка /auth/logout (на emp.mos.ru около 5 секунд)
+    :param faults: {вид сбоя: вероятность}, см. FAULTS
+    :param flats: сколько квартир у нового аккаунта
+    :param eepd_polls: сколько запросов /eepd/get с rid вернут пустой ответ до готовности pdf
+    :param max_per_month: расход по счетчику воды за месяц, больше которого показание отклоняется
+    :param seed: seed генератора данных
+    """
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, logout_latency=0.0, faults=None, flats=2,
+                 eepd_polls=2, max_per_month=50.0, seed=0):
+        self.latency = latency
+        self.logout_latency = logout_latency
+        self.faults = dict(faults or {})
+        self.flats = flats
+        self.eepd_polls = eepd_polls
+        self.max_per_month = max_per_month
+        self.accounts = {}
+        self.sessions = {}  # session_id -> Account
+        self.eepd = {}  # rid -> [оставшиеся пустые ответы, flat_id, period]
+        self.stats = {}  # путь -> количество запросов
+        self._fail_next = {}  # путь -> [вид сбоя, ...]
+        self._rnd = random.Random(seed)
+        self._lock = threading.RLock()
+        self._thread = None
+
+        server = self
+
+        class Handler(_Handler):
+            standin = server
+
+        self.httpd = _HTTPServer((host, port), Handler)
+        self.base_url = 'http://{0}:{1}'.format(*self.httpd.server_address[:2])
+
+    # Управление
+    def start(self):
+        """
+        Запустить в фоновом потоке
+        """
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='standin')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def add_account(self, telephone, pwd, flats=None):
+        with self._lock:
+            account = Account(telephone, pwd, self._rnd, self.flats if flats is None else flats)
+            self.accounts[telephone] = account
+            return account
+
+    def fail_next(self, path, kind, count=1):
+        """
+        Следующие count запросов к path (например '/v1.1/epd/get') завершатся сбоем kind
+        """
+        assert kind in FAULTS
+        with self._lock:
+            self._fail_next.setdefault(path, []).extend([kind] * count)
+
+    def expire_sessions(self):
+        """
+        Все сессии становятся недействительными (следующий запрос получит 401)
+        """
+        with self._lock:
+            self.sessions.clear()
+
+    # Обработка запроса
+    def _fault(self, path):
+        with self._lock:
+            queued = self._fail_next.get(path)
+            if queued:
+                return queued.pop(0)
+            for kind in FAULTS:
+                if kind != 'empty_epd' and self._rnd.random() < self.faults.get(kind, 0):
+                    return kind
+        return None
+
+    def _delay(self, path):
+        if path.endswith('/auth/logout'):
+            delay = self.logout_latency
+        elif isinstance(self.latency, (tuple, list)):
+            delay = random.uniform(*self.latency)
+        else:
+            delay = self.latency
+        if delay:
+            time.sleep(delay)
+
+    def handle(self, method, path, query, body):
+        """
+        :return: (HTTP статус, заголовки, тело bytes) или Fault
+        """
+        with self._lock:
+            self.stats[path] = self.stats.get(path, 0) + 1
+        started = time.time()
+        self._delay(path)
+        fault = self._fault(path)
+        if fault in ('http_error', 'disconnect'):
+            raise Fault(fault)
+
+        session_id = None
+        try:
+            if path.startswith('/pdf/'):
+                return self._pdf(path)
+            route = ROUTES.get(path[path.find('/', 1):] if path.startswith('/v1.') else None)
+            if route is None:
+                return 404, {'Content-Type': 'text/html'}, b'<html><body>404 Not Found</body></html>'
+            data = json.loads(body.decode('utf-8')) if body else {}
+            if route == 'login':
+                result, session_id = self._login(data)
+            else:
+                session_id = (data.get('auth') or {}).get('session_id') or query.get('auth[session_id]')
+                with self._lock:
+                    account = self.sessions.get(session_id)
+                    if fault == 'auth' and account is not None:
+                        del self.sessions[session_id]
+                        account = None
+                if account is None:
+                    raise ApiError(401, u'Сессия не найдена')
+                result = getattr(self, '_' + route)(account, data, session_id)
+                if route == 'epd' and (fault == 'empty_epd' or self._rnd.random() < self.faults.get('empty_epd', 0)):
+                    result = []
+            answer = {'errorCode': 0, 'errorMessage': '', 'session_id': session_id, 'result': result}
+        except ApiError as e:
+            answer = {'errorCode': e.code, 'errorMessage': e.message, 'session_id': session_id, 'result': None}
+        if fault == 'lost_response':
+            raise Fault('disconnect')
+        answer['execTime'] = round(time.time() - started, 6)
+        return 200, {'Content-Type': 'application/json; charset=UTF-8'}, json.dumps(answer).encode('utf-8')
+
+    # Методы API
+    def _login(self, data):
+        auth = data.get('auth') or {}
+        telephone, pwd = auth.get('login'), auth.get('password')
+        with self._lock:
+            account = self.accounts.get(telephone)
+            if account is None:
+                account = self.add_account(telephone, pwd)
+            if account.pwd != pwd:
+                raise ApiError(401, u'Неверный логин или пароль')
+            session_id = uuid.uuid4().hex
+            self.sessions[session_id] = account
+        result = {'is_filled': True, 'surname': account.profile['lastname'], 'name': account.profile['firstname'],
+                  'session_id': session_id, 'request_id': 'UN=PRO-' + str(uuid.uuid4())}
+        return result, session_id
+
+    def _logout(self, account, data, session_id):
+        with self._lock:
+            self.sessions.pop(session_id, None)
+
+    def _profile(self, account, data, session_id):
+        return {'profile': account.profile}
+
+    def _flats(self, account, data, session_id):
+        return list(account.flats.values())
+
+    def _flat(self, account, flat_id):
+        flat = account.flats.get(flat_id)
+        if flat is None:
+            raise ApiError(404, u'Квартира не найдена')
+        return flat
+
+    def _flat_add(self, account, data, session_id):
+        with self._lock:
+            flat = account.add_flat(data.get('address') or u'', data.get('flat_number') or u'',
+                                    data.get('unom'), data.get('unad') or 1, data.get('name') or u'',
+                                    data.get('paycode'))
+        result = dict(flat)
+        result.update({'intercom': '', 'floor': '', 'entrance_number': '', 'alias': '', 'epd': flat['paycode'],
+                       'flat': flat['flat_number'], 'building': '', 'street': flat['address']})
+        return result
+
+    def _flat_delete(self, account, data, session_id):
+        with self._lock:
+            self._flat(account, data.get('flat_id'))
+            flat_id = data['flat_id']
+            del account.flats[flat_id]
+            account.water.pop(flat_id, None)
+            account.electro.pop(flat_id, None)
+
+    def _address_search(self, account, data, session_id):
+        pattern = (data.get('pattern') or u'').lower().split()
+        limit = int(data.get('limit') or 100)
+        found = []
+        for i, street in enumerate(STREETS):
+            for house in range(1, 60):
+                address = u'г. Москва, {0}, дом {1}'.format(street, house)
+                district = DISTRICTS[i]
+                text = (address + u' ' + district).lower()
+                if all(word in text for word in pattern):
+                    found.append({'address': address, 'description': u'', 'district': district,
+                                  'fullMatch': False, 'unad': 1, 'unom': 1000000 + i * 1000 + house})
+                    if len(found) >= limit:
+                        return found
+        return found
+
+    def _watercounters(self, account, data, session_id):
+        self._flat(account, data.get('flat_id'))
+        return account.water[data['flat_id']]
+
+    def _watercounters_add(self, account, data, session_id):
+        with self._lock:
+            self._flat(account, data.get('flat_id'))
+            counters = dict((c['counterId'], c) for c in account.water[data['flat_id']]['counters'])
+            today = date.today()
+            for item in data.get('counters_data') or []:
+                counter = counters.get(int(item['counter_id']))
+                if counter is None:
+                    raise ApiError(3454, u'Счётчик {0} не найден'.format(item['counter_id']))
+                self._check_water(counter, item, today)
+            for item in data.get('counters_data') or []:
+                counter = counters[int(item['counter_id'])]
+                period = api_date(month_end(date(*[int(x) for x in item['period'][:10].split('-')])))
+                indications = [i for i in counter['indications'] if i['period'] != period]
+                indications.append({'period': period, 'indication': str(item['indication']).replace(',', '.')})
+                counter['indications'] = sorted(indications, key=lambda i: i['period'])[-3:]
+
+    def _check_water(self, counter, item, today):
+        period = date(*[int(x) for x in item['period'][:10].split('-')])
+        value = float(str(item['indication']).replace(',', '.'))
+        prefix = u'Не удалось передать показания за {0} по счётчикам {1}: '.format(MONTHS[period.month - 1],
+                                                                                   counter['num'])
+        if _months(period) < _months(today):
+            raise ApiError(3454, prefix + u'"Вы не можете изменить показания, переданные через портал mos.ru." '
+                                          u'{0}: "Редактируемое показание принято к расчёту."'.format(counter['num']))
+        if counter['checkup'][:10] < today.strftime('%Y-%m-%d'):
+            raise ApiError(3454, prefix + u'"Истёк срок поверки прибора учёта."')
+        previous = [i for i in counter['indications'] if i['period'][:7] < period.strftime('%Y-%m')]
+        if not previous:
+            raise ApiError(3454, prefix + u'"Невозможно внести показание, поскольку не введены показания за три '
+                                          u'и более месяца, предшествующих текущему."')
+        last = previous[-1]
+        last_day = date(*[int(x) for x in last['period'][:10].split('-')])
+        gap = _months(period) - _months(last_day)
+        if gap > 3:
+            raise ApiError(3454, prefix + u'"Невозможно внести показание, поскольку не введены показания за три '
+                                          u'и более месяца, предшествующих текущему."')
+        last_value = float(last['indication'])
+        if value < last_value:
+            raise ApiError(3454, prefix + u'"Вносимое показание меньше предыдущего. Проверьте корректность '
+                                          u'вносимого показания."')
+        if value - last_value > self.max_per_month * gap:
+            raise ApiError(3454, prefix + u'"Не допускается внесение данных, в несколько раз превышающих нормативы '
+                                          u'водопотребления, установленные Правительством Москвы."')
+
+    def _electrocounters(self, account, data, session_id):
+        self._flat(account, data.get('flat_id'))
+        electro = account.electro.get(data['flat_id'])
+        if electro is None:
+            raise ApiError(3454, u'Лицевой счёт Мосэнергосбыта не указан')
+        return electro
+
+    def _electrocounters_add(self, account, data, session_id):
+        with self._lock:
+            electro = self._electrocounters(account, data, session_id)
+            zones = dict((zone['name'], zone) for zone in electro['zones'])
+            values = []
+            for item in data.get('counters_data') or []:
+                zone = zones.get(item.get('counter_id'))
+                if zone is None:
+                    raise ApiError(3454, u'Зона {0} не найдена'.format(item.get('counter_id')))
+                value = str(item['indication']).replace(',', '.')
+                if float(value) < float(zone['value']):
+                    raise ApiError(3454, u'Вносимое показание меньше предыдущего.')
+                values.append((zone, value))
+            for zone, value in values:
+                zone['value'] = value
+
+    def _epd(self, account, data, session_id):
+        flat = self._flat(account, data.get('flat_id'))
+        period = data.get('period') or ''
+        h = int(hashlib.md5((flat['flat_id'] + period[3:]).encode('utf-8')).hexdigest()[:8], 16)
+        amount = round(1000 + h % 500000 / 100.0, 2)
+        insurance = round(amount * 0.02, 2)
+        return [{'is_debt': bool(data.get('is_debt')), 'is_paid': h % 3 != 0, 'amount': amount,
+                 'service_code': 'emp.zkh', 'insurance': insurance, 'ammount_insurance': round(amount + insurance, 2)}]
+
+    def _eepd(self, account, data, session_id):
+        self._flat(account, data.get('flat_id'))
+        rid = data.get('rid')
+        with self._lock:
+            if not rid:
+                rid = str(uuid.uuid4())
+                self.eepd[rid] = [self.eepd_polls, data['flat_id'], data.get('period')]
+                return {'rid': rid}
+            state = self.eepd.get(rid)
+            if state is None:
+                raise ApiError(3454, u'Запрос {0} не найден'.format(rid))
+            if state[0] > 0:
+                state[0] -= 1
+                return {}
+        return {
+            'pdf': '{0}/pdf/{1}.pdf'.format(self.base_url, rid),
+            'title': u'Платежный документ',
+            'sections': [{'title': u'Начисления', 'elements': {'address': account.flats[state[1]]['address'],
+                                                                 'epd': int(account.flats[state[1]]['paycode']),
+                                                                 'period': state[2]}}]
+        }
+
+    def _pdf(self, path):
+        rid = path[len('/pdf/'):-len('.pdf')]
+        if rid not in self.eepd:
+            return 404, {'Content-Type': 'text/html'}, b'<html><body>404 Not Found</body></html>'
+        content = b'%PDF-1.4\n' + (rid.encode('ascii') + b'\n') * 2000 + b'%%EOF\n'
+        return 200, {'Content-Type': 'application/pdf', 'ETag': '"{0}"'.format(rid)}, content
+
+    def _fines(self, account, data, session_id):
+        sts = data.get('sts_number')
+        with self._lock:
+            if sts not in account.fines:
+                rnd = self._rnd
+                account.fines[sts] = {
+                    'paid': [self._fine(sts, True) for _ in range(rnd.randint(0, 3))],
+                    'unpaid': [self._fine(sts, False) for _ in range(rnd.randint(0, 2))]
+                }
+            return account.fines[sts]
+
+    def _fine(self, sts, paid):
+        rnd = self._rnd
+        return {
+            'seriesAndNumber': str(rnd.randint(10 ** 17, 10 ** 18 - 1)),
+            'date': api_date(date.today() - timedelta(days=rnd.randint(1, 700))),
+            'offence_place': u'МОСКВА Г. МКАД, ВНЕШНЯЯ СТОРОНА',
+            'offenceType': u'12.9ч.2 - Превышение установленной скорости движения транспортного средства',
+            'cost': str(rnd.choice((500, 1000, 1500))),
+            'is_discount': False,
+            'drive_license': None,
+            'sts_number': sts,
+            'executionState': u'Исполнено' if paid else u'Не исполнено',
+            'is_fssp': False
+        }
+
+
+# путь без /v1.x -> метод StandInServer._<имя>
+ROUTES = {
+    '/auth/virtualLogin': 'login',
+    '/auth/logout': 'logout',
+    '/profile/get': 'profile',
+    '/flat/get': 'flats',
+    '/flat/add': 'flat_add',
+    '/flat/delete': 'flat_delete',
+    '/flat/addressSearch': 'address_search',
+    '/watercounters/get': 'watercounters',
+    '/watercounters/addValues': 'watercounters_add',
+    '/electrocounters/get': 'electrocounters',
+    '/electrocounters/addValues': 'electrocounters_add',
+    '/epd/get': 'epd',
+    '/eepd/get': 'eepd',
+    '/offence/getOffence': 'fines',
+}
+
+
+class _HTTPServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, как у emp.mos.ru
+    disable_nagle_algorithm = True  # заголовки и тело пишутся отдельно, без этого +40 мс на ответ
+    standin = None
+
+    def _serve(self):
+        url = urlparse(self.path)
+        query = dict((k, v[0]) for k, v in parse_qs(url.query).items())
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        try:
+            status, headers, content = self.standin.handle(self.command, url.path, query, body)
+        except Fault as fault:
+            if fault.kind == 'disconnect':
+                self.close_connection = True
+                return
+            status, headers = 502, {'Content-Type': 'text/html'}
+            content = b'<html><body><h1>502 Bad Gateway</h1></body></html>'
+
+        if status == 200 and 'ETag' in headers and self.headers.get('If-None-Match') == headers['ETag']:
+            status, content = 304, b''
+        elif (status == 200 and self.headers.get('Range', '').startswith('bytes=') and
+              self.headers.get('If-Range', headers.get('ETag')) == headers.get('ETag')):
+            start = int(self.headers['Range'][6:].split('-')[0] or 0)
+            if start >= len(content):
+                status, content = 416, b''
+            else:
+                headers['Content-Range'] = 'bytes {0}-{1}/{2}'.format(start, len(content) - 1, len(content))
+                status, content = 206, content[start:]
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        if content:
+            self.wfile.write(content)
+
+    do_GET = _serve
+    do_POST = _serve
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Локальная замена emp.mos.ru')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='задержка ответа, с')
+    parser.add_argument('--logout-latency', type=float, default=5.0, help='задержка /auth/logout, с')
+    parser.add_argument('--flats', type=int, default=2, help='квартир у нового аккаунта')
+    for kind in FAULTS:
+        parser.add_argument('--' + kind.replace('_', '-'), type=float, default=0.0, dest=kind,
+                            help='вероятность сбоя ' + kind)
+    args = parser.parse_args()
+
+    server = StandInServer(args.host, args.port, args.latency, args.logout_latency,
+                           dict((kind, getattr(args, kind)) for kind in FAULTS), args.flats)
+    print('base_url:', server.base_url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
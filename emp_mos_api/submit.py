@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Массовая передача показаний воды и электроэнергии по многим квартирам и аккаунтам.
+
+Показания группируются по аккаунту, квартире и виду счетчика, каждая группа - один запрос
+addValues. Группы отправляются пулом потоков, ошибка одной группы не прерывает остальные,
+для каждого показания возвращается итог:
+
+    readings = [Reading('7xxxxxxxxxx', flat_id, WATER, counter_id, 123.45), ...]
+    accounts = {'7xxxxxxxxxx': 'pwd', ...}
+    report = BulkSubmitter(api, workers=16, rate=5.0).submit_all(readings, accounts)
+    print(report.counts())   # {'sent': 980, 'value_less': 12, 'not_verified': 3, ...}
+    for r in report.failed:
+        print(r.reading.counter_id, r.status, r.error)
+
+Если сервер отклонил группу из нескольких показаний (код 3454), показания этой группы
+отправляются по одному, чтобы узнать, какое именно не принято.
+"""
+from __future__ import print_function
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from emp_mos_api.mos import AuthException, EmpServerException, EmpAlreadySendException, \
+    EmpCounterNotVerifiedException, EmpHugeValueException, EmpValueLessException, serialize_indication
+from emp_mos_api.ratelimit import TokenBucket
+from emp_mos_api.validate import WaterValidator
+
+WATER = 'water'
+ELECTRO = 'electro'
+
+# login - аккаунт (client_id в MosAPI), None - клиент MosAPI по умолчанию
+# kind - WATER или ELECTRO, period - date, по умолчанию сегодня
+Reading = namedtuple('Reading', ['login', 'flat_id', 'kind', 'counter_id', 'indication', 'period'])
+Reading.__new__.__defaults__ = (None,)
+
+# status - см. classify, error - исключение или None
+ReadingResult = namedtuple('ReadingResult', ['reading', 'status', 'error'])
+
+SENT = 'sent'
+
+STATUSES = (
+    (EmpAlreadySendException, 'already_sent'),
+    (EmpHugeValueException, 'huge_value'),
+    (EmpValueLessException, 'value_less'),
+    (EmpCounterNotVerifiedException, 'not_verified'),
+    (EmpServerException, 'server_error'),
+    (AuthException, 'auth_error'),
+)
+
+REJECTED = (EmpAlreadySendException, EmpHugeValueException, EmpValueLessException, EmpCounterNotVerifiedException)
+
+
+def classify(error):
+    """
+    Итог показания по исключению: 'sent', 'already_sent', 'huge_value', 'value_less', 'not_verified',
+    'server_error', 'auth_error' или 'error' (сеть и прочее)
+    """
+    if error is None:
+        return SENT
+    for exception_class, status in STATUSES:
+        if isinstance(error, exception_class):
+            return status
+    return 'error'
+
+
+def serialize(reading):
+    """
+    Элемент counters_data для send_watercounters / send_electrocounters.
+    counter_id воды - число, электроэнергии - имя зоны ('T1'), передается как есть.
+    """
+    counter_id = int(reading.counter_id) if reading.kind == WATER else reading.counter_id
+    return serialize_indication(counter_id, reading.indication, reading.period)
+
+
+class SubmitReport(object):
+    def __init__(self, results):
+        self.results = list(results)
+
+    def counts(self):
+        """
+        :return: {статус: количество показаний}
+        """
+        counts = {}
+        for r in self.results:
+            counts[r.status] = counts.get(r.status, 0) + 1
+        return counts
+
+    @property
+    def sent(self):
+        return [r for r in self.results if r.status == SENT]
+
+    @property
+    def failed(self):
+        return [r for r in self.results if r.status != SENT]
+
+    def __len__(self):
+        return len(self.results)
+
+
+class BulkSubmitter(object):
+    """
+    :param api: MosAPI
+    :param workers: сколько запросов addValues выполняется одновременно
+    :param rate: не больше rate запросов addValues в секунду (None - без ограничения,
+                 общий RateLimiter клиентов MosAPI действует в любом случае)
+    :param validate: перед отправкой воды запросить get_watercounters и не отправлять показания,
+                     которые не пройдут validate.WaterValidator
+    :param split: при отказе сервера по группе отправить ее показания по одному
+    """
+    def __init__(self, api, workers=10, rate=None, validate=False, split=True):
+        self.api = api
+        self.workers = workers
+        self.bucket = TokenBucket(rate, 1) if rate else None
+        self.validate = validate
+        self.split = split
+        self._login_locks = {}
+        self._lock = threading.Lock()
+
+    def _client(self, login, accounts):
+        if login is None:
+            return self.api.client()
+        client = self.api.client(login)
+        with self._lock:
+            lock = self._login_locks.setdefault(login, threading.Lock())
+        with lock:  # один login на аккаунт, даже если его квартиры обрабатываются в нескольких потоках
+            if not client.is_active():
+                if login not in accounts:
+                    raise AuthException('Нет пароля для {0}'.format(login))
+                client.login(login, accounts[login])
+        return client
+
+    def _send(self, client, kind, flat_id, readings):
+        if self.bucket is not None:
+            self.bucket.acquire()
+        data = [serialize(r) for r in readings]
+        if kind == WATER:
+            client.send_watercounters(flat_id, data)
+        else:
+            client.send_electrocounters(flat_id, data)
+
+    def _process(self, group, accounts):
+        login, flat_id, kind = group[0].login, group[0].flat_id, group[0].kind
+        try:
+            client = self._client(login, accounts)
+        except Exception as e:
+            return [ReadingResult(r, classify(e), e) for r in group]
+
+        results = []
+        if self.validate and kind == WATER:
+            try:
+                validator = WaterValidator(client.get_watercounters(flat_id))
+            except Exception as e:
+                return [ReadingResult(r, classify(e), e) for r in group]
+            ok = []
+            for r in group:
+                try:
+                    validator.check(r.counter_id, r.indication, r.period)
+                    ok.append(r)
+                except REJECTED as e:
+                    results.append(ReadingResult(r, classify(e), e))
+            group = ok
+
+        if not group:
+            return results
+        try:
+            self._send(client, kind, flat_id, group)
+            return results + [ReadingResult(r, SENT, None) for r in group]
+        except REJECTED as e:
+            if not self.split or len(group) == 1:
+                return results + [ReadingResult(r, classify(e), e) for r in group]
+        except Exception as e:
+            return results + [ReadingResult(r, classify(e), e) for r in group]
+
+        for r in group:
+            try:
+                self._send(client, kind, flat_id, [r])
+                results.append(ReadingResult(r, SENT, None))
+            except Exception as e:
+                results.append(ReadingResult(r, classify(e), e))
+        return results
+
+    @staticmethod
+    def group(readings):
+        """
+        :return: [[Reading, ...], ...] по (login, flat_id, kind) в порядке первого появления
+        """
+        groups = {}
+        order = []
+        for r in readings:
+            key = (r.login, r.flat_id, r.kind)
+            if key not in groups:
+                groups[key] = []
+                order.append(key)
+            groups[key].append(r)
+        return [groups[key] for key in order]
+
+    def submit(self, readings, accounts=None):
+        """
+        Отправить показания. Генератор ReadingResult в порядке завершения запросов.
+
+        :param readings: итерируемый список Reading
+        :param accounts: {login: pwd} для аккаунтов, клиенты которых еще не залогинены
+        """
+        accounts = accounts or {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self._process, group, accounts) for group in self.group(readings)]
+            for future in as_completed(futures):
+                for result in future.result():
+                    yield result
+
+    def submit_all(self, readings, accounts=None):
+        """
+        :return: SubmitReport
+        """
+        return SubmitReport(self.submit(readings, accounts))
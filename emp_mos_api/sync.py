@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Инкрементальная синхронизация аккаунта. Движок помнит хэши содержимого по каждой квартире
+и каждому счетчику, запрашивает только то, что могло измениться, и возвращает разницу
+с прошлым запуском:
+
+    engine = SyncEngine(SQLiteSessionStore('sync.db'), water_interval=6 * 3600)
+    diff = engine.sync(client)
+    for flat_id, counter_id, period, value in diff.new_indications:
+        ...
+
+Состояние хранится в любом SessionStore (JSON по ключу), ключ - телефон аккаунта. Для многих
+аккаунтов нужен SQLiteSessionStore: FileSessionStore переписывает весь файл при каждом сохранении.
+Для многих аккаунтов: Fleet(api).run(accounts, engine.sync).
+"""
+from __future__ import print_function
+import hashlib
+import json
+import time
+
+
+def content_hash(obj):
+    """
+    Хэш JSON, не зависящий от порядка ключей
+    """
+    data = json.dumps(obj, sort_keys=True, separators=(',', ':'), ensure_ascii=True)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+class SyncDiff(object):
+    """
+    Изменения с прошлой синхронизации аккаунта.
+
+    new_flats - [ответ get_flats для квартиры, ...]
+    removed_flats - [flat_id, ...]
+    changed_flats - [ответ get_flats для квартиры, ...], у которых изменились поля
+    new_counters - [(flat_id, counter JSON), ...]
+    removed_counters - [(flat_id, counter_id), ...]
+    new_indications - [(flat_id, counter_id, период 'YYYY-MM-DD', показание строкой), ...],
+                      в том числе исправленные показания за уже известный период
+    balance_changes - [(flat_id, старый баланс, новый баланс), ...]
+    fetched / skipped - сколько запросов счетчиков выполнено / пропущено
+    """
+    def __init__(self, key):
+        self.key = key
+        self.new_flats = []
+        self.removed_flats = []
+        self.changed_flats = []
+        self.new_counters = []
+        self.removed_counters = []
+        self.new_indications = []
+        self.balance_changes = []
+        self.fetched = 0
+        self.skipped = 0
+
+    @property
+    def empty(self):
+        return not (self.new_flats or self.removed_flats or self.changed_flats or self.new_counters or
+                    self.removed_counters or self.new_indications or self.balance_changes)
+
+    def __repr__(self):
+        return ('SyncDiff({0}, new_flats={1}, removed_flats={2}, changed_flats={3}, new_indications={4}, '
+                'balance_changes={5}, fetched={6}, skipped={7})').format(
+            self.key, len(self.new_flats), len(self.removed_flats), len(self.changed_flats),
+            len(self.new_indications), len(self.balance_changes), self.fetched, self.skipped)
+
+
+class SyncEngine(object):
+    """
+    :param store: session_store.SessionStore. Для многих аккаунтов SQLiteSessionStore: FileSessionStore
+                  переписывает весь файл на каждый аккаунт
+    :param water_interval: не запрашивать счетчики воды квартиры чаще, чем раз в столько секунд
+    :param electro_interval: то же для электроэнергии
+    :param electro: запрашивать электроэнергию для квартир с electro_account
+
+    Новые квартиры и квартиры, у которых изменились поля в get_flats, запрашиваются всегда.
+    """
+    def __init__(self, store, water_interval=6 * 3600, electro_interval=3600, electro=True):
+        self.store = store
+        self.water_interval = water_interval
+        self.electro_interval = electro_interval
+        self.electro = electro
+
+    @staticmethod
+    def _due(state, interval, now, force):
+        return force or state is None or now - state.get('fetched', 0) >= interval
+
+    def sync(self, client, key=None, force=False):
+        """
+        :param client: залогиненный Client
+        :param key: ключ состояния, по умолчанию client.telephone
+        :param force: запросить все, не глядя на интервалы
+        :return: SyncDiff
+        :raises ValueError: key не задан и телефон клиента неизвестен (клиент после pickle или resume
+                            без телефона), иначе состояние разных аккаунтов смешалось бы
+        """
+        key = key or client.telephone
+        if not key:
+            raise ValueError('SyncEngine.sync: не задан key и неизвестен телефон клиента')
+        state = self.store.load(key) or {'flats': {}}
+        known = state['flats']
+        diff = SyncDiff(key)
+        now = time.time()
+
+        flats = client.get_flats()
+        current = {}
+        for flat in flats:
+            flat_id = flat['flat_id']
+            old = known.get(flat_id)
+            flat_state = {'hash': content_hash(flat)}
+            if old is None:
+                diff.new_flats.append(flat)
+            elif old['hash'] != flat_state['hash']:
+                diff.changed_flats.append(flat)
+            changed = old is None or old['hash'] != flat_state['hash']
+            old = old or {}
+
+            water = old.get('water')
+            if self._due(water, self.water_interval, now, force or changed):
+                water = self._sync_water(flat_id, client.get_watercounters(flat_id), water, diff, now)
+                diff.fetched += 1
+            else:
+                diff.skipped += 1
+            flat_state['water'] = water
+
+            if self.electro and flat.get('electro_account'):
+                electro = old.get('electro')
+                if self._due(electro, self.electro_interval, now, force or changed):
+                    electro = self._sync_electro(flat_id, client.get_electrocounters(flat_id), electro, diff, now)
+                    diff.fetched += 1
+                else:
+                    diff.skipped += 1
+                flat_state['electro'] = electro
+            current[flat_id] = flat_state
+
+        diff.removed_flats = [flat_id for flat_id in known if flat_id not in current]
+        state['flats'] = current
+        state['synced'] = now
+        self.store.save(key, state)
+        return diff
+
+    @staticmethod
+    def _sync_water(flat_id, result, old, diff, now):
+        """
+        :param old: {'hash': ..., 'fetched': ..., 'counters': {counter_id: {'hash': ..., 'indications': {период: показание}}}}
+        """
+        new = {'hash': content_hash(result), 'fetched': now}
+        if old and old.get('hash') == new['hash']:
+            new['counters'] = old['counters']
+            return new
+
+        old_counters = (old or {}).get('counters') or {}
+        counters = {}
+        for counter in result.get('counters') or []:
+            counter_id = str(counter['counterId'])  # ключи JSON - строки
+            h = content_hash(counter)
+            prev = old_counters.get(counter_id)
+            if prev is not None and prev['hash'] == h:
+                counters[counter_id] = prev
+                continue
+            if prev is None:
+                diff.new_counters.append((flat_id, counter))
+            known = prev['indications'] if prev else {}
+            indications = {}
+            for i in counter.get('indications') or []:
+                period = i['period'][:10]
+                indications[period] = i['indication']
+                if known.get(period) != i['indication']:
+                    diff.new_indications.append((flat_id, counter['counterId'], period, i['indication']))
+            counters[counter_id] = {'hash': h, 'indications': indications}
+
+        diff.removed_counters.extend((flat_id, int(c)) for c in old_counters if c not in counters)
+        new['counters'] = counters
+        return new
+
+    @staticmethod
+    def _sync_electro(flat_id, result, old, diff, now):
+        result = result or {}
+        new = {'hash': content_hash(result), 'fetched': now, 'balance': result.get('balance')}
+        if old is not None and old.get('balance') != new['balance']:
+            diff.balance_changes.append((flat_id, old.get('balance'), new['balance']))
+        return new
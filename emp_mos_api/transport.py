@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Общий пул HTTP соединений для всех клиентов MosAPI. У каждого клиента своя requests.Session
+(cookies, заголовки), в которую подключается общий адаптер с пулом.
+
+    transport = Transport(pool_maxsize=100, pool_block=True)
+    api = MosAPI(token=..., guid=..., transport=transport)
+    ...
+    print(transport.stats)  # {'requests': 1000, 'new_connections': 12, 'tls_handshakes': 12, 'hits': 988, ...}
+
+MosAPI без параметра transport создает один Transport на все свои клиенты.
+"""
+from __future__ import print_function
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+class PoolStats(object):
+    """
+    Счетчики пула соединений:
+    requests - сколько раз запрошено соединение из пула,
+    new_connections - сколько соединений открыто,
+    tls_handshakes - сколько раз выполнен TLS handshake,
+    hits - сколько запросов пошли по уже открытому соединению,
+    idle_closed - сколько соединений закрыто из-за простоя дольше keepalive_timeout
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+        self.idle_closed = 0
+
+    def inc(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    @property
+    def hits(self):
+        return max(0, self.requests - self.new_connections)
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'new_connections': self.new_connections,
+            'tls_handshakes': self.tls_handshakes,
+            'hits': self.hits,
+            'idle_closed': self.idle_closed
+        }
+
+    def __repr__(self):
+        return repr(self.as_dict())
+
+
+def _pool_classes(stats, keepalive_timeout=None):
+    """
+    Классы пулов urllib3, которые считают соединения в stats и закрывают соединения,
+    простоявшие в пуле дольше keepalive_timeout секунд
+    """
+    class CountingHTTPSConnection(HTTPSConnection):
+        def connect(self):
+            HTTPSConnection.connect(self)
+            stats.inc('tls_handshakes')
+
+    class CountingPoolMixin(object):
+        def _get_conn(self, timeout=None):
+            stats.inc('requests')
+            conn = super(CountingPoolMixin, self)._get_conn(timeout)
+            idle_since = getattr(conn, 'idle_since', None)
+            if keepalive_timeout is not None and idle_since is not None \
+                    and time.time() - idle_since > keepalive_timeout:
+                # сервер мог уже закрыть его у себя: открыть заново, а не получить ConnectionResetError
+                conn.close()
+                stats.inc('new_connections')
+                stats.inc('idle_closed')
+            return conn
+
+        def _put_conn(self, conn):
+            if conn is not None:
+                conn.idle_since = time.time()
+            super(CountingPoolMixin, self)._put_conn(conn)
+
+        def _new_conn(self):
+            stats.inc('new_connections')
+            return super(CountingPoolMixin, self)._new_conn()
+
+    class CountingHTTPConnectionPool(CountingPoolMixin, HTTPConnectionPool):
+        pass
+
+    class CountingHTTPSConnectionPool(CountingPoolMixin, HTTPSConnectionPool):
+        ConnectionCls = CountingHTTPSConnection
+
+    return {'http': CountingHTTPConnectionPool, 'https': CountingHTTPSConnectionPool}
+
+
+class StatsAdapter(HTTPAdapter):
+    def __init__(self, stats, keepalive_timeout=None, **kwargs):
+        self.stats = stats
+        self.keepalive_timeout = keepalive_timeout
+        HTTPAdapter.__init__(self, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        HTTPAdapter.init_poolmanager(self, *args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _pool_classes(self.stats, self.keepalive_timeout)
+
+
+class Transport(object):
+    """
+    :param pool_connections: сколько хостов держать в пуле
+    :param pool_maxsize: сколько открытых (keep-alive) соединений хранить на один хост
+    :param pool_block: True - не открывать больше pool_maxsize соединений к хосту, ждать свободное
+    :param keepalive_timeout: соединение, простоявшее в пуле дольше стольких секунд, перед запросом
+                              открывается заново (None - без ограничения), как keepalive_timeout у AsyncTransport
+    """
+    def __init__(self, pool_connections=10, pool_maxsize=50, pool_block=False, keepalive_timeout=30.0):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keepalive_timeout = keepalive_timeout
+        self.stats = PoolStats()
+        self.adapter = StatsAdapter(self.stats, keepalive_timeout,
+                                    pool_connections=pool_connections,
+                                    pool_maxsize=pool_maxsize,
+                                    pool_block=pool_block)
+
+    def mount(self, session):
+        """
+        Подключить общий пул к requests.Session
+        """
+        session.mount('https://', self.adapter)
+        session.mount('http://', self.adapter)
+        return session
+
+    def new_session(self):
+        """
+        Новая requests.Session на общем пуле соединений: по одной на клиента,
+        чтобы клиенты не делили cookies и состояние сессии
+        """
+        return self.mount(requests.Session())
+
+    def close(self):
+        self.adapter.close()
+
+    def __getstate__(self):
+        return {'pool_connections': self.pool_connections,
+                'pool_maxsize': self.pool_maxsize,
+                'pool_block': self.pool_block,
+                'keepalive_timeout': self.keepalive_timeout}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
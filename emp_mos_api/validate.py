@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Проверка показаний воды до отправки. По последнему ответу get_watercounters заранее
+находит то, что сервер отклонит с кодом 3454, и бросает то же исключение, что и raise_for_status:
+
+    validator = WaterValidator(api.get_watercounters(flat_id))
+    data = [Watercounter.serialize_for_send(c, value) for c, value in ...]
+    validator.validate(data)               # EmpValueLessException, EmpHugeValueException, ...
+    api.send_watercounters(flat_id, data)
+
+    for item, error in validator.errors(data):   # все ошибки сразу, без исключений
+        print(item['counter_id'], error.message)
+"""
+from __future__ import print_function
+from datetime import date, timedelta
+
+from emp_mos_api.mos import EmpCounterNotVerifiedException, EmpHugeValueException, EmpValueLessException
+from emp_mos_api.models import WaterCounters, parse_date, parse_float
+
+ERROR_CODE = 3454
+
+# норматив ХВС или ГВС на человека около 7 м3 в месяц, сервер отклоняет показания,
+# "в несколько раз превышающие нормативы"
+MAX_PER_MONTH = 30.0
+
+# сервер не принимает показания, если не передавались три и более месяца подряд
+MAX_GAP_MONTHS = 3
+
+
+def _months(day):
+    return day.year * 12 + day.month - 1
+
+
+class WaterValidator(object):
+    """
+    :param watercounters: ответ get_watercounters или models.WaterCounters
+    :param max_per_month: максимальный расход по одному счетчику за месяц, м3
+    :param max_gap: сколько месяцев без показаний сервер уже не принимает
+    """
+    def __init__(self, watercounters, max_per_month=MAX_PER_MONTH, max_gap=MAX_GAP_MONTHS):
+        if not isinstance(watercounters, WaterCounters):
+            watercounters = WaterCounters.from_json(watercounters)
+        self.counters = watercounters
+        self.max_per_month = max_per_month
+        self.max_gap = max_gap
+
+    def check(self, counter_id, value, period=None):
+        """
+        Проверить одно показание. Счетчики, которых нет в ответе get_watercounters, не проверяются.
+
+        :param counter_id: ['counters'][0]['counterId']
+        :param value: float
+        :param period: date, по умолчанию сегодня
+        """
+        counter = self.counters.get(counter_id)
+        if counter is None:
+            return
+        period = period or date.today()
+
+        if not counter.is_verified(period):
+            self._fail(EmpCounterNotVerifiedException, counter,
+                       u'Истёк срок поверки прибора учёта.')
+
+        previous = counter.at(period.replace(day=1) - timedelta(days=1))
+        gap = _months(period) - _months(previous.period) - 1 if previous else None
+        if previous is None or gap >= self.max_gap:
+            self._fail(EmpCounterNotVerifiedException, counter,
+                       u'Невозможно внести показание, поскольку не введены показания за три и более месяца, '
+                       u'предшествующих текущему.')
+
+        if value < previous.value:
+            self._fail(EmpValueLessException, counter,
+                       u'Вносимое показание меньше предыдущего. Проверьте корректность вносимого показания.')
+
+        if value - previous.value > self.max_per_month * (gap + 1):
+            self._fail(EmpHugeValueException, counter,
+                       u'Не допускается внесение данных, в несколько раз превышающих нормативы водопотребления, '
+                       u'установленные Правительством Москвы.')
+
+    def validate(self, counters_data):
+        """
+        :param counters_data: как для send_watercounters (Watercounter.serialize_for_send)
+        :raise: исключение для первого показания, которое сервер не примет
+        """
+        for data in counters_data:
+            self.check(int(data['counter_id']), parse_float(data['indication']), parse_date(data.get('period')))
+
+    def errors(self, counters_data):
+        """
+        :return: [(элемент counters_data, исключение), ...] для показаний, которые сервер не примет
+        """
+        errors = []
+        for data in counters_data:
+            try:
+                self.validate([data])
+            except (EmpCounterNotVerifiedException, EmpHugeValueException, EmpValueLessException) as e:
+                errors.append((data, e))
+        return errors
+
+    @staticmethod
+    def _fail(exception_class, counter, text):
+        raise exception_class(u'Не удалось передать показания по счётчикам {0}: "{1}"'.format(counter.num, text),
+                              ERROR_CODE)
@@ -45,6 +45,12 @@ if __name__ == '__main__':
         license='MIT',
         platforms=['linux2', 'win32'],
         install_requires=[
-            'requests>=2.19.1'
+            'requests>=2.19.1',
+            'futures; python_version < "3"'
         ],
+        extras_require={
+            'async': ['aiohttp>=3.7'],
+            'fast': ['orjson; python_version >= "3.6"', 'ujson; python_version < "3.6"'],
+            'analytics': ['numpy'],
+        },
     )
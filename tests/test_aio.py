@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import asyncio
+import unittest
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from emp_mos_api.mos import Watercounter, EmpValueLessException
+from emp_mos_api.retry import RetryPolicy
+from emp_mos_api.standin import StandInServer
+
+if aiohttp is not None:
+    from emp_mos_api.aio import AsyncMosAPI
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+@unittest.skipIf(aiohttp is None, 'aiohttp не установлен')
+class AsyncMosAPITestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StandInServer(flats=3).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def api(self, **kwargs):
+        return AsyncMosAPI(token='token', guid='guid', base_url=self.server.base_url, **kwargs)
+
+    def test_watercounters(self):
+        async def scenario():
+            async with self.api() as api:
+                await api.login('74100000001', 'pwd')
+                flat_id = (await api.get_flats())[0]['flat_id']
+                counter = (await api.get_watercounters(flat_id))['counters'][0]
+                value = Watercounter.last_value(counter)
+                with self.assertRaises(EmpValueLessException):
+                    await api.send_watercounters(flat_id, [Watercounter.serialize_for_send(counter, value - 1)])
+                await api.send_watercounters(flat_id, [Watercounter.serialize_for_send(counter, value + 1)])
+                counter = (await api.get_watercounters(flat_id))['counters'][0]
+                await api.logout()
+                return value, Watercounter.last_value(counter)
+
+        before, after = run(scenario())
+        self.assertAlmostEqual(after, before + 1)
+
+    def test_clients_concurrent(self):
+        async def scenario():
+            async with self.api() as api:
+                logins = ['7410000001{0}'.format(i) for i in range(5)]
+                await asyncio.gather(*[api.client(login).login(login, 'pwd') for login in logins])
+                flats = await asyncio.gather(*[api.client(login).get_flats() for login in logins])
+                return flats, api.transport.stats.as_dict()
+
+        flats, stats = run(scenario())
+        self.assertEqual([len(f) for f in flats], [3] * 5)
+        self.assertEqual(len(set(f[0]['flat_id'] for f in flats)), 5)
+        self.assertLess(stats['new_connections'], stats['requests'])  # общий пул: соединения переиспользуются
+
+    def test_retry_precheck(self):
+        async def scenario():
+            async with self.api(retry_policy=RetryPolicy(attempts=3, backoff=0.01)) as api:
+                await api.login('74100000002', 'pwd')
+                flat_id = (await api.get_flats())[0]['flat_id']
+                counter = (await api.get_watercounters(flat_id))['counters'][0]
+                data = [Watercounter.serialize_for_send(counter, Watercounter.last_value(counter) + 1)]
+                self.server.fail_next('/v1.0/watercounters/addValues', 'lost_response')
+                return await api.send_watercounters(flat_id, data)
+
+        before = self.server.stats.get('/v1.0/watercounters/addValues', 0)
+        self.assertIsNone(run(scenario()))
+        self.assertEqual(self.server.stats['/v1.0/watercounters/addValues'], before + 1)
+
+    def test_epd_range_closed_early(self):
+        async def scenario():
+            async with self.api() as api:
+                await api.login('74100000003', 'pwd')
+                flat_id = (await api.get_flats())[0]['flat_id']
+                items = api.client().get_epd_range([flat_id], '10.01.2016', '10.12.2019', workers=2, rate=100)
+                async for item in items:
+                    self.assertIsNone(item.error)
+                    break
+                await items.aclose()
+                await asyncio.sleep(0.1)
+
+        before = self.server.stats.get('/v1.1/epd/get', 0)
+        run(scenario())
+        self.assertLess(self.server.stats['/v1.1/epd/get'] - before, 48)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Возможности Client поверх _request/_perform против standin.StandInServer:
+кэш (cache.py), повтор и precheck (retry.py), ограничение частоты (ratelimit.py),
+хранилище сессий и повторный login (session_store.py)
+"""
+from __future__ import print_function
+import time
+import unittest
+
+import requests
+
+from emp_mos_api.cache import TagCache
+from emp_mos_api.mos import MosAPI, Watercounter, EmpBadResponseException
+from emp_mos_api.ratelimit import RateLimiter
+from emp_mos_api.retry import RetryPolicy
+from emp_mos_api.session_store import MemorySessionStore
+from emp_mos_api.standin import StandInServer
+
+WATER_GET = '/v1.0/watercounters/get'
+WATER_ADD = '/v1.0/watercounters/addValues'
+FLAT_GET = '/v1.0/flat/get'
+LOGIN = '/v1.0/auth/virtualLogin'
+
+
+class ClientTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StandInServer(flats=1).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def api(self, **kwargs):
+        return MosAPI(token='token', guid='guid', base_url=self.server.base_url, **kwargs)
+
+    def count(self, path):
+        return self.server.stats.get(path, 0)
+
+    def next_reading(self, api, flat_id):
+        counter = api.get_watercounters(flat_id)['counters'][0]
+        return [Watercounter.serialize_for_send(counter, Watercounter.last_value(counter) + 1)]
+
+
+class CacheTestCase(ClientTestCase):
+    def test_cached_until_cleared(self):
+        cache = TagCache(ttl=60)
+        api = self.api(cache=cache)
+        api.login('74000000001', 'pwd')
+        flat_id = api.get_flats()[0]['flat_id']
+
+        flats = self.count(FLAT_GET)
+        api.get_flats()
+        self.assertEqual(self.count(FLAT_GET), flats)
+
+        data = self.next_reading(api, flat_id)
+        water = self.count(WATER_GET)
+        api.get_watercounters(flat_id)
+        self.assertEqual(self.count(WATER_GET), water)
+
+        api.send_watercounters(flat_id, data)  # X-Clears-tags: WATER_COUNTERS
+        api.get_watercounters(flat_id)
+        self.assertEqual(self.count(WATER_GET), water + 1)
+        api.get_flats()
+        self.assertEqual(self.count(FLAT_GET), flats)
+
+    def test_sessions_separate(self):
+        cache = TagCache(ttl=60)
+        api = self.api(cache=cache)
+        api.client('a').login('74000000002', 'pwd')
+        api.client('b').login('74000000003', 'pwd')
+        self.assertNotEqual(api.client('a').get_flats(), api.client('b').get_flats())
+
+
+class RetryTestCase(ClientTestCase):
+    def test_idempotent_retried(self):
+        api = self.api(retry_policy=RetryPolicy(attempts=3, backoff=0.01))
+        api.login('74000000011', 'pwd')
+        before = self.count(FLAT_GET)
+        self.server.fail_next(FLAT_GET, 'http_error')
+        self.server.fail_next(FLAT_GET, 'disconnect')
+        self.assertTrue(api.get_flats())
+        self.assertEqual(self.count(FLAT_GET), before + 3)
+
+    def test_no_policy_no_retry(self):
+        api = self.api()
+        api.login('74000000012', 'pwd')
+        self.server.fail_next(FLAT_GET, 'http_error')
+        self.assertRaises(EmpBadResponseException, api.get_flats)
+        self.server.fail_next(FLAT_GET, 'disconnect')
+        self.assertRaises(requests.ConnectionError, api.get_flats)
+
+    def test_write_not_processed_resent(self):
+        api = self.api(retry_policy=RetryPolicy(attempts=3, backoff=0.01))
+        api.login('74000000013', 'pwd')
+        flat_id = api.get_flats()[0]['flat_id']
+        data = self.next_reading(api, flat_id)
+        before = self.count(WATER_ADD)
+        self.server.fail_next(WATER_ADD, 'disconnect')
+        api.send_watercounters(flat_id, data)
+        self.assertEqual(self.count(WATER_ADD), before + 2)  # precheck: не принято, отправлено снова
+        counter = api.get_watercounters(flat_id)['counters'][0]
+        self.assertAlmostEqual(Watercounter.last_value(counter), float(data[0]['indication'].replace(',', '.')))
+
+
+class RateLimiterTestCase(ClientTestCase):
+    def test_host_limit(self):
+        api = self.api(rate_limiter=RateLimiter(host=(20, 1)))
+        api.login('74000000021', 'pwd')
+        started = time.time()
+        for _ in range(6):
+            api.get_profile()
+        self.assertGreaterEqual(time.time() - started, 0.2)
+
+    def test_write_class_shared_by_clients(self):
+        limiter = RateLimiter(classes={'write': (5, 1)})
+        api = self.api(rate_limiter=limiter)
+        readings = []
+        for login in ('74000000022', '74000000023'):
+            client = api.client(login)
+            client.login(login, 'pwd')
+            flat_id = client.get_flats()[0]['flat_id']
+            readings.append((client, flat_id, self.next_reading(client, flat_id)))
+        started = time.time()
+        for client, flat_id, data in readings:
+            client.send_watercounters(flat_id, data)
+        self.assertGreaterEqual(time.time() - started, 0.15)  # второй запрос ждет 1/5 с
+
+
+class SessionStoreTestCase(ClientTestCase):
+    def test_login_from_store(self):
+        store = MemorySessionStore()
+        first = self.api(session_store=store)
+        first.login('74000000031', 'pwd')
+        logins = self.count(LOGIN)
+
+        second = self.api(session_store=store)
+        second.login('74000000031', 'pwd')
+        self.assertEqual(self.count(LOGIN), logins)
+        self.assertEqual(second.client().session_id, first.client().session_id)
+        self.assertTrue(second.get_flats())
+
+    def test_relogin_on_expired(self):
+        store = MemorySessionStore()
+        self.api(session_store=store).login('74000000032', 'pwd')
+        self.server.expire_sessions()
+
+        api = self.api(session_store=store)
+        api.login('74000000032', 'pwd')
+        old = api.client().session_id
+        logins = self.count(LOGIN)
+        self.assertTrue(api.get_flats())  # 401 -> login -> повтор
+        self.assertEqual(self.count(LOGIN), logins + 1)
+        self.assertNotEqual(api.client().session_id, old)
+        self.assertEqual(store.load(store.key('74000000032', 'guid'))['session_id'], api.client().session_id)
+
+    def test_logout_deletes(self):
+        store = MemorySessionStore()
+        api = self.api(session_store=store)
+        api.login('74000000033', 'pwd')
+        api.logout()
+        self.assertIsNone(store.load(store.key('74000000033', 'guid')))
+
+
+if __name__ == '__main__':
+    unittest.main()
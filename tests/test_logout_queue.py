@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import pickle
+import threading
+import unittest
+
+from emp_mos_api.logout_queue import LogoutQueue
+from emp_mos_api.mos import MosAPI
+from emp_mos_api.standin import StandInServer
+
+
+class LogoutQueueTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StandInServer(logout_latency=0.2).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def test_background_logout(self):
+        queue = LogoutQueue(workers=2)
+        api = MosAPI(token='token', guid='guid', base_url=self.server.base_url, logout_queue=queue)
+        api.login('73000000001', 'pwd')
+        session_id = api.client().session_id
+        api.logout()
+        self.assertFalse(api.is_active())
+        self.assertTrue(queue.flush(5))
+        self.assertEqual((queue.sent, queue.failed), (1, 0))
+        self.assertNotIn(session_id, self.server.sessions)
+
+        api.client().resume(session_id)  # сессия уже закрыта на сервере: errorCode 401
+        api.logout()
+        self.assertTrue(queue.flush(5))
+        self.assertEqual((queue.sent, queue.failed), (1, 1))
+
+    def test_pickle_starts_no_threads(self):
+        api = MosAPI(token='token', guid='guid', base_url=self.server.base_url, logout_queue=LogoutQueue())
+        api.login('73000000002', 'pwd')
+        threads = threading.active_count()
+        client = pickle.loads(pickle.dumps(api.client()))
+        self.assertIsInstance(client.logout_queue, LogoutQueue)
+        self.assertEqual(threading.active_count(), threads)
+        client.logout()
+        self.assertTrue(client.logout_queue.flush(5))
+        self.assertEqual(client.logout_queue.sent, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
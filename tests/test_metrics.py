@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import pickle
+import unittest
+
+from emp_mos_api.metrics import Metrics, StatsdSink, endpoint
+from emp_mos_api.mos import MosAPI
+from emp_mos_api.standin import StandInServer
+
+
+class MetricsTestCase(unittest.TestCase):
+    def test_endpoint(self):
+        self.assertEqual(endpoint('https://emp.mos.ru/v1.0/flat/get?token=x'), '/flat/get')
+
+    def test_observe(self):
+        metrics = Metrics()
+        metrics.observe('http://h/v1.0/flat/get', 0.3, {'errorCode': 0, 'execTime': 0.2}, bytes_out=10, bytes_in=20)
+        metrics.observe('http://h/v1.0/flat/get', 0.1, error=IOError())
+        stats = metrics.summary()['/flat/get']
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['errors'], 1)
+        self.assertAlmostEqual(stats['exec_time'], 0.2)
+        self.assertAlmostEqual(stats['network'], 0.1)
+        self.assertIn('emp_mos_api_requests_total{endpoint="/flat/get"} 2', metrics.prometheus())
+
+    def test_client_pickle(self):
+        with StandInServer() as server:
+            api = MosAPI(token='token', guid='guid', base_url=server.base_url,
+                         metrics=Metrics(sinks=[StatsdSink('127.0.0.1', 8125)]))
+            api.login('70000000000', 'pwd')
+            client = pickle.loads(pickle.dumps(api.client()))
+            self.assertIsInstance(client.metrics, Metrics)
+            self.assertEqual(len(client.metrics.sinks), 1)
+            client.get_flats()
+            self.assertEqual(client.metrics.summary()['/flat/get']['requests'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import unittest
+from datetime import date
+
+from emp_mos_api.models import WaterCounter, WaterCounters, serialize_indication
+
+COUNTER = {
+    'counterId': 1437373,
+    'num': '417944',
+    'type': 1,
+    'checkup': '2023-09-25+03:00',
+    'indications': [
+        {'period': '2018-06-30+03:00', 'indication': '40.3'},
+        {'period': '2017-07-31+03:00', 'indication': '20.1'},
+        {'period': '2018-08-31+03:00', 'indication': '45,5'},
+    ]
+}
+
+
+class WaterCounterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.counter = WaterCounter.from_json(COUNTER)
+
+    def test_sorted(self):
+        self.assertEqual([i.period for i in self.counter.indications],
+                         [date(2017, 7, 31), date(2018, 6, 30), date(2018, 8, 31)])
+        self.assertEqual(self.counter.last_value, 45.5)
+        self.assertEqual(self.counter.previous.value, 40.3)
+
+    def test_in_month_year(self):
+        self.assertEqual(self.counter.in_month(2017, 7).value, 20.1)
+        self.assertIsNone(self.counter.in_month(2018, 7))  # июль 2017 не подходит
+        self.assertIsNone(self.counter.in_month(2016, 7))
+        self.assertEqual(self.counter.in_month(2018, 8).value, 45.5)
+        self.assertIsNone(self.counter.in_month(2018, 12))
+
+        single = WaterCounter(1, '1', 1, indications=[(date(2017, 7, 31), 20.1)])
+        self.assertIsNone(single.in_month(2018, 7))
+        self.assertEqual(single.in_month(2017, 7).value, 20.1)
+
+    def test_at(self):
+        self.assertEqual(self.counter.at(date(2018, 7, 15)).value, 40.3)
+        self.assertIsNone(self.counter.at(date(2017, 7, 30)))
+
+    def test_counters_index(self):
+        counters = WaterCounters.from_json({'counters': [COUNTER]})
+        self.assertIs(counters.by_num['417944'], counters.by_id[1437373])
+
+    def test_serialize(self):
+        self.assertEqual(serialize_indication('T1', 12.5, date(2018, 8, 1)),
+                         {'counter_id': 'T1', 'period': '2018-08-01', 'indication': '12,50'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Клиент против standin.StandInServer: python -m pytest tests
+"""
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+
+from emp_mos_api.mos import MosAPI, Watercounter, EmpValueLessException
+from emp_mos_api.retry import RetryPolicy
+from emp_mos_api.standin import StandInServer
+
+TELEPHONE = '70000000000'
+
+
+class StandInTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StandInServer(flats=2, eepd_polls=0).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.api = MosAPI(token='token', guid='guid', base_url=self.server.base_url,
+                          retry_policy=RetryPolicy(attempts=3, backoff=0.01))
+
+    def login(self, telephone=TELEPHONE):
+        self.api.login(telephone, 'pwd')
+        return self.api.get_flats()
+
+    def test_login_flats(self):
+        flats = self.login()
+        self.assertTrue(self.api.is_active())
+        self.assertEqual(len(flats), 2)
+        self.assertTrue(flats[0]['flat_id'])
+        self.api.logout()
+        self.assertFalse(self.api.is_active())
+
+    def test_watercounters_round_trip(self):
+        flat_id = self.login('70000000001')[0]['flat_id']
+        counters = self.api.get_watercounters(flat_id)['counters']
+        self.assertTrue(counters)
+        data = [Watercounter.serialize_for_send(c, Watercounter.last_value(c) + 1.5) for c in counters]
+        self.api.send_watercounters(flat_id, data)
+
+        month = date.today().strftime('%Y-%m')
+        for counter in self.api.get_watercounters(flat_id)['counters']:
+            sent = [d for d in data if d['counter_id'] == int(counter['counterId'])][0]
+            last = max(counter['indications'], key=lambda i: i['period'])
+            self.assertEqual(last['period'][:7], month)
+            self.assertAlmostEqual(float(last['indication']), float(sent['indication'].replace(',', '.')))
+
+    def test_watercounters_value_less(self):
+        flat_id = self.login('70000000002')[0]['flat_id']
+        counter = self.api.get_watercounters(flat_id)['counters'][0]
+        data = [Watercounter.serialize_for_send(counter, Watercounter.last_value(counter) - 1)]
+        self.assertRaises(EmpValueLessException, self.api.send_watercounters, flat_id, data)
+
+    def test_electrocounters_zone(self):
+        for i in range(20):
+            flats = [f for f in self.login('7100000{0:04d}'.format(i)) if f['electro_account']]
+            if flats:
+                break
+        flat_id = flats[0]['flat_id']
+        zones = self.server.accounts[self.api.client().telephone].electro[flat_id]['zones']
+        zones.append({'name': 'T2', 'value': '100'})
+        value = int(float(zones[0]['value'])) + 10
+        self.api.send_electrocounters(flat_id, [{'counter_id': 'T1', 'period': date.today().strftime('%Y-%m-%d'),
+                                                 'indication': value}])
+        zones = dict((z['name'], float(z['value'])) for z in self.api.get_electrocounters(flat_id)['zones'])
+        self.assertEqual(zones, {'T1': value, 'T2': 100.0})
+
+    def test_epd_list(self):
+        flat_id = self.login('70000000003')[0]['flat_id']
+        epd = self.api.get_epd(flat_id, date.today().replace(day=10).strftime('%d.%m.%Y'))
+        self.assertIsInstance(epd, list)
+        self.assertIn('amount', epd[0])
+
+    def test_download_resume_if_range(self):
+        flat_id = self.login('70000000005')[0]['flat_id']
+        period = date.today().replace(day=1).strftime('%d.%m.%Y')
+        rid = self.api.get_eepd(flat_id, period)['rid']
+        eepd = self.api.get_eepd(flat_id, period, 'current', rid)
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, 'epd.pdf')
+            full = self.api.client().download_eepd(eepd, path)
+            self.assertEqual(full.status, 200)
+            with open(path, 'rb') as f:
+                content = f.read()
+
+            with open(path, 'wb') as f:
+                f.write(content[:1000])
+            resumed = self.api.client().download_eepd(eepd, path, etag=full.etag)
+            self.assertEqual(resumed.status, 206)
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), content)
+
+            # документ изменился (другой ETag): файл пишется заново, а не дописывается
+            with open(path, 'wb') as f:
+                f.write(b'old prefix')
+            changed = self.api.client().download_eepd(eepd, path, etag='"old"')
+            self.assertEqual(changed.status, 200)
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), content)
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_lost_response_precheck(self):
+        """
+        Сервер принял показания, но ответ потерян: повтор через precheck не отправляет их второй раз
+        """
+        flat_id = self.login('70000000004')[0]['flat_id']
+        counter = self.api.get_watercounters(flat_id)['counters'][0]
+        data = [Watercounter.serialize_for_send(counter, Watercounter.last_value(counter) + 1)]
+        path = '/v1.0/watercounters/addValues'
+        before = self.server.stats.get(path, 0)
+        self.server.fail_next(path, 'lost_response')
+        self.assertIsNone(self.api.send_watercounters(flat_id, data))
+        self.assertEqual(self.server.stats[path], before + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import unittest
+
+from emp_mos_api.mos import MosAPI, Watercounter
+from emp_mos_api.standin import StandInServer
+from emp_mos_api.submit import BulkSubmitter, Reading, WATER, ELECTRO
+
+PWD = 'pwd'
+
+
+class BulkSubmitterTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StandInServer(flats=2).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.api = MosAPI(token='token', guid='guid', base_url=self.server.base_url)
+
+    def water_readings(self, login, delta):
+        """
+        :param delta: [прибавка к последнему показанию для каждого счетчика первой квартиры]
+        """
+        client = self.api.client(login)
+        client.login(login, PWD)
+        flat_id = client.get_flats()[0]['flat_id']
+        counters = client.get_watercounters(flat_id)['counters']
+        return [Reading(login, flat_id, WATER, c['counterId'], Watercounter.last_value(c) + d)
+                for c, d in zip(counters, delta)]
+
+    def test_group_split(self):
+        readings = self.water_readings('73000000001', [1, -1])
+        before = self.server.stats.get('/v1.0/watercounters/addValues', 0)
+        report = BulkSubmitter(self.api, workers=2).submit_all(readings)
+        self.assertEqual(report.counts(), {'sent': 1, 'value_less': 1})
+        self.assertEqual(report.failed[0].reading, readings[1])
+        # группа целиком, затем по одному
+        self.assertEqual(self.server.stats['/v1.0/watercounters/addValues'], before + 3)
+
+    def test_validate_skips_request(self):
+        readings = self.water_readings('73000000002', [-1, 500])
+        before = self.server.stats.get('/v1.0/watercounters/addValues', 0)
+        report = BulkSubmitter(self.api, validate=True).submit_all(readings)
+        self.assertEqual(report.counts(), {'value_less': 1, 'huge_value': 1})
+        self.assertEqual(self.server.stats.get('/v1.0/watercounters/addValues', 0), before)
+
+    def test_accounts_and_electro(self):
+        readings = []
+        for i in range(20):
+            login = '7300000{0:04d}'.format(100 + i)
+            client = self.api.client(login)
+            client.login(login, PWD)
+            flats = [f for f in client.get_flats() if f['electro_account']]
+            if flats:
+                zones = client.get_electrocounters(flats[0]['flat_id'])['zones']
+                value = float(zones[0]['value']) + 10
+                readings.append(Reading(login, flats[0]['flat_id'], ELECTRO, zones[0]['name'], value))
+                break
+        self.assertTrue(readings)
+        readings += self.water_readings('73000000003', [1, 1])
+        self.api.client('73000000003').logout()  # войдет заново по паролю из accounts
+
+        report = BulkSubmitter(self.api).submit_all(readings, {'73000000003': PWD})
+        self.assertEqual(report.counts(), {'sent': len(readings)})
+
+    def test_auth_error(self):
+        report = BulkSubmitter(self.api).submit_all([Reading('73000000004', 1, WATER, 1, 1.0)])
+        self.assertEqual(report.counts(), {'auth_error': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import pickle
+import unittest
+
+from emp_mos_api.mos import MosAPI, Watercounter
+from emp_mos_api.session_store import MemorySessionStore
+from emp_mos_api.standin import StandInServer
+from emp_mos_api.sync import SyncEngine
+
+
+class SyncEngineTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StandInServer(flats=2).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.api = MosAPI(token='token', guid='guid', base_url=self.server.base_url)
+        self.engine = SyncEngine(MemorySessionStore(), electro=False)
+
+    def test_incremental(self):
+        client = self.api.client('a')
+        client.login('72000000001', 'pwd')
+        first = self.engine.sync(client)
+        self.assertEqual(len(first.new_flats), 2)
+        self.assertTrue(first.new_indications)
+
+        second = self.engine.sync(client)
+        self.assertTrue(second.empty)
+        self.assertEqual((second.fetched, second.skipped), (0, 2))
+
+        flat_id = first.new_flats[0]['flat_id']
+        counter = client.get_watercounters(flat_id)['counters'][0]
+        client.send_watercounters(flat_id, [Watercounter.serialize_for_send(counter,
+                                                                            Watercounter.last_value(counter) + 1)])
+        third = self.engine.sync(client, force=True)
+        self.assertEqual([(f, int(c)) for f, c, _, _ in third.new_indications], [(flat_id, counter['counterId'])])
+
+    def test_separate_accounts(self):
+        a, b = self.api.client('a'), self.api.client('b')
+        a.login('72000000002', 'pwd')
+        b.login('72000000003', 'pwd')
+        self.engine.sync(a)
+        self.assertEqual(len(self.engine.sync(b).new_flats), 2)
+
+    def test_no_key(self):
+        client = self.api.client('a')
+        client.login('72000000004', 'pwd')
+        restored = pickle.loads(pickle.dumps(client))  # пароль и телефон не сериализуются
+        self.assertRaises(ValueError, self.engine.sync, restored)
+        self.assertEqual(len(self.engine.sync(restored, key='72000000004').new_flats), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
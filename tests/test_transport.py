@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import pickle
+import time
+import unittest
+
+from emp_mos_api.mos import MosAPI
+from emp_mos_api.standin import StandInServer
+from emp_mos_api.transport import Transport
+
+
+class TransportTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StandInServer(flats=1).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def api(self, transport):
+        return MosAPI(token='token', guid='guid', base_url=self.server.base_url, transport=transport)
+
+    def test_shared_pool(self):
+        transport = Transport()
+        api = self.api(transport)
+        for login in ('75000000001', '75000000002'):
+            api.client(login).login(login, 'pwd')
+            api.client(login).get_flats()
+        self.assertEqual(transport.stats.new_connections, 1)
+        self.assertEqual(transport.stats.hits, 3)
+        transport.close()
+
+    def test_keepalive_timeout(self):
+        transport = Transport(keepalive_timeout=0.1)
+        api = self.api(transport)
+        api.login('75000000003', 'pwd')
+        api.get_flats()
+        self.assertEqual(transport.stats.idle_closed, 0)
+        time.sleep(0.2)
+        self.assertTrue(api.get_flats())
+        self.assertEqual(transport.stats.idle_closed, 1)
+        self.assertEqual(transport.stats.new_connections, 2)
+        transport.close()
+
+    def test_pickle(self):
+        transport = pickle.loads(pickle.dumps(Transport(pool_maxsize=5, keepalive_timeout=None)))
+        self.assertEqual((transport.pool_maxsize, transport.keepalive_timeout), (5, None))
+        self.assertEqual(transport.stats.requests, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
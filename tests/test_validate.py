@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import unittest
+from datetime import date
+
+from emp_mos_api.mos import MosAPI, Watercounter, EmpCounterNotVerifiedException, EmpHugeValueException, \
+    EmpValueLessException
+from emp_mos_api.standin import StandInServer
+from emp_mos_api.validate import WaterValidator
+
+PERIOD = date(2018, 9, 15)
+
+
+def watercounters(checkup='2030-01-01+03:00', last='2018-08-31+03:00'):
+    return {'counters': [{
+        'counterId': 1437373,
+        'num': '417944',
+        'type': 1,
+        'checkup': checkup,
+        'indications': [
+            {'period': '2018-03-31+03:00', 'indication': '90.0'},
+            {'period': last, 'indication': '100.0'},
+        ]
+    }]}
+
+
+class WaterValidatorTestCase(unittest.TestCase):
+    def test_ok(self):
+        WaterValidator(watercounters()).check(1437373, 105, PERIOD)
+        WaterValidator(watercounters()).check(999, 1, PERIOD)  # неизвестный счетчик не проверяется
+
+    def test_rejected(self):
+        validator = WaterValidator(watercounters())
+        self.assertRaises(EmpValueLessException, validator.check, 1437373, 99.5, PERIOD)
+        self.assertRaises(EmpHugeValueException, validator.check, 1437373, 200, PERIOD)
+        self.assertRaises(EmpCounterNotVerifiedException,
+                          WaterValidator(watercounters(checkup='2018-09-01+03:00')).check, 1437373, 105, PERIOD)
+        self.assertRaises(EmpCounterNotVerifiedException,
+                          WaterValidator(watercounters(last='2018-05-31+03:00')).check, 1437373, 105, PERIOD)
+
+    def test_errors(self):
+        data = [Watercounter.serialize_for_send({'counterId': 1437373}, value, PERIOD) for value in (105, 99, 200)]
+        errors = WaterValidator(watercounters()).errors(data)
+        self.assertEqual([(item['indication'], type(e)) for item, e in errors],
+                         [('99,00', EmpValueLessException), ('200,00', EmpHugeValueException)])
+        self.assertRaises(EmpValueLessException, WaterValidator(watercounters()).validate, data)
+
+
+class StandInAgreementTestCase(unittest.TestCase):
+    """
+    Валидатор отклоняет то же, что и сервер (standin повторяет правила emp.mos.ru)
+    """
+    def test_same_as_server(self):
+        server = StandInServer(flats=1).start()
+        try:
+            api = MosAPI(token='token', guid='guid', base_url=server.base_url)
+            api.login('72000000000', 'pwd')
+            flat_id = api.get_flats()[0]['flat_id']
+            counter = api.get_watercounters(flat_id)['counters'][0]
+            last = Watercounter.last_value(counter)
+            for value in (last - 1, last + 500, last + 1):
+                data = [Watercounter.serialize_for_send(counter, value)]
+                expected = [type(e) for _, e in WaterValidator(api.get_watercounters(flat_id)).errors(data)]
+                try:
+                    api.send_watercounters(flat_id, data)
+                    actual = []
+                except (EmpValueLessException, EmpHugeValueException) as e:
+                    actual = [type(e)]
+                self.assertEqual(actual, expected, value)
+        finally:
+            server.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()